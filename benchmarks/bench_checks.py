@@ -0,0 +1,26 @@
+from collections import OrderedDict
+
+import pytest
+
+from lib_Partage_BSS import utils
+
+
+@pytest.mark.parametrize("value", ["prenom.nom@domain.com", "pas une adresse"])
+def test_checkIsMailAddress(benchmark, value):
+    benchmark(utils.checkIsMailAddress, value)
+
+
+def test_checkIsDomain(benchmark):
+    benchmark(utils.checkIsDomain, "sous.domain.com")
+
+
+def test_checkIsPreDeleteAccount(benchmark):
+    benchmark(utils.checkIsPreDeleteAccount, "readytodelete_2018-01-31-09-15-51_test@domain.com")
+
+
+def test_checkResponseStatus(benchmark):
+    benchmark(utils.checkResponseStatus, OrderedDict([("type", "integer"), ("content", 0)]))
+
+
+def test_changeStringToBoolean(benchmark):
+    benchmark(utils.changeStringToBoolean, "TRUE")
@@ -0,0 +1,34 @@
+import pytest
+
+from lib_Partage_BSS.models.Account import Account, importJsonAccount
+from lib_Partage_BSS.services import AccountService, COSService
+from lib_Partage_BSS.utils.BSSRequest import parseResponse
+
+import synthetic
+
+
+def test_fillAccount(benchmark, accountResponse):
+    benchmark(AccountService.fillAccount, accountResponse)
+
+
+@pytest.mark.parametrize("count", [10, 100, 1000])
+def test_fillAccount_GetAllAccounts(benchmark, count):
+    accounts = parseResponse(synthetic.getAllAccountsResponse(count))["accounts"]["account"]
+    benchmark(lambda: [AccountService.fillAccount(account) for account in accounts])
+
+
+def test_fillCOS(benchmark, cosResponse):
+    benchmark(COSService.fillCOS, cosResponse)
+
+
+def test_Account_toData(benchmark, account):
+    benchmark(account.toData)
+
+
+def test_Account_fillAccount(benchmark, account):
+    attributes = dict((key[1:], value) for key, value in account.__dict__.items() if value is not None)
+    benchmark(lambda: Account(account.name).fillAccount(attributes))
+
+
+def test_importJsonAccount(benchmark, jsonAccount):
+    benchmark(importJsonAccount, jsonAccount)
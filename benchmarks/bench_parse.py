@@ -0,0 +1,23 @@
+import pytest
+
+from lib_Partage_BSS.utils.BSSRequest import parseResponse
+
+import synthetic
+
+
+@pytest.mark.parametrize("aliases", [0, 10, 100])
+def test_parseResponse_GetAccount(benchmark, aliases):
+    xml = synthetic.getAccountResponse(aliases)
+    benchmark(parseResponse, xml)
+
+
+@pytest.mark.parametrize("count", [10, 100, 1000])
+def test_parseResponse_GetAllAccounts(benchmark, count):
+    xml = synthetic.getAllAccountsResponse(count)
+    benchmark(parseResponse, xml)
+
+
+@pytest.mark.parametrize("attributes", [20, 60, 200])
+def test_parseResponse_GetCos(benchmark, attributes):
+    xml = synthetic.getCosResponse(attributes)
+    benchmark(parseResponse, xml)
@@ -0,0 +1,21 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STARTUPS = {
+    "python": [sys.executable, "-c", "pass"],
+    "validators": [sys.executable, "-c", "from lib_Partage_BSS.utils.CheckMethods import checkIsMailAddress"],
+    "services": [sys.executable, "-c", "from lib_Partage_BSS.services import AccountService"],
+    "cli_help": [sys.executable, os.path.join(ROOT, "cli-bss.py"), "--help"],
+}
+
+
+@pytest.mark.parametrize("name", sorted(STARTUPS))
+def test_startup(benchmark, name):
+    def run():
+        subprocess.run(STARTUPS[name], cwd=ROOT, stdout=subprocess.DEVNULL, check=True)
+    benchmark.pedantic(run, rounds=10, warmup_rounds=1)
@@ -0,0 +1,29 @@
+from collections import OrderedDict
+from unittest.mock import patch
+
+import pytest
+
+from lib_Partage_BSS.services import BSSConnexion
+
+DOMAIN = "domain.com"
+
+
+@pytest.fixture()
+def connexion():
+    connexion = BSSConnexion()
+    connexion.setDomainKey({DOMAIN: "6b7ead4bd425836e8cf0079cd6c1a05acc127acd07c8ee4b61023e19250e929c"})
+    response = {"status": OrderedDict([("type", "integer"), ("content", 0)]), "message": "", "token": "token"}
+    with patch("lib_Partage_BSS.services.BSSConnexionService.postBSS", return_value=response):
+        yield connexion
+
+
+def test_token_cache(benchmark, connexion):
+    connexion.token(DOMAIN)
+    benchmark(connexion.token, DOMAIN)
+
+
+def test_token_generation(benchmark, connexion):
+    def generate():
+        connexion._timestampOfLastToken[DOMAIN] = 0
+        return connexion.token(DOMAIN)
+    benchmark(generate)
@@ -0,0 +1,32 @@
+import json
+
+import pytest
+
+from lib_Partage_BSS.services import AccountService
+from lib_Partage_BSS.utils.BSSRequest import parseResponse
+
+import synthetic
+
+
+@pytest.fixture(scope="session")
+def accountResponse():
+    return parseResponse(synthetic.getAccountResponse(aliases=10))["account"]
+
+
+@pytest.fixture(scope="session")
+def account(accountResponse):
+    return AccountService.fillAccount(accountResponse)
+
+
+@pytest.fixture(scope="session")
+def cosResponse():
+    return parseResponse(synthetic.getCosResponse())["cos"]
+
+
+@pytest.fixture()
+def jsonAccount(tmpdir, account):
+    path = tmpdir.join("account.json")
+    data = dict((key[1:], value) for key, value in account.__dict__.items()
+                if value is not None and key != "_zimbraZimletAvailableZimlets")
+    path.write(json.dumps(data))
+    return str(path)
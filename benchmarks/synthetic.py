@@ -0,0 +1,115 @@
+# -*-coding:utf-8 -*
+"""
+Génération de réponses XML synthétiques de l'API BSS (GetAccount, GetAllAccounts, GetCos) de tailles variables,
+pour mesurer le coût propre de la bibliothèque sans accès réseau
+"""
+
+HEADER = "<?xml version=\"1.0\" encoding=\"UTF-8\"?>"
+
+ZIMLETS = ["com_zimbra_attachmail", "com_zimbra_srchhighlighter", "com_zimbra_url", "com_zimbra_email",
+           "com_zimbra_ymemoticons", "com_zimbra_date", "com_zimbra_attachcontacts"]
+
+
+def accountName(index, domain="domain.com"):
+    return "user{0}@{1}".format(index, domain)
+
+
+def accountXml(index=0, aliases=0, tag="account", domain="domain.com"):
+    """
+    Génère l'élément XML d'un compte
+
+    :param index: le numéro du compte
+    :param aliases: le nombre d'alias du compte
+    :param tag: le nom de l'élément
+    :param domain: le domaine du compte
+    :return: le XML du compte
+    """
+    parts = [
+        "<" + tag + ">",
+        "<name>" + accountName(index, domain) + "</name>",
+        "<id>id-{0}</id>".format(index),
+        "<admin>DOMAIN</admin>",
+        "<mav-transformation>FALSE</mav-transformation>",
+        "<mav-redirection></mav-redirection>",
+        "<used type=\"integer\">{0}</used>".format(index * 1024),
+        "<quota type=\"integer\">0</quota>",
+        "<carLicense>eppn{0}@domain.com</carLicense>".format(index),
+        "<givenName>Prénom{0}</givenName>".format(index),
+        "<sn>Nom{0}</sn>".format(index),
+        "<displayName>Prénom{0} Nom{0}</displayName>".format(index),
+        "<businessCategory>1</businessCategory>",
+        "<zimbraFeatureMailForwardingEnabled>TRUE</zimbraFeatureMailForwardingEnabled>",
+        "<zimbraFeatureCalendarEnabled>TRUE</zimbraFeatureCalendarEnabled>",
+        "<zimbraAccountStatus>active</zimbraAccountStatus>",
+        "<zimbraFeatureContactsEnabled>TRUE</zimbraFeatureContactsEnabled>",
+        "<zimbraLastLogonTimestamp>20180131091551Z</zimbraLastLogonTimestamp>",
+        "<zimbraFeatureOptionsEnabled>TRUE</zimbraFeatureOptionsEnabled>",
+        "<zimbraFeatureTasksEnabled>TRUE</zimbraFeatureTasksEnabled>",
+        "<zimbraPrefMailLocalDeliveryDisabled>FALSE</zimbraPrefMailLocalDeliveryDisabled>",
+        "<zimbraMailQuota>0</zimbraMailQuota>",
+        "<zimbraCOSId>cos-id</zimbraCOSId>",
+        "<zimbraZimletAvailableZimlets type=\"array\">",
+    ]
+    parts.extend("<zimbraZimletAvailableZimlet>" + zimlet + "</zimbraZimletAvailableZimlet>" for zimlet in ZIMLETS)
+    parts.append("</zimbraZimletAvailableZimlets>")
+    if aliases:
+        parts.append("<zimbraMailAlias type=\"array\">")
+        parts.extend("<zimbraMailAlias>alias{0}-{1}@{2}</zimbraMailAlias>".format(index, alias, domain)
+                     for alias in range(aliases))
+        parts.append("</zimbraMailAlias>")
+    parts.extend([
+        "<zimbraFeatureBriefcasesEnabled>TRUE</zimbraFeatureBriefcasesEnabled>",
+        "<zimbraHideInGal>FALSE</zimbraHideInGal>",
+        "<zimbraFeatureMailEnabled>TRUE</zimbraFeatureMailEnabled>",
+        "</" + tag + ">",
+    ])
+    return "".join(parts)
+
+
+def response(body):
+    return HEADER + "<Response><status type=\"integer\">0</status>" \
+                    "<message>Opération réalisée avec succès !</message>" + body + "</Response>"
+
+
+def getAccountResponse(aliases=0):
+    """
+    :param aliases: le nombre d'alias du compte
+    :return: la réponse XML de GetAccount
+    """
+    return response(accountXml(0, aliases))
+
+
+def getAllAccountsResponse(count):
+    """
+    :param count: le nombre de comptes
+    :return: la réponse XML de GetAllAccounts
+    """
+    return response("<accounts type=\"array\">" + "".join(accountXml(index) for index in range(count))
+                    + "</accounts>")
+
+
+def cosXml(attributes=60, tag="cos"):
+    """
+    Génère l'élément XML d'une classe de service
+
+    :param attributes: le nombre d'attributs booléens de la classe de service
+    :param tag: le nom de l'élément
+    :return: le XML de la classe de service
+    """
+    parts = ["<" + tag + ">", "<name>cos-name</name>", "<zimbraId>cos-id</zimbraId>",
+             "<zimbraMailQuota type=\"integer\">1073741824</zimbraMailQuota>",
+             "<zimbraZimletAvailableZimlets type=\"array\">"]
+    parts.extend("<zimbraZimletAvailableZimlet>" + zimlet + "</zimbraZimletAvailableZimlet>" for zimlet in ZIMLETS)
+    parts.append("</zimbraZimletAvailableZimlets>")
+    parts.extend("<zimbraFeature{0}Enabled>{1}</zimbraFeature{0}Enabled>".format(index, "TRUE" if index % 2 else "FALSE")
+                 for index in range(attributes))
+    parts.append("</" + tag + ">")
+    return "".join(parts)
+
+
+def getCosResponse(attributes=60):
+    """
+    :param attributes: le nombre d'attributs de la classe de service
+    :return: la réponse XML de GetCos
+    """
+    return response(cosXml(attributes))
@@ -3,17 +3,17 @@
 # O.Salaün (Univ Rennes1) : client en ligne de commande pour lib_Partage_BSS
 
 import argparse, sys
-import pprint
-import json
 
-from lib_Partage_BSS.exceptions import *
-from lib_Partage_BSS.models.Account import Account, importJsonAccount
-from lib_Partage_BSS.services import AccountService
-from lib_Partage_BSS.models.COS import COS
-from lib_Partage_BSS.services import COSService
-from lib_Partage_BSS.services.BSSConnexionService import BSSConnexion
+import os
+import signal
+
+# seuls les modules nécessaires à l'analyse des arguments et au mode client sont importés ici : --help et les appels
+# transmis au démon ne chargent ni les services ni requests
+from lib_Partage_BSS.cli.Client import defaultSocketPath, sendRequest
+from lib_Partage_BSS.cli.Commands import COMMANDS, CommandError, checkArguments, executeCommand, isStreamed, \
+    selectCommand, streamCommand
+from lib_Partage_BSS.cli.Output import FORMATS
 
-printer = pprint.PrettyPrinter(indent=4)
 
 epilog = "Exemples d'appel :\n" + \
     "./cli-bss.py --domain=x.fr --domainKey=yourKey --getAccount --email=user@x.fr\n" + \
@@ -34,10 +34,15 @@ epilog = "Exemples d'appel :\n" + \
 	"./cli-bss.py --domain=x.fr --domainKey=yourKey --removeAccountAlias --email=user@x.fr --alias=alias1@x.fr --alias=alias2@x.fr\n" + \
 	"./cli-bss.py --domain=x.fr --domainKey=yourKey --modifyAccountAliases --email=user@x.fr --alias=alias3@x.fr --alias=alias4@x.fr\n" + \
     "./cli-bss.py --domain=x.fr --domainKey=yourKey --getCos --cosName=etu_s_xx\n" + \
-    "./cli-bss.py --domain=x.fr --domainKey=yourKey --getAllCos\n"
+    "./cli-bss.py --domain=x.fr --domainKey=yourKey --getAllCos\n" + \
+    "./cli-bss.py --domain=x.fr --domainKey=yourKey --batch=operations.jsonl --jobs=4\n" + \
+    "  avec des lignes de la forme {\"op\": \"lockAccount\", \"email\": \"user@x.fr\"}\n" + \
+    "./cli-bss.py --domain=x.fr --domainKey=yourKey --getAllAccounts --all --format=csv --fields=name,zimbraAccountStatus\n" + \
+    "./cli-bss.py serve --domain=x.fr --domainKey=yourKey\n" + \
+    "./cli-bss.py --socket --domain=x.fr --lockAccount --email=user@x.fr\n"
 parser = argparse.ArgumentParser(description="Client en ligne de commande pour l'API BSS Partage", epilog=epilog, formatter_class=argparse.RawDescriptionHelpFormatter)
 parser.add_argument('--domain', required=True, metavar='mondomaine.fr', help="domaine cible sur le serveur Partage")
-parser.add_argument('--domainKey', required=True, metavar="6b7ead4bd425836e8c", help="clé du domaine cible")
+parser.add_argument('--domainKey', metavar="6b7ead4bd425836e8c", help="clé du domaine cible (inutile avec --socket)")
 parser.add_argument('--email', metavar='jchirac@mondomaine.fr', help="adresse mail passée en argument")
 parser.add_argument('--newEmail', metavar='pdupont@mondomaine.fr', help="nouvelle adresse mail du compte")
 parser.add_argument('--alias', action='append', metavar='fcotton@mondomaine.fr', help="alias pour un compte")
@@ -51,354 +56,123 @@ parser.add_argument('--jsonData', metavar='/tmp/myAccount.json', type=argparse.F
 parser.add_argument('--field' , '-f' ,
     action='append' , nargs=2 ,
     metavar=('name','value') , help="nom et valeur d'un champ du compte")
+parser.add_argument('--batch', metavar='operations.jsonl', type=argparse.FileType('r'),
+    help="exécute les opérations d'un fichier JSON lines ('-' pour l'entrée standard) et écrit un résultat JSON par ligne")
+parser.add_argument('--jobs', metavar='4', type=int, default=1, help="nombre d'opérations simultanées en mode batch")
+parser.add_argument('--format', choices=FORMATS, default='text',
+    help="format de sortie : text (par défaut), jsonl, csv ou tsv (un modèle par ligne, écrit au fil de l'eau)")
+parser.add_argument('--fields', metavar='name,displayName', help="champs écrits avec --format, séparés par des virgules")
+parser.add_argument('--all', action='store_true', help="parcourt tout le domaine par pages de --limit entrées (--getAllAccounts, --getAllCos)")
+parser.add_argument('mode', nargs='?', choices=['serve'],
+    help="serve : démarre un démon exécutant les opérations reçues sur un socket Unix (connexions, tokens et classes de service conservés)")
+parser.add_argument('--socket', metavar='/run/user/1000/cli-bss.sock', nargs='?', const=defaultSocketPath(),
+    help="socket du démon ; sans 'serve', l'opération est transmise au démon (par défaut %s)" % defaultSocketPath())
 
 group = parser.add_argument_group('Opérations implémentées :')
-group.add_argument('--getAccount', action='store_const', const=True, help="rechercher un compte")
-group.add_argument('--createAccount', action='store_const', const=True, help="créer un compte")
-group.add_argument('--createAccountExt',
-    action='store_const', const=True,
-    help="créer un compte en spécifiant les paramètres via -f ou --jsonData")
-group.add_argument('--modifyAccount', action='store_const', const=True, help="mettre à jour un compte")
-group.add_argument('--renameAccount', action='store_const', const=True, help="renommer un compte")
-group.add_argument('--deleteAccount', action='store_const', const=True, help="supprimer un compte")
-group.add_argument('--preDeleteAccount', action='store_const', const=True, help="pré-supprimer un compte (le compte est fermé et renommé)")
-group.add_argument('--restorePreDeleteAccount', action='store_const', const=True, help="rétablir un compte pré-supprimé (compte fermé et renommé)")
-group.add_argument('--getAllAccounts', action='store_const', const=True, help="rechercher tous les comptes du domaine")
-group.add_argument('--modifyPassword', action='store_const', const=True, help="modifier l'empreinte du mot de passe d'un compte")
-group.add_argument('--lockAccount', action='store_const', const=True, help="vérouiller un compte")
-group.add_argument('--activateAccount', action='store_const', const=True, help="(ré)activer un compte")
-group.add_argument('--closeAccount', action='store_const', const=True, help="fermer un compte")
-group.add_argument('--addAccountAlias', action='store_const', const=True, help="ajoute des aliases à un compte")
-group.add_argument('--removeAccountAlias', action='store_const', const=True, help="retire des aliases d'un compte")
-group.add_argument('--modifyAccountAliases', action='store_const', const=True, help="positionne une liste d'aliases pour un compte (supprime des aliases existants si non mentionnés)")
-group.add_argument('--getCos', action='store_const', const=True, help="rechercher une classe de service")
-group.add_argument('--getAllCos', action='store_const', const=True, help="rechercher toutes les classes de service du domaine")
-
-args = vars(parser.parse_args())
-
-# Connexion au BSS
-try:
-    bss = BSSConnexion()
-    bss.setDomainKey(listDomainKey={args['domain']: args['domainKey']})
-
-except Exception as err:
-    print("Echec de connexion : %s" % err)
-    sys.exit(2)
-
-if args['getAllAccounts'] == True:
-
-    try:
-        if args['ldapQuery']:
-            all_accounts = AccountService.getAllAccounts(domain=args['domain'], limit=args['limit'], ldapQuery=args['ldapQuery'])
-        else:
-            all_accounts = AccountService.getAllAccounts(domain=args['domain'], limit=args['limit'])
-
-    except Exception as err:
-        print("Echec d'exécution : %s" % err)
-        sys.exit(2)
-
-    print("%d comptes retournés :" % len(all_accounts))
-    for account in all_accounts:
-        print("Compte %s :" % account.name)
-        print(account.showAttr())
-
-elif args['getAccount'] == True:
-
-    if not args['email']:
-        raise Exception("Missing 'email' argument")
-
-    try:
-        account = AccountService.getAccount(args['email'])
-
-    except Exception as err:
-        print("Echec d'exécution : %s" % err)
-        sys.exit(2)
+for command in COMMANDS.values():
+    group.add_argument('--' + command.name, action='store_const', const=True, help=command.help)
 
-    if args['asJson']:
-        print(json.dumps(account.__dict__, sort_keys=True, indent=4))
 
-    else:
-        print("Informations sur le compte %s :" % account.name)
-        print(account.showAttr())
-
-elif args['deleteAccount'] == True:
-
-    if not args['email']:
-        raise Exception("Missing 'email' argument")
-
-    try:
-        AccountService.deleteAccount(args['email'])
-
-    except Exception as err:
-        print("Echec d'exécution : %s" % err)
-        sys.exit(2)
-
-    print("Le compte %s a été supprimé" % args['email'])
-
-
-
-elif args['preDeleteAccount'] == True:
-
-    if not args['email']:
-        raise Exception("Missing 'email' argument")
-
-    try:
-        AccountService.preDeleteAccount(args['email'])
-
-    except Exception as err:
-        print("Echec d'exécution : %s" % err)
-        sys.exit(2)
-
-    print("Le compte %s a été préparé pour une suppression ultérieure" % args['email'])
-
-
-elif args['restorePreDeleteAccount'] == True:
-
-    if not args['email']:
-        raise Exception("Missing 'email' argument")
-
-    try:
-        AccountService.restorePreDeleteAccount(args['email'])
-
-    except Exception as err:
-        print("Echec d'exécution : %s" % err)
-        sys.exit(2)
-
-    print("Le compte %s a été rétabli" % args['email'])
-
-elif args['createAccountExt'] == True:
-
-    if not args[ 'userPassword' ]:
-        print("Argument '--userPassword' manquant")
-        sys.exit(1)
-
-    # Objet du compte, éventuellement lu depuis un fichier JSON
+def forward(name, args):
+    """
+    Transmet une opération au démon et affiche sa réponse
+    """
+    request = {key: value for key, value in args.items()
+               if key not in COMMANDS and key not in ('domainKey', 'batch', 'jobs', 'mode', 'socket') and value is not None}
+    request['op'] = name
     if args['jsonData']:
-        account = importJsonAccount( args[ 'jsonData' ].name )
-    else:
-        account = Account( None )
-
-    if args[ 'field' ]:
-        account.fillAccount({
-                arg[0] : arg[1] for arg in args[ 'field' ]
-            } , allowNameChange = True)
-
-    try:
-        nAccount = AccountService.createAccountExt( account ,
-                args[ 'userPassword' ] )
-    except ( NameException , ServiceException , DomainException ) as err:
-        print("Echec d'exécution : %s" % err)
-        sys.exit(2)
-
-    print( "Le compte %s a été créé" % nAccount.name )
-    print( nAccount.showAttr( ) )
-
-elif args['createAccount'] == True:
-
-    if not args['email']:
-        raise Exception("Missing 'email' argument")
-
-    if not args['userPassword']:
-        raise Exception("Missing 'userPassword' argument")
-
-    if not args['cosId']:
-        raise Exception("Missing 'cosId' argument")
-
+        request['jsonData'] = os.path.abspath(args['jsonData'].name)
     try:
-        AccountService.createAccount(name=args['email'], userPassword=args['userPassword'], cosId=args['cosId'] )
+        response = sendRequest(request, args['socket'])
 
-    except Exception as err:
-        print("Echec d'exécution : %s" % err)
+    except OSError as err:
+        print("Echec de connexion au démon %s : %s" % (args['socket'], err))
         sys.exit(2)
 
-    print("Le compte %s a été créé" % args['email'])
+    print(response['output'])
+    if response['exitCode']:
+        sys.exit(response['exitCode'])
 
-elif args['modifyAccount'] == True:
 
-    if not args['email']:
-        raise Exception("Missing 'email' argument")
+def main(args):
+    name = selectCommand(args)
+    if args['socket'] and args['mode'] != 'serve' and not args['batch']:
+        if name is None:
+            print("Aucune opération à exécuter")
+            return
+        forward(name, args)
+        return
 
-    if not args['jsonData']:
-        raise Exception("Missing 'jsonData' argument")
+    if not args['domainKey']:
+        parser.error("l'argument --domainKey est obligatoire")
 
-    try:
-        account = importJsonAccount(args['jsonData'].name)
-
-    except Exception as err:
-        print("Echec chargement fichier JSON %s : %s" % (args['jsonData'], err))
-        sys.exit(2)
+    from lib_Partage_BSS.services.BSSConnexionService import BSSConnexion
+    from lib_Partage_BSS.utils.BSSRequest import sessionTransport, setTransport
 
+    # Connexion au BSS
     try:
-        AccountService.modifyAccount(account=account)
+        bss = BSSConnexion()
+        bss.setDomainKey(listDomainKey={args['domain']: args['domainKey']})
 
     except Exception as err:
-        print("Echec d'exécution : %s" % err)
+        print("Echec de connexion : %s" % err)
         sys.exit(2)
 
-    print("Le compte %s a été mis à jour" % args['email'])
+    if args['mode'] == 'serve':
+        from lib_Partage_BSS.cli.Daemon import Daemon
+        try:
+            Daemon(args['socket'], domains=[args['domain']], defaults={'domain': args['domain']}).serveForever()
 
-elif args['renameAccount'] == True:
+        except KeyboardInterrupt:
+            pass
 
-    if not args['email']:
-        raise Exception("Missing 'email' argument")
+        except OSError as err:
+            print("Echec de démarrage du démon : %s" % err)
+            sys.exit(2)
+        return
 
-    if not args['newEmail']:
-        raise Exception("Missing 'newEmail' argument")
+    if args['batch']:
+        from lib_Partage_BSS.cli.Batch import runBatch
+        setTransport(sessionTransport())
+        defaults = {key: value for key, value in args.items() if key not in COMMANDS and key not in ('domainKey', 'batch', 'jobs') and value is not None}
+        count, failures = runBatch(args['batch'], defaults, jobs=args['jobs'])
+        sys.exit(2 if failures else 0)
 
-    try:
-        AccountService.renameAccount(name=args['email'], newName=args['newEmail'])
+    if name is None:
+        print("Aucune opération à exécuter")
+        return
 
-    except Exception as err:
-        print("Echec d'exécution : %s" % err)
-        sys.exit(2)
+    if isStreamed(args):
+        try:
+            checkArguments(name, args)
 
-    print("Le compte %s a été renommé %s" % (args['email'], args['newEmail']))
+        except ValueError as err:
+            print(err)
+            sys.exit(1)
 
-elif args['modifyPassword'] == True:
+        try:
+            streamCommand(name, args, sys.stdout)
 
-    if not args['email']:
-        raise Exception("Missing 'email' argument")
+        except BrokenPipeError:
+            # la sortie est fermée (par exemple | head) : inutile de poursuivre la recherche
+            sys.stdout = open(os.devnull, 'w')
 
-    if not args['userPassword']:
-        raise Exception("Missing 'userPassword' argument")
+        except CommandError as err:
+            sys.stdout.flush()
+            print(err, file=sys.stderr)
+            sys.exit(2)
 
-    try:
-        AccountService.modifyPassword(name=args['email'], newUserPassword=args['userPassword'])
+        except Exception as err:
+            sys.stdout.flush()
+            print("Echec d'exécution : %s" % err, file=sys.stderr)
+            sys.exit(2)
+        return
 
-    except Exception as err:
-        print("Echec d'exécution : %s" % err)
-        sys.exit(2)
-
-    print("Le mot de passe du compte %s a été mis à jour" % args['email'])
-
-elif args['lockAccount'] == True:
-
-    if not args['email']:
-        raise Exception("Missing 'email' argument")
-
-    try:
-        AccountService.lockAccount(name=args['email'])
-
-    except Exception as err:
-        print("Echec d'exécution : %s" % err)
-        sys.exit(2)
-
-    print("Le compte %s a été vérouillé" % args['email'])
-
-
-elif args['activateAccount'] == True:
-
-    if not args['email']:
-        raise Exception("Missing 'email' argument")
-
-    try:
-        AccountService.activateAccount(name=args['email'])
-
-    except Exception as err:
-        print("Echec d'exécution : %s" % err)
-        sys.exit(2)
-
-    print("Le compte %s a été (ré)activé" % args['email'])
-
-elif args['closeAccount'] == True:
-
-    if not args['email']:
-        raise Exception("Missing 'email' argument")
-
-    try:
-        AccountService.closeAccount(name=args['email'])
-
-    except Exception as err:
-        print("Echec d'exécution : %s" % err)
-        sys.exit(2)
-
-    print("Le compte %s a été fermé" % args['email'])
-
-elif args['addAccountAlias'] == True:
-
-    if not args['email']:
-        raise Exception("Missing 'email' argument")
-
-    if not args['alias']:
-        raise Exception("Missing 'alias' argument")
-
-    try:
-        for alias in args['alias']:
-            AccountService.addAccountAlias(name=args['email'], newAlias=alias)
-
-    except Exception as err:
-        print("Echec d'exécution : %s" % err)
-        sys.exit(2)
-
-    print("Les aliases %s ont été ajoutés au compte %s" % (args['alias'], args['email']))
-
-elif args['removeAccountAlias'] == True:
-
-    if not args['email']:
-        raise Exception("Missing 'email' argument")
-
-    if not args['alias']:
-        raise Exception("Missing 'alias' argument")
-
-    try:
-        for alias in args['alias']:
-            AccountService.removeAccountAlias(name=args['email'], aliasToDelete=alias)
-
-    except Exception as err:
-        print("Echec d'exécution : %s" % err)
-        sys.exit(2)
-
-    print("Les aliases %s ont été retirés du compte %s" % (args['alias'], args['email']))
-
-elif args['modifyAccountAliases'] == True:
-
-    if not args['email']:
-        raise Exception("Missing 'email' argument")
-
-    if not args['alias']:
-        raise Exception("Missing 'alias' argument")
-
-    try:
-        AccountService.modifyAccountAliases(name=args['email'], listOfAliases=args['alias'])
-
-    except Exception as err:
-        print("Echec d'exécution : %s" % err)
-        sys.exit(2)
-
-    print("Les aliases pour le compte %s ont été positionnés à %s" % (args['email'], args['alias']))
-
-elif args['getCos'] == True:
-
-    if not args['cosName']:
-        raise Exception("Missing 'cosName' argument")
-
-    try:
-        cos = COSService.getCOS(args['domain'], args['cosName'])
-
-    except Exception as err:
-        print("Echec d'exécution : %s" % err)
-        sys.exit(2)
-
-    if args['asJson']:
-        print(json.dumps(cos.__dict__, sort_keys=True, indent=4))
-
-    else:
-        print("Informations sur la classe de service %s :" % cos.name)
-        print(cos.showAttr())
-
-elif args['getAllCos'] == True:
-
-    try:
-        all_cos = COSService.getAllCOS(domain=args['domain'], limit=args['limit'])
-
-    except Exception as err:
-        print("Echec d'exécution : %s" % err)
-        sys.exit(2)
+    output, exitCode = executeCommand(name, args)
+    print(output)
+    if exitCode:
+        sys.exit(exitCode)
 
-    print("%d classes de service retournés :" % len(all_cos))
-    for cos in all_cos:
-        print("Classe de service %s :" % cos.name)
-        print(cos.showAttr())
 
-else:
-    print("Aucune opération à exécuter")
+signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+main(vars(parser.parse_args()))
@@ -1,4 +1,28 @@
-from . import exceptions
-from . import models
-from . import services
-from . import utils
+"""
+Bibliothèque permettant d'appeler l'API BSS Partage.
+
+Les sous-packages sont importés à leur première utilisation (PEP 562) : importer un validateur de
+lib_Partage_BSS.utils.CheckMethods ne charge ni les services ni requests.
+"""
+import importlib
+import sys
+
+_SUBPACKAGES = ("exceptions", "models", "services", "utils")
+
+
+def __getattr__(name):
+    if name in _SUBPACKAGES:
+        return importlib.import_module("." + name, __name__)
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_SUBPACKAGES))
+
+
+if sys.version_info < (3, 7):
+    # pas de __getattr__ de module avant Python 3.7
+    from . import exceptions
+    from . import models
+    from . import services
+    from . import utils
@@ -0,0 +1,118 @@
+# -*-coding:utf-8 -*
+"""
+Module permettant d'exécuter un flux d'opérations du client en ligne de commande dans un même processus (mode batch
+de cli-bss.py), avec une seule connexion et un seul token par domaine. Chaque ligne est un objet JSON dont "op" est
+le nom de l'opération et les autres clés ses arguments ; les arguments absents sont pris dans les valeurs par défaut::
+
+    {"op": "getAccount", "email": "user@x.fr"}
+    {"op": "addAccountAlias", "email": "user@x.fr", "alias": ["alias1@x.fr", "alias2@x.fr"], "id": "ticket-42"}
+
+Le résultat de chaque ligne est écrit en JSON, dans l'ordre des lignes, dès qu'il est disponible ::
+
+    {"line": 1, "op": "getAccount", "ok": true, "message": "...", "result": {...}}
+    {"line": 2, "op": "addAccountAlias", "id": "ticket-42", "ok": false, "error": "ServiceException", "message": "..."}
+
+Les lignes vides et celles commençant par # sont ignorées.
+"""
+import json
+import sys
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from lib_Partage_BSS.cli.Commands import exportValue, runCommand
+from lib_Partage_BSS.utils.Deadline import currentDeadline, withDeadline
+from lib_Partage_BSS.utils.Scheduler import currentPriority, withPriority
+
+
+def parseLine(text):
+    """
+    Lit une ligne d'opération
+
+    :param text: la ligne au format JSON
+    :return: le dictionnaire de l'opération
+    :raises ValueError: Exception levée si la ligne n'est pas un objet JSON contenant "op"
+    """
+    request = json.loads(text, object_pairs_hook=OrderedDict)
+    if not isinstance(request, dict) or not request.get("op"):
+        raise ValueError("Ligne invalide : un objet JSON contenant \"op\" est attendu")
+    return request
+
+
+def executeLine(number, text, defaults=None):
+    """
+    Exécute une ligne d'opération ; les erreurs sont rapportées dans le résultat
+
+    :param number: le numéro de la ligne
+    :param text: la ligne au format JSON
+    :param defaults: les valeurs par défaut des arguments (optionnel, par exemple {"domain": "x.fr"})
+    :return: le résultat de la ligne (dictionnaire sérialisable en JSON)
+    """
+    record = OrderedDict([("line", number)])
+    try:
+        request = parseLine(text)
+        record["op"] = request["op"]
+        if "id" in request:
+            record["id"] = request["id"]
+        args = dict(defaults or {})
+        args.update(request)
+        result = runCommand(request["op"], args)
+        record["ok"] = True
+        record["message"] = result.message
+        if result.value is not None:
+            record["result"] = exportValue(result.value)
+    except Exception as err:
+        record["ok"] = False
+        record["error"] = type(err).__name__
+        record["message"] = str(err)
+    return record
+
+
+def writeRecord(record, stream=None):
+    """
+    Écrit le résultat d'une ligne sur une ligne JSON
+
+    :param record: le résultat de la ligne
+    :param stream: le flux de sortie (optionnel, par défaut la sortie standard)
+    """
+    stream = stream if stream is not None else sys.stdout
+    stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+    stream.flush()
+
+
+def runBatch(lines, defaults=None, jobs=1, write=writeRecord):
+    """
+    Exécute un flux de lignes d'opérations et écrit le résultat de chacune, dans l'ordre des lignes.
+    L'échéance courante (voir Deadline) et la classe de priorité courante (voir Scheduler) s'appliquent aux
+    opérations.
+
+    :param lines: les lignes (par exemple un fichier ouvert ou sys.stdin)
+    :param defaults: les valeurs par défaut des arguments (optionnel)
+    :param jobs: le nombre d'opérations simultanées
+    :param write: la fonction recevant le résultat de chaque ligne
+    :return: le nombre de lignes exécutées et le nombre de lignes en erreur
+    """
+    execute = withDeadline(currentDeadline(), withPriority(currentPriority(), executeLine))
+    tasks = ((number, text) for number, text in enumerate(lines, 1)
+             if text.strip() and not text.lstrip().startswith("#"))
+    counts = [0, 0]
+
+    def emit(record):
+        counts[0] += 1
+        if not record["ok"]:
+            counts[1] += 1
+        write(record)
+
+    if jobs is None or jobs <= 1:
+        for number, text in tasks:
+            emit(execute(number, text, defaults))
+        return tuple(counts)
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        for number, text in tasks:
+            pending.append(executor.submit(execute, number, text, defaults))
+            # les résultats sont écrits dans l'ordre des lignes ; au plus 2 * jobs lignes sont lues en avance
+            while pending and (len(pending) >= 2 * jobs or pending[0].done()):
+                emit(pending.popleft().result())
+        while pending:
+            emit(pending.popleft().result())
+    return tuple(counts)
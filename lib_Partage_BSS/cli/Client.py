@@ -0,0 +1,75 @@
+# -*-coding:utf-8 -*
+"""
+Module permettant de transmettre une opération au démon de cli-bss.py (voir Daemon) via son socket Unix.
+Le client n'a besoin ni de la clé du domaine ni d'un token : la réponse est obtenue en quelques millisecondes.
+Le client vérifie que le socket appartient à l'utilisateur courant avant d'envoyer l'opération, qui peut contenir
+des empreintes de mots de passe.
+"""
+import json
+import os
+import socket
+import struct
+import tempfile
+
+
+def defaultSocketPath():
+    """
+    Renvoie le chemin par défaut du socket du démon, propre à l'utilisateur
+
+    :return: $XDG_RUNTIME_DIR/cli-bss.sock, ou <répertoire temporaire>/cli-bss-<uid>/cli-bss.sock (répertoire \
+    privé créé par le démon)
+    """
+    runtimeDir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtimeDir:
+        return os.path.join(runtimeDir, "cli-bss.sock")
+    return os.path.join(tempfile.gettempdir(), "cli-bss-%d" % os.getuid(), "cli-bss.sock")
+
+
+def checkOwner(path):
+    """
+    Vérifie qu'un fichier (socket, répertoire) appartient à l'utilisateur courant
+
+    :param path: le chemin du fichier
+    :raises PermissionError: Exception levée si le fichier appartient à un autre utilisateur
+    """
+    if os.stat(path).st_uid != os.getuid():
+        raise PermissionError("%s n'appartient pas à l'utilisateur courant" % path)
+
+
+def _checkPeer(connection, path):
+    if not hasattr(socket, "SO_PEERCRED"):
+        return
+    # identité du processus qui écoute (Linux) : le socket ne peut pas avoir été remplacé entre la vérification
+    # du fichier et la connexion
+    pid, uid, gid = struct.unpack("3i", connection.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED,
+                                                              struct.calcsize("3i")))
+    if uid != os.getuid():
+        raise PermissionError("Le démon écoutant sur %s n'appartient pas à l'utilisateur courant" % path)
+
+
+def sendRequest(request, socketPath=None, timeout=None):
+    """
+    Transmet une opération au démon et attend sa réponse
+
+    :param request: l'opération {"op": nom de l'opération, arguments...}
+    :param socketPath: le chemin du socket du démon (optionnel, par défaut defaultSocketPath())
+    :param timeout: le délai d'attente maximal de la réponse en secondes (optionnel)
+    :return: la réponse du démon {"exitCode": code de sortie, "output": texte à afficher}
+    :raises PermissionError: Exception levée si le socket ou le démon appartient à un autre utilisateur
+    :raises OSError: Exception levée si le démon est injoignable ou ne répond pas
+    """
+    socketPath = socketPath or defaultSocketPath()
+    checkOwner(socketPath)
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.settimeout(timeout)
+        connection.connect(socketPath)
+        _checkPeer(connection, socketPath)
+        connection.sendall((json.dumps(request) + "\n").encode("utf-8"))
+        with connection.makefile("rb") as stream:
+            line = stream.readline()
+    finally:
+        connection.close()
+    if not line:
+        raise ConnectionError("Le démon a fermé la connexion sans répondre")
+    return json.loads(line.decode("utf-8"))
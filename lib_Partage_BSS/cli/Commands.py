@@ -0,0 +1,384 @@
+# -*-coding:utf-8 -*
+"""
+Module regroupant les opérations du client en ligne de commande cli-bss.py. Chaque opération reçoit le dictionnaire
+des arguments (mêmes noms que les options de cli-bss.py) et renvoie un CommandResult, qui peut être affiché sous forme
+de texte ou exporté en JSON (mode batch)::
+
+    result = runCommand("getAccount", {"domain": "x.fr", "email": "user@x.fr"})
+    print(result.message)
+"""
+import io
+import json
+from collections import OrderedDict
+
+from lib_Partage_BSS.models.Account import Account, importJsonAccount
+from lib_Partage_BSS.models.GlobalModel import GlobalModel
+from lib_Partage_BSS import services
+from lib_Partage_BSS.cli.Output import TEXT, parseFields, writeRecords
+
+
+class CommandResult(object):
+    """
+    Résultat d'une opération
+
+    :ivar message: le message destiné à l'utilisateur
+    :ivar value: le modèle ou la liste de modèles renvoyé par l'opération (None si l'opération ne renvoie rien)
+    :ivar itemTitle: le format du titre de chaque élément d'une liste (par exemple "Compte %s :")
+    """
+    def __init__(self, message, value=None, itemTitle=None):
+        self.message = message
+        self.value = value
+        self.itemTitle = itemTitle
+
+
+class CommandError(Exception):
+    """
+    Echec d'une opération dont le message est affiché tel quel par cli-bss.py
+    """
+
+
+class Command(object):
+    """
+    Opération du client en ligne de commande
+
+    :ivar name: le nom de l'opération (et de l'option de cli-bss.py)
+    :ivar function: la fonction recevant le dictionnaire des arguments et renvoyant un CommandResult
+    :ivar required: les arguments obligatoires
+    :ivar help: la description de l'opération
+    """
+    def __init__(self, name, function, required=(), help=""):
+        self.name = name
+        self.function = function
+        self.required = required
+        self.help = help
+
+
+def exportValue(value):
+    """
+    Transforme la valeur d'un CommandResult en données sérialisables en JSON ; les attributs des modèles sont \
+    nommés comme dans les fichiers JSON lus par importJsonAccount
+
+    :param value: un modèle, une liste de modèles ou None
+    :return: un dictionnaire, une liste de dictionnaires ou None
+    """
+    if isinstance(value, list):
+        return [exportValue(item) for item in value]
+    if isinstance(value, GlobalModel):
+        return OrderedDict((key[1:] if key.startswith("_") else key, attribute)
+                           for key, attribute in sorted(value.__dict__.items()) if attribute is not None)
+    return value
+
+
+def formatResult(result, asJson=False):
+    """
+    Met en forme le résultat d'une opération tel qu'affiché par cli-bss.py
+
+    :param result: le CommandResult
+    :param asJson: exporte le modèle renvoyé au format JSON
+    :return: le texte à afficher
+    """
+    if result.value is None:
+        return result.message
+    if isinstance(result.value, list):
+        lines = [result.message]
+        for item in result.value:
+            lines.append(result.itemTitle % item.name)
+            lines.append(item.showAttr())
+        return "\n".join(lines)
+    if asJson:
+        return json.dumps(result.value.__dict__, sort_keys=True, indent=4)
+    return result.message + "\n" + result.value.showAttr()
+
+
+def _path(value):
+    return getattr(value, "name", value)
+
+
+def _aliases(args):
+    return [args["alias"]] if isinstance(args["alias"], str) else list(args["alias"])
+
+
+def _fields(args):
+    fields = args.get("field")
+    if isinstance(fields, dict):
+        return fields
+    return {field[0]: field[1] for field in fields or []}
+
+
+def getAccount(args):
+    account = services.AccountService.getAccount(args["email"])
+    if account is None:
+        return CommandResult("Le compte %s n'existe pas" % args["email"])
+    return CommandResult("Informations sur le compte %s :" % account.name, account)
+
+
+def getAllAccounts(args):
+    if args.get("ldapQuery"):
+        accounts = services.AccountService.getAllAccounts(domain=args["domain"], limit=args.get("limit", 100),
+                                                          ldapQuery=args["ldapQuery"])
+    else:
+        accounts = services.AccountService.getAllAccounts(domain=args["domain"], limit=args.get("limit", 100))
+    return CommandResult("%d comptes retournés :" % len(accounts), accounts, "Compte %s :")
+
+
+def createAccount(args):
+    services.AccountService.createAccount(name=args["email"], userPassword=args["userPassword"],
+                                          cosId=args["cosId"])
+    return CommandResult("Le compte %s a été créé" % args["email"])
+
+
+def createAccountExt(args):
+    if args.get("jsonData"):
+        account = importJsonAccount(_path(args["jsonData"]))
+    else:
+        account = Account(None)
+    fields = _fields(args)
+    if fields:
+        account.fillAccount(fields, allowNameChange=True)
+    account = services.AccountService.createAccountExt(account, args["userPassword"])
+    return CommandResult("Le compte %s a été créé" % account.name, account)
+
+
+def modifyAccount(args):
+    try:
+        account = importJsonAccount(_path(args["jsonData"]))
+    except Exception as err:
+        raise CommandError("Echec chargement fichier JSON %s : %s" % (_path(args["jsonData"]), err))
+    services.AccountService.modifyAccount(account=account)
+    return CommandResult("Le compte %s a été mis à jour" % args["email"])
+
+
+def renameAccount(args):
+    services.AccountService.renameAccount(name=args["email"], newName=args["newEmail"])
+    return CommandResult("Le compte %s a été renommé %s" % (args["email"], args["newEmail"]))
+
+
+def deleteAccount(args):
+    services.AccountService.deleteAccount(args["email"])
+    return CommandResult("Le compte %s a été supprimé" % args["email"])
+
+
+def preDeleteAccount(args):
+    services.AccountService.preDeleteAccount(args["email"])
+    return CommandResult("Le compte %s a été préparé pour une suppression ultérieure" % args["email"])
+
+
+def restorePreDeleteAccount(args):
+    services.AccountService.restorePreDeleteAccount(args["email"])
+    return CommandResult("Le compte %s a été rétabli" % args["email"])
+
+
+def modifyPassword(args):
+    services.AccountService.modifyPassword(name=args["email"], newUserPassword=args["userPassword"])
+    return CommandResult("Le mot de passe du compte %s a été mis à jour" % args["email"])
+
+
+def lockAccount(args):
+    services.AccountService.lockAccount(name=args["email"])
+    return CommandResult("Le compte %s a été vérouillé" % args["email"])
+
+
+def activateAccount(args):
+    services.AccountService.activateAccount(name=args["email"])
+    return CommandResult("Le compte %s a été (ré)activé" % args["email"])
+
+
+def closeAccount(args):
+    services.AccountService.closeAccount(name=args["email"])
+    return CommandResult("Le compte %s a été fermé" % args["email"])
+
+
+def addAccountAlias(args):
+    aliases = _aliases(args)
+    for alias in aliases:
+        services.AccountService.addAccountAlias(name=args["email"], newAlias=alias)
+    return CommandResult("Les aliases %s ont été ajoutés au compte %s" % (aliases, args["email"]))
+
+
+def removeAccountAlias(args):
+    aliases = _aliases(args)
+    for alias in aliases:
+        services.AccountService.removeAccountAlias(name=args["email"], aliasToDelete=alias)
+    return CommandResult("Les aliases %s ont été retirés du compte %s" % (aliases, args["email"]))
+
+
+def modifyAccountAliases(args):
+    aliases = _aliases(args)
+    services.AccountService.modifyAccountAliases(name=args["email"], listOfAliases=aliases)
+    return CommandResult("Les aliases pour le compte %s ont été positionnés à %s" % (args["email"], aliases))
+
+
+def getCos(args):
+    cos = services.COSService.getCOS(args["domain"], args["cosName"], allowStale=bool(args.get("allowStale")))
+    if cos is None:
+        return CommandResult("La classe de service %s n'existe pas" % args["cosName"])
+    return CommandResult("Informations sur la classe de service %s :" % cos.name, cos)
+
+
+def getAllCos(args):
+    allCos = services.COSService.getAllCOS(domain=args["domain"], limit=args.get("limit", 100),
+                                           allowStale=bool(args.get("allowStale")))
+    return CommandResult("%d classes de service retournés :" % len(allCos), allCos, "Classe de service %s :")
+
+
+COMMANDS = OrderedDict((command.name, command) for command in [
+    Command("getAccount", getAccount, ("email",), "rechercher un compte"),
+    Command("createAccount", createAccount, ("email", "userPassword", "cosId"), "créer un compte"),
+    Command("createAccountExt", createAccountExt, ("userPassword",),
+            "créer un compte en spécifiant les paramètres via -f ou --jsonData"),
+    Command("modifyAccount", modifyAccount, ("email", "jsonData"), "mettre à jour un compte"),
+    Command("renameAccount", renameAccount, ("email", "newEmail"), "renommer un compte"),
+    Command("deleteAccount", deleteAccount, ("email",), "supprimer un compte"),
+    Command("preDeleteAccount", preDeleteAccount, ("email",),
+            "pré-supprimer un compte (le compte est fermé et renommé)"),
+    Command("restorePreDeleteAccount", restorePreDeleteAccount, ("email",),
+            "rétablir un compte pré-supprimé (compte fermé et renommé)"),
+    Command("getAllAccounts", getAllAccounts, (), "rechercher tous les comptes du domaine"),
+    Command("modifyPassword", modifyPassword, ("email", "userPassword"),
+            "modifier l'empreinte du mot de passe d'un compte"),
+    Command("lockAccount", lockAccount, ("email",), "vérouiller un compte"),
+    Command("activateAccount", activateAccount, ("email",), "(ré)activer un compte"),
+    Command("closeAccount", closeAccount, ("email",), "fermer un compte"),
+    Command("addAccountAlias", addAccountAlias, ("email", "alias"), "ajoute des aliases à un compte"),
+    Command("removeAccountAlias", removeAccountAlias, ("email", "alias"), "retire des aliases d'un compte"),
+    Command("modifyAccountAliases", modifyAccountAliases, ("email", "alias"),
+            "positionne une liste d'aliases pour un compte (supprime des aliases existants si non mentionnés)"),
+    Command("getCos", getCos, ("cosName",), "rechercher une classe de service"),
+    Command("getAllCos", getAllCos, (), "rechercher toutes les classes de service du domaine"),
+])
+"""Opérations disponibles, dans l'ordre des options de cli-bss.py"""
+
+PRECEDENCE = ("getAllAccounts", "getAccount", "deleteAccount", "preDeleteAccount", "restorePreDeleteAccount",
+              "createAccountExt", "createAccount", "modifyAccount", "renameAccount", "modifyPassword", "lockAccount",
+              "activateAccount", "closeAccount", "addAccountAlias", "removeAccountAlias", "modifyAccountAliases",
+              "getCos", "getAllCos")
+"""Ordre dans lequel cli-bss.py retient une opération lorsque plusieurs options d'opération sont passées"""
+
+
+def selectCommand(args):
+    """
+    :param args: le dictionnaire des arguments de cli-bss.py
+    :return: le nom de l'opération demandée (la première selon PRECEDENCE), ou None si aucune opération n'est demandée
+    """
+    for name in PRECEDENCE:
+        if args.get(name):
+            return name
+    return None
+
+
+def checkArguments(name, args):
+    """
+    Vérifie qu'une opération existe et que ses arguments obligatoires sont présents
+
+    :param name: le nom de l'opération
+    :param args: le dictionnaire des arguments
+    :return: la Command
+    :raises ValueError: Exception levée si l'opération est inconnue, si un argument obligatoire est manquant ou si \
+    --fields est passé sans --format ni --all
+    """
+    if name not in COMMANDS:
+        raise ValueError("Opération inconnue : %s" % name)
+    command = COMMANDS[name]
+    for argument in command.required:
+        if not args.get(argument):
+            raise ValueError("Argument '--%s' manquant" % argument)
+    if args.get("fields") and not isStreamed(args):
+        raise ValueError("L'argument '--fields' nécessite '--format' ou '--all'")
+    return command
+
+
+def runCommand(name, args):
+    """
+    Exécute une opération
+
+    :param name: le nom de l'opération
+    :param args: le dictionnaire des arguments
+    :return: le CommandResult
+    :raises ValueError: Exception levée si l'opération est inconnue ou si un argument obligatoire est manquant
+    """
+    return checkArguments(name, args).function(args)
+
+
+LISTINGS = OrderedDict([
+    ("getAllAccounts", "Compte %s :"),
+    ("getAllCos", "Classe de service %s :"),
+])
+"""Opérations de recherche et format du titre de chaque modèle renvoyé"""
+
+
+def iterPages(name, args):
+    """
+    Renvoie au fur et à mesure les modèles renvoyés par une opération, page par page. Avec l'argument all, les
+    recherches parcourent tout le domaine par pages de limit modèles (voir AccountService.iterAccountPages et
+    COSService.iterCOSPages).
+
+    :param name: le nom de l'opération
+    :param args: le dictionnaire des arguments
+    :return: un générateur des pages (listes de modèles)
+    :raises ValueError: Exception levée si l'opération est inconnue ou si un argument obligatoire est manquant
+    """
+    command = checkArguments(name, args)
+    limit = args.get("limit") or 100
+    if name == "getAllAccounts":
+        pages = services.AccountService.iterAccountPages(args["domain"], limit, args.get("ldapQuery") or "")
+    elif name == "getAllCos":
+        pages = services.COSService.iterCOSPages(args["domain"], limit, allowStale=bool(args.get("allowStale")))
+    else:
+        value = command.function(args).value
+        if value is not None:
+            yield value if isinstance(value, list) else [value]
+        return
+    if not args.get("all"):
+        # une seule page de limit modèles
+        pages = [next(pages)]
+    for page in pages:
+        yield page
+
+
+def streamCommand(name, args, stream):
+    """
+    Exécute une opération en écrivant les modèles renvoyés au fil de l'eau, dans le format args["format"] (voir \
+    Output) restreint aux champs args["fields"]
+
+    :param name: le nom de l'opération
+    :param args: le dictionnaire des arguments
+    :param stream: le flux de sortie
+    :return: le nombre de modèles écrits
+    :raises ValueError: Exception levée si l'opération est inconnue ou si un argument obligatoire est manquant
+    """
+    fields = args.get("fields")
+    return writeRecords(iterPages(name, args), stream, args.get("format") or TEXT,
+                        parseFields(fields) if isinstance(fields, str) else fields, LISTINGS.get(name))
+
+
+def isStreamed(args):
+    """
+    :param args: le dictionnaire des arguments
+    :return: True si le résultat doit être écrit au fil de l'eau (format autre que text, ou all)
+    """
+    return (args.get("format") or TEXT) != TEXT or bool(args.get("all"))
+
+
+def executeCommand(name, args):
+    """
+    Exécute une opération comme cli-bss.py
+
+    :param name: le nom de l'opération
+    :param args: le dictionnaire des arguments (asJson pour exporter le modèle renvoyé au format JSON)
+    :return: le texte à afficher et le code de sortie (0 : succès, 1 : argument manquant, 2 : échec d'exécution)
+    """
+    try:
+        command = checkArguments(name, args)
+    except ValueError as err:
+        return str(err), 1
+    try:
+        if isStreamed(args):
+            output = io.StringIO()
+            streamCommand(name, args, output)
+            return output.getvalue().rstrip("\n"), 0
+        result = command.function(args)
+    except CommandError as err:
+        return str(err), 2
+    except Exception as err:
+        return "Echec d'exécution : %s" % err, 2
+    return formatResult(result, args.get("asJson")), 0
@@ -0,0 +1,210 @@
+# -*-coding:utf-8 -*
+"""
+Module implémentant le démon de cli-bss.py ("cli-bss.py serve") : un processus de longue durée qui exécute les
+opérations reçues sur un socket Unix, en conservant d'une requête à l'autre les connexions HTTP vers l'API, les
+tokens (renouvelés avant leur expiration) et les classes de service lues. Le protocole est une ligne JSON par
+requête ({"op": nom de l'opération, arguments...}) et une ligne JSON par réponse ({"exitCode": ..., "output": ...}),
+voir Client. Le socket n'est accessible qu'à l'utilisateur ayant lancé le démon : il est créé dans un répertoire
+privé (0700) puis déplacé à son emplacement définitif, sans modifier le umask du processus::
+
+    Daemon(domains=["x.fr"]).serveForever()
+"""
+import json
+import logging
+import os
+import shutil
+import socket
+import tempfile
+import threading
+from collections import OrderedDict
+from socketserver import StreamRequestHandler, ThreadingMixIn, UnixStreamServer
+
+from lib_Partage_BSS.cli.Client import checkOwner, defaultSocketPath
+from lib_Partage_BSS.cli.Commands import executeCommand
+from lib_Partage_BSS.services.BSSConnexionService import BSSConnexion
+from lib_Partage_BSS.utils.BSSRequest import getTransport, sessionTransport, setTransport
+from lib_Partage_BSS.utils.Log import getLogger, logEvent
+
+STALE_COMMANDS = ("getCos", "getAllCos")
+"""Opérations servies depuis la copie locale des classes de service (voir COSService.configureCOSSnapshot)"""
+
+_log = getLogger("cli")
+
+
+class _Server(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+
+class _Handler(StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            response = self.server.bssDaemon.handle(line)
+            self.wfile.write((json.dumps(response, ensure_ascii=False) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+
+class Daemon(object):
+    """
+    Démon exécutant les opérations de cli-bss.py reçues sur un socket Unix
+
+    :ivar socketPath: le chemin du socket
+    :ivar domains: les domaines dont les tokens sont maintenus valides
+    :ivar tokenRefresh: l'intervalle en secondes entre deux vérifications des tokens
+    :ivar defaults: les valeurs par défaut des arguments des opérations
+    :ivar requestCount: le nombre de requêtes traitées
+    """
+    def __init__(self, socketPath=None, domains=(), tokenRefresh=15, defaults=None):
+        self.socketPath = socketPath or defaultSocketPath()
+        self.domains = list(domains)
+        self.tokenRefresh = tokenRefresh
+        self.defaults = dict(defaults or {})
+        self.requestCount = 0
+        self._server = None
+        self._threads = []
+        self._stopped = threading.Event()
+        self._previousTransport = None
+        self._lock = threading.Lock()
+
+    def handle(self, line):
+        """
+        Exécute une requête
+
+        :param line: la requête au format JSON
+        :return: la réponse {"exitCode": code de sortie de cli-bss.py, "output": texte à afficher}
+        """
+        with self._lock:
+            self.requestCount += 1
+        try:
+            request = json.loads(line.decode("utf-8") if isinstance(line, bytes) else line)
+            if not isinstance(request, dict):
+                raise ValueError("un objet JSON est attendu")
+        except ValueError as err:
+            return OrderedDict([("exitCode", 1), ("output", "Requête invalide : %s" % err)])
+        name = request.pop("op", None)
+        args = dict(self.defaults)
+        args.update(request)
+        if name in STALE_COMMANDS:
+            args["allowStale"] = True
+        output, exitCode = executeCommand(name, args)
+        return OrderedDict([("exitCode", exitCode), ("output", output)])
+
+    def warmTokens(self):
+        """
+        Obtient ou renouvelle si nécessaire le token de chacun des domaines
+        """
+        for domain in self.domains:
+            try:
+                BSSConnexion().token(domain)
+            except Exception as err:
+                logEvent(_log, logging.WARNING, "renouvellement du token impossible", domain=domain, error=str(err))
+
+    def _refreshTokens(self):
+        while not self._stopped.wait(self.tokenRefresh):
+            self.warmTokens()
+
+    def _removeStaleSocket(self):
+        if not os.path.exists(self.socketPath):
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.socketPath)
+        except OSError:
+            os.unlink(self.socketPath)
+            return
+        finally:
+            probe.close()
+        raise OSError("Un démon écoute déjà sur " + self.socketPath)
+
+    def _prepareDirectory(self):
+        directory = os.path.dirname(os.path.abspath(self.socketPath))
+        if not os.path.isdir(directory):
+            os.makedirs(directory, 0o700)
+        checkOwner(directory)
+        if os.stat(directory).st_mode & 0o022:
+            raise PermissionError("Le répertoire %s est modifiable par d'autres utilisateurs" % directory)
+        return directory
+
+    def _bind(self):
+        directory = self._prepareDirectory()
+        self._removeStaleSocket()
+        # mkdtemp crée un répertoire 0700 : le socket n'est jamais joignable par un autre utilisateur, même avant
+        # le chmod ; le renommage le place ensuite de façon atomique
+        privateDir = tempfile.mkdtemp(dir=directory)
+        try:
+            privatePath = os.path.join(privateDir, "socket")
+            self._server = _Server(privatePath, _Handler)
+            os.chmod(privatePath, 0o600)
+            os.rename(privatePath, self.socketPath)
+        except Exception:
+            if self._server is not None:
+                self._server.server_close()
+                self._server = None
+            raise
+        finally:
+            shutil.rmtree(privateDir, ignore_errors=True)
+        self._server.bssDaemon = self
+        self._stopped.clear()
+        self._previousTransport = getTransport()
+        setTransport(sessionTransport())
+        self.warmTokens()
+        self._startThread(self._refreshTokens)
+
+    def _startThread(self, target):
+        thread = threading.Thread(target=target)
+        thread.daemon = True
+        thread.start()
+        self._threads.append(thread)
+
+    def start(self):
+        """
+        Démarre le démon dans des threads en arrière-plan
+
+        :return: le démon
+        :raises OSError: Exception levée si le socket ne peut être créé ou si un démon l'utilise déjà
+        """
+        self._bind()
+        self._startThread(self._server.serve_forever)
+        return self
+
+    def serveForever(self):
+        """
+        Exécute le démon dans le thread courant, jusqu'à une interruption (KeyboardInterrupt, SystemExit)
+
+        :raises OSError: Exception levée si le socket ne peut être créé ou si un démon l'utilise déjà
+        """
+        self._bind()
+        logEvent(_log, logging.INFO, "démon démarré", socket=self.socketPath)
+        try:
+            self._server.serve_forever()
+        finally:
+            self._close()
+
+    def stop(self):
+        """
+        Arrête le démon et supprime le socket
+        """
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._close()
+
+    def _close(self):
+        self._stopped.set()
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join()
+        self._threads = []
+        self._server.server_close()
+        self._server = None
+        setTransport(self._previousTransport)
+        if os.path.exists(self.socketPath):
+            os.unlink(self.socketPath)
+        logEvent(_log, logging.INFO, "démon arrêté", socket=self.socketPath, requests=self.requestCount)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, excType, excValue, traceback):
+        self.stop()
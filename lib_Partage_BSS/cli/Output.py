@@ -0,0 +1,130 @@
+# -*-coding:utf-8 -*
+"""
+Module permettant d'écrire les modèles renvoyés par les opérations de cli-bss.py au fil de l'eau, dans un format
+exploitable par d'autres outils (une ligne par modèle) :
+
+- text : le format historique de cli-bss.py (titre puis showAttr) ;
+- jsonl : un objet JSON par ligne ;
+- csv, tsv : une ligne d'en-tête puis une ligne par modèle ; les valeurs multiples sont séparées par des virgules.
+
+Les modèles sont écrits page par page (voir Commands.iterPages) : le flux de sortie est vidé après chaque page, sans
+attendre la fin de la recherche, et la mémoire utilisée ne dépend pas du nombre de modèles::
+
+    writeRecords(iterPages("getAllAccounts", args), sys.stdout, "csv", ["name", "zimbraAccountStatus"])
+"""
+import csv
+import json
+from collections import OrderedDict
+
+TEXT = "text"
+JSONL = "jsonl"
+CSV = "csv"
+TSV = "tsv"
+FORMATS = (TEXT, JSONL, CSV, TSV)
+"""Formats de sortie disponibles"""
+
+
+def parseFields(text):
+    """
+    :param text: une liste de champs séparés par des virgules ("name,displayName")
+    :return: la liste des champs, ou None si text est vide
+    """
+    fields = [field.strip() for field in (text or "").split(",") if field.strip()]
+    return fields or None
+
+
+def modelFields(model):
+    """
+    :param model: un modèle (Account, COS)
+    :return: les noms des attributs du modèle, tels qu'exportés par Commands.exportValue
+    """
+    return [key[1:] if key.startswith("_") else key for key in model.__dict__]
+
+
+def _attribute(model, field):
+    return model.__dict__.get("_" + field, model.__dict__.get(field))
+
+
+def _cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, (list, tuple)):
+        return ",".join(str(item) for item in value)
+    return str(value)
+
+
+class RecordWriter(object):
+    """
+    Écrit des modèles dans un flux
+
+    :ivar stream: le flux de sortie
+    :ivar format: le format de sortie (voir FORMATS)
+    :ivar fields: les champs écrits (None : tous les champs non vides en jsonl, tous les champs du premier modèle \
+    en csv et tsv)
+    :ivar itemTitle: le format du titre de chaque modèle au format text (par exemple "Compte %s :")
+    :ivar count: le nombre de modèles écrits
+    """
+    def __init__(self, stream, format=JSONL, fields=None, itemTitle=None):
+        if format not in FORMATS:
+            raise ValueError("Format inconnu : %s (disponibles : %s)" % (format, ", ".join(FORMATS)))
+        self.stream = stream
+        self.format = format
+        self.fields = list(fields) if fields else None
+        self.itemTitle = itemTitle
+        self.count = 0
+        self._csv = None
+
+    def _writeCsv(self, model):
+        if self._csv is None:
+            self._csv = csv.writer(self.stream, delimiter="\t" if self.format == TSV else ",", lineterminator="\n")
+            if self.fields is None:
+                self.fields = modelFields(model)
+            self._csv.writerow(self.fields)
+        self._csv.writerow([_cell(_attribute(model, field)) for field in self.fields])
+
+    def write(self, model):
+        """
+        Écrit un modèle
+
+        :param model: le modèle
+        """
+        if self.format == JSONL:
+            if self.fields is None:
+                record = OrderedDict((field, value) for field, value in
+                                     ((field, _attribute(model, field)) for field in modelFields(model))
+                                     if value is not None)
+            else:
+                record = OrderedDict((field, _attribute(model, field)) for field in self.fields)
+            self.stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+        elif self.format == TEXT:
+            self.stream.write((self.itemTitle or "%s") % model.name + "\n" + model.showAttr() + "\n")
+        else:
+            self._writeCsv(model)
+        self.count += 1
+
+    def writePage(self, models):
+        """
+        Écrit une page de modèles puis vide le flux de sortie
+
+        :param models: les modèles
+        """
+        for model in models:
+            self.write(model)
+        self.stream.flush()
+
+
+def writeRecords(pages, stream, format=JSONL, fields=None, itemTitle=None):
+    """
+    Écrit des pages de modèles au fil de l'eau
+
+    :param pages: les pages de modèles (par exemple Commands.iterPages)
+    :param stream: le flux de sortie
+    :param format: le format de sortie (voir FORMATS)
+    :param fields: les champs écrits (optionnel)
+    :param itemTitle: le format du titre de chaque modèle au format text (optionnel)
+    :return: le nombre de modèles écrits
+    """
+    writer = RecordWriter(stream, format, fields, itemTitle)
+    for page in pages:
+        writer.writePage(page)
+    return writer.count
@@ -0,0 +1 @@
+"""Package cli"""
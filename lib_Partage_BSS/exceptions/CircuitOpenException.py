@@ -0,0 +1,13 @@
+# -*-coding:utf-8 -*
+class CircuitOpenException(Exception):
+    """
+    Exception levée lorsqu'un appel est refusé car le disjoncteur du domaine (ou de l'authentification) est ouvert
+
+    :ivar name: nom du disjoncteur (domaine ou Auth)
+    :ivar retryAfter: délai en secondes avant la prochaine tentative autorisée
+    :ivar message: message à afficher
+    """
+    def __init__(self, name, retryAfter):
+        self.name = name
+        self.retryAfter = retryAfter
+        self.msg = name + " : API indisponible, nouvel essai possible dans " + str(round(retryAfter, 1)) + "s"
@@ -0,0 +1,9 @@
+# -*-coding:utf-8 -*
+class DeadlineExceededException(Exception):
+    """
+    Exception levée lorsque le temps alloué à une opération (voir utils.Deadline) est écoulé
+
+    :ivar message: message à afficher
+    """
+    def __init__(self, message):
+        self.msg = message
@@ -1,5 +1,4 @@
 # -*-coding:utf-8 -*
-from lib_Partage_BSS import utils
 class ServiceException(Exception):
     """
     Exception levée lorsqu'un appel à l'API échoue
@@ -8,5 +7,7 @@ class ServiceException(Exception):
     :ivar message: message à afficher
     """
     def __init__(self,code, message):
-        self.code = utils.changeToInt(code)
-        self.msg = str(utils.changeToInt(code))+" : "+message
+        # import différé : le package utils dépend lui-même du package exceptions
+        from lib_Partage_BSS import utils
+        self.code = code if isinstance(code, int) else utils.changeToInt(code)
+        self.msg = str(self.code)+" : "+message
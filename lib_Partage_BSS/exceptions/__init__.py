@@ -3,3 +3,5 @@ from .ServiceException import ServiceException
 from .NameException import NameException
 from .BSSConnexionException import BSSConnexionException
 from .DomainException import DomainException
+from .CircuitOpenException import CircuitOpenException
+from .DeadlineExceededException import DeadlineExceededException
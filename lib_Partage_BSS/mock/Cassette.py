@@ -0,0 +1,267 @@
+# -*-coding:utf-8 -*
+"""
+Module permettant d'enregistrer les échanges avec l'API BSS (cassette) puis de les rejouer sans accès au réseau,
+comme transport de postBSS (voir BSSRequest.setTransport). Les tokens, les preauth et les mots de passe sont masqués
+dans la cassette, qui peut ainsi être conservée avec les tests de non régression et les benchmarks::
+
+    with recording("cassettes/migration.json"):
+        AccountService.getAllAccounts("domain.com")
+
+    with replaying("cassettes/migration.json", timing=True):
+        AccountService.getAllAccounts("domain.com")
+
+Au rejeu, une requête est associée au premier échange enregistré non encore rejoué ayant la même méthode et les
+mêmes paramètres (hors timestamp, preauth et champs masqués) ; le token et l'url du serveur sont ignorés.
+"""
+import json
+import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from time import monotonic, sleep
+
+from lib_Partage_BSS.utils.BSSRequest import getTransport, setTransport
+
+REDACTED = "REDACTED"
+"""Valeur remplaçant les informations sensibles dans la cassette"""
+
+SECRET_FIELDS = ("preauth", "password", "userPassword")
+"""Paramètres des requêtes masqués dans la cassette"""
+
+VOLATILE_FIELDS = ("timestamp", "preauth")
+"""Paramètres des requêtes ignorés pour associer une requête à un échange enregistré"""
+
+_SECRET_TAGS = re.compile(r"<(token|password|userPassword)((?:\s[^>]*)?)>[^<]*</\1>")
+
+VERSION = 1
+"""Version du format des cassettes"""
+
+
+def methodOf(url):
+    """
+    Extrait le nom de la méthode de l'API d'une url BSS (.../Auth ou .../<méthode>/<token>)
+
+    :param url: l'url de la requête
+    :return: le nom de la méthode
+    """
+    segments = url.rstrip("/").split("/")
+    if segments[-1] == "Auth" or len(segments) < 2:
+        return segments[-1]
+    return segments[-2]
+
+
+def redactData(data):
+    """
+    :param data: les paramètres d'une requête
+    :return: une copie des paramètres dont les champs sensibles sont masqués, triée par nom
+    """
+    return OrderedDict((key, REDACTED if key in SECRET_FIELDS else data[key]) for key in sorted(data or {}))
+
+
+def redactResponse(text):
+    """
+    :param text: le XML d'une réponse de l'API
+    :return: le XML dont les tokens et les mots de passe sont masqués
+    """
+    return _SECRET_TAGS.sub(lambda match: "<{0}{1}>{2}</{0}>".format(match.group(1), match.group(2), REDACTED),
+                            text)
+
+
+def _matchKey(method, data):
+    return json.dumps([method, [[key, value] for key, value in data.items() if key not in VOLATILE_FIELDS]],
+                      sort_keys=True)
+
+
+class ReplayedResponse(object):
+    """
+    Réponse HTTP rejouée depuis une cassette
+
+    :ivar status_code: le code HTTP enregistré
+    :ivar text: le corps de la réponse
+    """
+    def __init__(self, text, status_code=200):
+        self.text = text
+        self.status_code = status_code
+
+    @property
+    def content(self):
+        return self.text.encode("utf-8")
+
+
+class Cassette(object):
+    """
+    Ensemble d'échanges avec l'API BSS
+
+    :ivar interactions: les échanges, dans l'ordre d'enregistrement ; chaque échange est un dictionnaire \
+    (method, data, status, response, duration)
+    """
+    def __init__(self, interactions=None):
+        self.interactions = list(interactions or [])
+        self._positions = {}
+        self._index = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.interactions)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Lit une cassette
+
+        :param path: le chemin du fichier JSON
+        :return: la Cassette
+        :raises ValueError: Exception levée si la version du fichier n'est pas prise en charge
+        """
+        with open(path, encoding="utf-8") as stream:
+            content = json.load(stream, object_pairs_hook=OrderedDict)
+        if content.get("version") != VERSION:
+            raise ValueError("Version de cassette non prise en charge : " + str(content.get("version")))
+        return cls(content["interactions"])
+
+    def save(self, path):
+        """
+        Écrit la cassette
+
+        :param path: le chemin du fichier JSON
+        """
+        with self._lock:
+            content = OrderedDict([("version", VERSION), ("interactions", self.interactions)])
+        with open(path, "w", encoding="utf-8") as stream:
+            json.dump(content, stream, indent=1, ensure_ascii=False)
+            stream.write("\n")
+
+    def add(self, url, data, httpResponse, duration):
+        """
+        Ajoute un échange, en masquant les informations sensibles
+
+        :param url: l'url de la requête
+        :param data: les paramètres de la requête
+        :param httpResponse: la réponse HTTP obtenue
+        :param duration: la durée de l'échange en secondes
+        """
+        interaction = OrderedDict([("method", methodOf(url)), ("data", redactData(data)),
+                                   ("status", getattr(httpResponse, "status_code", 200)),
+                                   ("response", redactResponse(httpResponse.text)),
+                                   ("duration", round(duration, 6))])
+        with self._lock:
+            self.interactions.append(interaction)
+            self._index = None
+
+    def recorder(self, transport=None):
+        """
+        Renvoie un transport qui enregistre dans la cassette les échanges effectués par un autre transport
+
+        :param transport: le transport effectuant les requêtes (optionnel, par défaut le transport courant)
+        :return: la fonction transport(url, data, timeout)
+        """
+        transport = transport if transport is not None else getTransport()
+
+        def record(url, data, timeout):
+            start = monotonic()
+            httpResponse = transport(url, data, timeout)
+            self.add(url, data, httpResponse, monotonic() - start)
+            return httpResponse
+        return record
+
+    def rewind(self):
+        """
+        Permet de rejouer à nouveau tous les échanges
+        """
+        with self._lock:
+            self._positions = {}
+
+    def find(self, url, data):
+        """
+        Renvoie le prochain échange enregistré correspondant à une requête
+
+        :param url: l'url de la requête
+        :param data: les paramètres de la requête
+        :return: l'échange
+        :raises LookupError: Exception levée si aucun échange restant ne correspond
+        """
+        method = methodOf(url)
+        key = _matchKey(method, redactData(data))
+        with self._lock:
+            if self._index is None:
+                self._index = {}
+                for interaction in self.interactions:
+                    self._index.setdefault(_matchKey(interaction["method"], interaction["data"]), []).append(
+                        interaction)
+            candidates = self._index.get(key, [])
+            position = self._positions.get(key, 0)
+            if position < len(candidates):
+                self._positions[key] = position + 1
+                return candidates[position]
+        raise LookupError("Aucun échange enregistré pour " + method + " " + json.dumps(redactData(data)))
+
+    def player(self, timing=False, speed=1.0, loop=False):
+        """
+        Renvoie un transport qui rejoue les échanges de la cassette
+
+        :param timing: attend la durée enregistrée de chaque échange ; un échange plus long que le délai d'attente \
+        de la requête lève requests.exceptions.ReadTimeout
+        :param speed: le facteur d'accélération des durées enregistrées (2.0 : deux fois plus vite)
+        :param loop: recommence au début lorsque tous les échanges correspondant à une requête ont été rejoués \
+        (pour les benchmarks)
+        :return: la fonction transport(url, data, timeout)
+        """
+        def play(url, data, timeout):
+            try:
+                interaction = self.find(url, data)
+            except LookupError:
+                if not loop:
+                    raise
+                with self._lock:
+                    self._positions.pop(_matchKey(methodOf(url), redactData(data)), None)
+                interaction = self.find(url, data)
+            if timing:
+                delay = interaction["duration"] / speed
+                if timeout is not None and delay > timeout:
+                    # même exception que requests, pour être rejouée (Retry) et comptée par le disjoncteur
+                    import requests
+                    sleep(timeout)
+                    raise requests.exceptions.ReadTimeout("Délai d'attente dépassé pour " + interaction["method"])
+                sleep(delay)
+            return ReplayedResponse(interaction["response"], interaction["status"])
+        return play
+
+
+@contextmanager
+def recording(path, transport=None):
+    """
+    Enregistre dans une cassette les échanges effectués dans le bloc ; la cassette est écrite à la fin du bloc
+
+    :param path: le chemin du fichier JSON
+    :param transport: le transport effectuant les requêtes (optionnel, par défaut le transport courant)
+    :return: la Cassette
+    """
+    cassette = Cassette()
+    previous = getTransport()
+    setTransport(cassette.recorder(transport if transport is not None else previous))
+    try:
+        yield cassette
+    finally:
+        setTransport(previous)
+        cassette.save(path)
+
+
+@contextmanager
+def replaying(cassette, timing=False, speed=1.0, loop=False):
+    """
+    Rejoue les échanges d'une cassette pour les requêtes effectuées dans le bloc, sans accès au réseau
+
+    :param cassette: la Cassette ou le chemin du fichier JSON
+    :param timing: attend la durée enregistrée de chaque échange
+    :param speed: le facteur d'accélération des durées enregistrées
+    :param loop: recommence au début lorsque les échanges correspondant à une requête sont épuisés
+    :return: la Cassette
+    """
+    if not isinstance(cassette, Cassette):
+        cassette = Cassette.load(cassette)
+    previous = getTransport()
+    setTransport(cassette.player(timing, speed, loop))
+    try:
+        yield cassette
+    finally:
+        setTransport(previous)
@@ -0,0 +1,311 @@
+# -*-coding:utf-8 -*
+"""
+Module permettant de rejouer un mélange d'opérations AccountService et COSService sur un domaine, à une concurrence
+ou un débit donné, pour estimer la durée d'une migration (par exemple sur le serveur simulé MockBSSServer)::
+
+    operations = standardOperations("domain.com", cosId="cosId")
+    report = runLoad(operations, [("create", 30000), ("modify", 50000), ("close", 5000)], concurrency=16)
+    print(report.format())
+
+Le rapport donne, pour chaque opération, le débit, les percentiles de latence et le taux d'erreur.
+"""
+import math
+import random
+import threading
+from collections import OrderedDict
+from time import monotonic
+
+from lib_Partage_BSS.models.Account import Account
+from lib_Partage_BSS.services import AccountService, COSService
+from lib_Partage_BSS.utils.RateLimiter import TokenBucket
+
+PERCENTILES = (50, 90, 95, 99)
+"""Percentiles de latence calculés par le rapport"""
+
+
+def parseMix(text):
+    """
+    Transforme une description de mélange "create=30000,modify=50000,close=5000" en liste de (opération, nombre)
+
+    :param text: la description du mélange
+    :return: la liste des (opération, nombre), dans l'ordre de la description
+    :raises ValueError: Exception levée si la description est mal formée
+    """
+    mix = []
+    for part in text.split(","):
+        if not part.strip():
+            continue
+        name, sep, count = part.partition("=")
+        if not sep or not count.strip().isdigit():
+            raise ValueError("Mélange mal formé : " + part + " (format attendu : operation=nombre)")
+        mix.append((name.strip(), int(count)))
+    return mix
+
+
+class AccountPool(object):
+    """
+    Ensemble des comptes disponibles pour les opérations portant sur un compte existant
+    """
+    def __init__(self, names=()):
+        self._names = list(names)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._names)
+
+    def add(self, name):
+        with self._lock:
+            self._names.append(name)
+
+    def choose(self):
+        """
+        :return: un compte choisi au hasard, qui reste disponible
+        :raises LookupError: Exception levée si aucun compte n'est disponible
+        """
+        with self._lock:
+            if not self._names:
+                raise LookupError("Aucun compte disponible")
+            return random.choice(self._names)
+
+    def take(self):
+        """
+        :return: un compte choisi au hasard, retiré de l'ensemble
+        :raises LookupError: Exception levée si aucun compte n'est disponible
+        """
+        with self._lock:
+            if not self._names:
+                raise LookupError("Aucun compte disponible")
+            return self._names.pop(random.randrange(len(self._names)))
+
+
+def standardOperations(domain, cosId="", cosName=None, prefix="loadtest", pool=None,
+                       userPassword="{SSHA}loadtest"):
+    """
+    Construit les opérations usuelles sur un domaine. Chaque opération reçoit le numéro de l'appel.
+
+    - create : crée le compte <prefix><numéro>@domain (ajouté aux comptes disponibles)
+    - get, modify, lock, activate : lit ou modifie un compte disponible
+    - close, delete : ferme ou supprime un compte disponible (retiré des comptes disponibles)
+    - list, listCos, getCos : recherche des comptes, des classes de service, ou lit la classe de service cosName
+
+    :param domain: le domaine cible
+    :param cosId: l'identifiant de la classe de service des comptes créés
+    :param cosName: le nom de la classe de service lue par getCos (optionnel)
+    :param prefix: le préfixe des comptes créés
+    :param pool: les comptes disponibles (AccountPool, optionnel)
+    :param userPassword: l'empreinte du mot de passe des comptes créés
+    :return: un dictionnaire {nom de l'opération: fonction}
+    """
+    pool = pool if pool is not None else AccountPool()
+    run = "{0:x}".format(random.getrandbits(24))
+
+    def create(index):
+        name = "{0}-{1}-{2}@{3}".format(prefix, run, index, domain)
+        AccountService.createAccount(name, userPassword, cosId)
+        pool.add(name)
+
+    def modify(index):
+        account = Account(pool.choose())
+        account.displayName = "Load test " + str(index)
+        AccountService.modifyAccount(account)
+
+    return OrderedDict([
+        ("create", create),
+        ("get", lambda index: AccountService.getAccount(pool.choose())),
+        ("modify", modify),
+        ("lock", lambda index: AccountService.lockAccount(pool.choose())),
+        ("activate", lambda index: AccountService.activateAccount(pool.choose())),
+        ("close", lambda index: AccountService.closeAccount(pool.take())),
+        ("delete", lambda index: AccountService.deleteAccount(pool.take())),
+        ("list", lambda index: AccountService.getAllAccounts(domain)),
+        ("listCos", lambda index: COSService.getAllCOS(domain)),
+        ("getCos", lambda index: COSService.getCOS(domain, cosName)),
+    ])
+
+
+class OperationStats(object):
+    """
+    Mesures d'une opération
+
+    :ivar name: le nom de l'opération
+    :ivar latencies: les durées des appels réussis et en erreur, en secondes
+    :ivar errors: le nombre d'appels en erreur par type d'exception
+    :ivar started: le début du premier appel (time.monotonic)
+    :ivar finished: la fin du dernier appel (time.monotonic)
+    """
+    def __init__(self, name):
+        self.name = name
+        self.latencies = []
+        self.errors = OrderedDict()
+        self.started = None
+        self.finished = None
+
+    @property
+    def count(self):
+        return len(self.latencies)
+
+    @property
+    def errorCount(self):
+        return sum(self.errors.values())
+
+    @property
+    def errorRate(self):
+        return float(self.errorCount) / self.count if self.count else 0.0
+
+    @property
+    def throughput(self):
+        """
+        :return: le nombre d'appels par seconde entre le début du premier appel et la fin du dernier
+        """
+        if not self.count or self.finished <= self.started:
+            return 0.0
+        return self.count / (self.finished - self.started)
+
+    def percentile(self, percent):
+        """
+        :param percent: le percentile (de 0 à 100)
+        :return: la latence en secondes sous laquelle se trouvent percent % des appels
+        """
+        if not self.latencies:
+            return 0.0
+        latencies = sorted(self.latencies)
+        rank = max(0, min(len(latencies) - 1, int(math.ceil(percent / 100.0 * len(latencies))) - 1))
+        return latencies[rank]
+
+    def summary(self):
+        """
+        :return: un dictionnaire des mesures de l'opération
+        """
+        summary = OrderedDict([("operation", self.name), ("count", self.count), ("errors", self.errorCount),
+                               ("errorRate", self.errorRate), ("throughput", self.throughput)])
+        for percent in PERCENTILES:
+            summary["p" + str(percent)] = self.percentile(percent)
+        summary["max"] = max(self.latencies) if self.latencies else 0.0
+        summary["errorTypes"] = dict(self.errors)
+        return summary
+
+
+class LoadReport(object):
+    """
+    Rapport d'une exécution de runLoad
+
+    :ivar operations: les mesures par opération {nom: OperationStats}
+    :ivar duration: la durée totale de l'exécution en secondes
+    :ivar concurrency: le nombre d'appels simultanés
+    :ivar rate: le débit cible en appels par seconde (None : pas de limite)
+    """
+    def __init__(self, concurrency, rate):
+        self.operations = OrderedDict()
+        self.duration = 0.0
+        self.concurrency = concurrency
+        self.rate = rate
+
+    @property
+    def count(self):
+        return sum(stats.count for stats in self.operations.values())
+
+    @property
+    def throughput(self):
+        return self.count / self.duration if self.duration else 0.0
+
+    def summary(self):
+        """
+        :return: un dictionnaire du rapport (sérialisable en JSON)
+        """
+        return OrderedDict([("duration", self.duration), ("count", self.count), ("throughput", self.throughput),
+                            ("concurrency", self.concurrency), ("rate", self.rate),
+                            ("operations", [stats.summary() for stats in self.operations.values()])])
+
+    def format(self):
+        """
+        :return: le rapport sous forme de tableau texte (latences en millisecondes)
+        """
+        header = ["operation", "count", "errors", "err%", "ops/s"] + ["p" + str(p) for p in PERCENTILES] + ["max"]
+        rows = [header]
+        for stats in self.operations.values():
+            summary = stats.summary()
+            rows.append([stats.name, str(stats.count), str(stats.errorCount), "{0:.2f}".format(100 * stats.errorRate),
+                         "{0:.1f}".format(stats.throughput)]
+                        + ["{0:.1f}".format(1000 * summary["p" + str(p)]) for p in PERCENTILES]
+                        + ["{0:.1f}".format(1000 * summary["max"])])
+        widths = [max(len(row[column]) for row in rows) for column in range(len(header))]
+        lines = ["  ".join(cell.rjust(width) if column else cell.ljust(width)
+                           for column, (cell, width) in enumerate(zip(row, widths))) for row in rows]
+        lines.append("")
+        lines.append("Total : {0} appels en {1:.1f} s, {2:.1f} appels/s (concurrence {3}, débit cible {4})".format(
+            self.count, self.duration, self.throughput, self.concurrency,
+            "aucun" if self.rate is None else "{0} appels/s".format(self.rate)))
+        for stats in self.operations.values():
+            if stats.errors:
+                lines.append(stats.name + " : " + ", ".join("{0} x{1}".format(error, count)
+                                                           for error, count in stats.errors.items()))
+        return "\n".join(lines)
+
+
+def _runPhase(operations, tasks, concurrency, bucket, report):
+    tasks = list(tasks)
+    lock = threading.Lock()
+    position = [0]
+
+    def worker():
+        while True:
+            with lock:
+                if position[0] >= len(tasks):
+                    return
+                name, index = tasks[position[0]]
+                position[0] += 1
+            if bucket is not None:
+                bucket.acquire()
+            stats = report.operations[name]
+            start = monotonic()
+            error = None
+            try:
+                operations[name](index)
+            except Exception as err:
+                error = type(err).__name__
+            end = monotonic()
+            with lock:
+                stats.latencies.append(end - start)
+                if error is not None:
+                    stats.errors[error] = stats.errors.get(error, 0) + 1
+                stats.started = start if stats.started is None else min(stats.started, start)
+                stats.finished = end if stats.finished is None else max(stats.finished, end)
+
+    threads = [threading.Thread(target=worker) for _ in range(max(1, min(concurrency, len(tasks))))]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def runLoad(operations, mix, concurrency=4, rate=None, sequential=True):
+    """
+    Exécute un mélange d'opérations et mesure leurs performances
+
+    :param operations: les opérations disponibles {nom: fonction recevant le numéro de l'appel}
+    :param mix: la liste des (opération, nombre d'appels), voir parseMix
+    :param concurrency: le nombre d'appels simultanés
+    :param rate: le débit cible en appels par seconde, toutes opérations confondues (optionnel)
+    :param sequential: exécute les opérations du mélange l'une après l'autre, dans l'ordre (par exemple créer les \
+    comptes avant de les modifier) ; sinon les appels sont mélangés aléatoirement
+    :return: le LoadReport
+    :raises ValueError: Exception levée si une opération du mélange n'existe pas
+    """
+    for name, count in mix:
+        if name not in operations:
+            raise ValueError("Opération inconnue : " + name + " (disponibles : " + ", ".join(operations) + ")")
+    report = LoadReport(concurrency, rate)
+    for name, count in mix:
+        report.operations.setdefault(name, OperationStats(name))
+    bucket = TokenBucket(rate) if rate else None
+    phases = [[(name, index) for index in range(count)] for name, count in mix]
+    if not sequential:
+        tasks = [task for phase in phases for task in phase]
+        random.shuffle(tasks)
+        phases = [tasks]
+    start = monotonic()
+    for tasks in phases:
+        _runPhase(operations, tasks, concurrency, bucket, report)
+    report.duration = monotonic() - start
+    return report
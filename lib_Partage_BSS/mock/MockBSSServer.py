@@ -0,0 +1,530 @@
+# -*-coding:utf-8 -*
+"""
+Module implémentant un serveur HTTP local simulant l'API BSS Partage, avec un stockage en mémoire, pour les tests
+d'intégration et de charge.
+
+Méthodes simulées : Auth (vérification de la preauth HMAC), GetAccount, GetAllAccounts (limit, offset, ldap_query),
+CreateAccount, ModifyAccount, RenameAccount, AddAccountAlias, RemoveAccountAlias, SetPassword, DeleteAccount,
+GetCos et GetAllCos. La latence, les erreurs et le débit autorisé sont configurables::
+
+    with MockBSSServer({"domain.com": "clé"}, latency=0.01) as server:
+        BSSConnexion().url = server.url
+        BSSConnexion().setDomainKey({"domain.com": "clé"})
+        AccountService.createAccount("test@domain.com", "{SSHA}empreinte", "cosId")
+"""
+import hashlib
+import hmac
+import random
+import re
+import threading
+import uuid
+from fnmatch import fnmatchcase
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from time import sleep, time
+from urllib.parse import parse_qs
+from xml.sax.saxutils import escape
+
+from lib_Partage_BSS.utils.RateLimiter import TokenBucket
+
+METHODS = ("Auth", "GetAccount", "GetAllAccounts", "CreateAccount", "ModifyAccount", "RenameAccount",
+           "AddAccountAlias", "RemoveAccountAlias", "SetPassword", "DeleteAccount", "GetCos", "GetAllCos")
+"""Les méthodes de l'API simulées"""
+
+ERROR_STATUS = 1
+"""Code renvoyé par les méthodes en erreur"""
+AUTH_ERROR_STATUS = 2
+"""Code renvoyé lorsque l'authentification ou le token est refusé"""
+RATE_LIMIT_STATUS = 429
+"""Code renvoyé lorsque le débit autorisé est dépassé"""
+
+STATUS = "status"
+"""Erreur injectée sous la forme d'un code d'erreur de l'API"""
+HTTP_ERROR = "http_error"
+"""Erreur injectée sous la forme d'une réponse HTTP 500 (page HTML)"""
+MALFORMED = "malformed"
+"""Erreur injectée sous la forme d'une réponse XML tronquée"""
+DISCONNECT = "disconnect"
+"""Erreur injectée sous la forme d'une fermeture de connexion sans réponse"""
+
+_ARRAY_ITEMS = {"zimbraMailAlias": "zimbraMailAlias", "zimbraZimletAvailableZimlets": "zimbraZimletAvailableZimlet",
+                "accounts": "account", "coses": "cose"}
+_INTEGERS = ("used", "quota")
+_HIDDEN = ("password", "userPassword")
+
+
+class _Error(Exception):
+    def __init__(self, message, status=ERROR_STATUS):
+        self.status = status
+        self.message = message
+
+
+def _toXml(tag, value):
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "<" + tag + ">" + ("TRUE" if value else "FALSE") + "</" + tag + ">"
+    if isinstance(value, int):
+        return "<" + tag + " type=\"integer\">" + str(value) + "</" + tag + ">"
+    if isinstance(value, (list, tuple)):
+        item = _ARRAY_ITEMS.get(tag, tag)
+        return "<" + tag + " type=\"array\">" + "".join(_toXml(item, element) for element in value) + "</" + tag + ">"
+    if isinstance(value, dict):
+        return "<" + tag + ">" + "".join(_toXml(key, value[key]) for key in value) + "</" + tag + ">"
+    return "<" + tag + ">" + escape(str(value)) + "</" + tag + ">"
+
+
+def _response(status=0, message="Opération réalisée avec succès !", **content):
+    body = "".join(_toXml(key, content[key]) for key in content)
+    return "<?xml version=\"1.0\" encoding=\"UTF-8\"?><Response>" + _toXml("status", status) \
+           + _toXml("message", message) + body + "</Response>"
+
+
+def parseLdapFilter(query):
+    """
+    Transforme un filtre LDAP ((attr=valeur), *, &, |, !) en fonction de test d'un dictionnaire d'attributs.
+    Les attributs mail et uid désignent l'adresse (ou un alias) et la partie locale de l'adresse du compte.
+
+    :param query: le filtre LDAP (une chaîne vide accepte tout)
+    :return: une fonction recevant les attributs et renvoyant True s'ils vérifient le filtre
+    :raises ValueError: Exception levée si le filtre est mal formé
+    """
+    query = query.strip()
+    if not query:
+        return lambda attributes: True
+    predicate, position = _parseFilter(query, 0)
+    if position != len(query):
+        raise ValueError("Filtre LDAP mal formé : " + query)
+    return predicate
+
+
+def _parseFilter(query, position):
+    if query[position] != "(":
+        raise ValueError("Filtre LDAP mal formé : " + query)
+    position += 1
+    operator = query[position]
+    if operator in "&|!":
+        position += 1
+        children = []
+        while position < len(query) and query[position] == "(":
+            child, position = _parseFilter(query, position)
+            children.append(child)
+        if position >= len(query) or query[position] != ")" or not children:
+            raise ValueError("Filtre LDAP mal formé : " + query)
+        if operator == "&":
+            return (lambda attributes: all(child(attributes) for child in children)), position + 1
+        if operator == "|":
+            return (lambda attributes: any(child(attributes) for child in children)), position + 1
+        return (lambda attributes: not children[0](attributes)), position + 1
+    end = query.find(")", position)
+    match = re.match(r"^([\w-]+)(=|>=|<=|~=)(.*)$", query[position:end] if end >= 0 else "")
+    if match is None:
+        raise ValueError("Filtre LDAP mal formé : " + query)
+    name, comparison, expected = match.groups()
+    return (lambda attributes: _compare(_values(attributes, name), comparison, expected)), end + 1
+
+
+def _values(attributes, name):
+    name = name.lower()
+    if name == "mail":
+        return [attributes.get("name")] + list(attributes.get("zimbraMailAlias") or [])
+    if name == "uid":
+        return [attributes.get("name", "").split("@")[0]]
+    for key in attributes:
+        if key.lower() == name:
+            value = attributes[key]
+            return list(value) if isinstance(value, (list, tuple)) else [value]
+    return []
+
+
+def _compare(values, comparison, expected):
+    for value in values:
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            value = "TRUE" if value else "FALSE"
+        value = str(value)
+        if comparison == ">=" and value >= expected or comparison == "<=" and value <= expected:
+            return True
+        if comparison in ("=", "~=") and (expected == "*" or fnmatchcase(value.lower(), expected.lower())):
+            return True
+    return False
+
+
+class BSSStore(object):
+    """
+    Stockage en mémoire des domaines, comptes et classes de service du serveur simulé
+
+    :ivar keys: les clés des domaines {domaine: clé}
+    :ivar accounts: les comptes {nom: attributs}
+    :ivar coses: les classes de service {domaine: {nom: attributs}}
+    """
+    def __init__(self, keys=None):
+        self.keys = dict(keys or {})
+        self.accounts = {}
+        self.coses = {}
+        self.tokens = {}
+        self.lock = threading.RLock()
+
+    def addAccount(self, name, **attributes):
+        """
+        Ajoute un compte
+
+        :param name: le nom du compte
+        :param attributes: les attributs du compte
+        :return: les attributs du compte créé
+        """
+        with self.lock:
+            account = {"name": name, "id": str(uuid.uuid4()), "zimbraAccountStatus": "active", "used": 0, "quota": 0,
+                       "zimbraMailAlias": []}
+            account.update(attributes)
+            self.accounts[name] = account
+            return account
+
+    def addCOS(self, domain, name, **attributes):
+        """
+        Ajoute une classe de service
+
+        :param domain: le domaine de la classe de service
+        :param name: le nom de la classe de service
+        :param attributes: les attributs de la classe de service
+        :return: les attributs de la classe de service créée
+        """
+        with self.lock:
+            cos = {"name": name, "zimbraId": str(uuid.uuid4())}
+            cos.update(attributes)
+            self.coses.setdefault(domain, {})[name] = cos
+            return cos
+
+    def _owner(self, alias):
+        for account in self.accounts.values():
+            if alias in account["zimbraMailAlias"]:
+                return account["name"]
+        return None
+
+    def _account(self, name):
+        account = self.accounts.get(name)
+        if account is None:
+            raise _Error("no such account: " + name)
+        return account
+
+    def call(self, domain, method, data):
+        """
+        Exécute une méthode de l'API sur le stockage
+
+        :param domain: le domaine autorisé par le token
+        :param method: la méthode de l'API
+        :param data: les paramètres de la requête {nom: [valeurs]}
+        :return: le contenu de la réponse
+        """
+        def value(name, default=None):
+            return data[name][0] if name in data else default
+
+        name = value("name")
+        if name is not None and method not in ("GetCos",) and name.split("@")[-1] != domain:
+            raise _Error("Domaine " + name.split("@")[-1] + " non autorisé", AUTH_ERROR_STATUS)
+        with self.lock:
+            if method == "GetAccount":
+                return {"account": self._public(self._account(name))}
+            if method == "GetAllAccounts":
+                predicate = parseLdapFilter(value("ldap_query", ""))
+                accounts = sorted((account for account in self.accounts.values()
+                                   if account["name"].endswith("@" + domain) and predicate(account)),
+                                  key=lambda account: account["name"])
+                offset = int(value("offset", 0) or 0)
+                limit = int(value("limit", 100) or 100)
+                return {"accounts": [self._public(account) for account in accounts[offset:offset + limit]]}
+            if method == "CreateAccount":
+                if name in self.accounts or self._owner(name) is not None:
+                    raise _Error("account already exists: " + name)
+                attributes = self._attributes(data)
+                self.addAccount(name, **attributes)
+                return {}
+            if method == "ModifyAccount":
+                self._account(name).update(self._attributes(data))
+                return {}
+            if method == "RenameAccount":
+                newName = value("newname")
+                if newName in self.accounts:
+                    raise _Error("account already exists: " + newName)
+                account = self.accounts.pop(self._account(name)["name"])
+                account["name"] = newName
+                self.accounts[newName] = account
+                return {}
+            if method == "AddAccountAlias":
+                account = self._account(name)
+                alias = value("alias")
+                if alias in self.accounts or self._owner(alias) not in (None, name):
+                    raise _Error("email address already exists: " + alias)
+                if alias not in account["zimbraMailAlias"]:
+                    account["zimbraMailAlias"].append(alias)
+                return {}
+            if method == "RemoveAccountAlias":
+                account = self._account(name)
+                alias = value("alias")
+                if alias not in account["zimbraMailAlias"]:
+                    raise _Error("no such alias: " + alias)
+                account["zimbraMailAlias"].remove(alias)
+                return {}
+            if method == "SetPassword":
+                self._account(name)["password"] = value("password")
+                return {}
+            if method == "DeleteAccount":
+                del self.accounts[self._account(name)["name"]]
+                return {}
+            if method == "GetCos":
+                cos = self.coses.get(domain, {}).get(name)
+                if cos is None:
+                    raise _Error("no such cos: " + str(name))
+                return {"cos": cos}
+            if method == "GetAllCos":
+                predicate = parseLdapFilter(value("ldap_query", ""))
+                coses = sorted((cos for cos in self.coses.get(domain, {}).values() if predicate(cos)),
+                               key=lambda cos: cos["name"])
+                offset = int(value("offset", 0) or 0)
+                limit = int(value("limit", 100) or 100)
+                return {"coses": coses[offset:offset + limit]}
+        raise _Error("Méthode inconnue : " + method)
+
+    @staticmethod
+    def _attributes(data):
+        attributes = {}
+        for key in data:
+            if key in ("name", "newname"):
+                continue
+            values = data[key]
+            if key == "zimbraMailAlias":
+                attributes[key] = list(values)
+            elif key in _INTEGERS:
+                attributes[key] = int(values[0])
+            else:
+                attributes[key] = values[0]
+        return attributes
+
+    @staticmethod
+    def _public(account):
+        # l'API n'envoie pas les listes vides (l'élément ne contiendrait que l'attribut type)
+        return dict((key, value) for key, value in account.items() if key not in _HIDDEN and value != [])
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    # la file par défaut (5 connexions) provoque des attentes de reconnexion d'une seconde sous charge
+    request_queue_size = 128
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        mock = self.server.mock
+        length = int(self.headers.get("Content-Length", 0) or 0)
+        data = parse_qs(self.rfile.read(length).decode("utf-8"), keep_blank_values=True)
+        segments = [segment for segment in self.path.split("?")[0].split("/") if segment]
+        method, token = None, None
+        for index, segment in enumerate(segments):
+            if segment in METHODS:
+                method = segment
+                token = segments[index + 1] if index + 1 < len(segments) else None
+                break
+        if method is None:
+            self._send(404, "Not Found", "text/plain")
+            return
+        mock.record(method)
+        latency = mock.latencyFor()
+        if latency:
+            sleep(latency)
+        failure = mock.nextFailure(method)
+        if failure is not None and self._fail(*failure):
+            return
+        self._send(200, mock.handle(method, token, data))
+
+    def _fail(self, mode, status, message):
+        if mode == DISCONNECT:
+            self.close_connection = True
+            return True
+        if mode == HTTP_ERROR:
+            self._send(500, "<html><body>Internal Server Error</body></html>", "text/html")
+            return True
+        if mode == MALFORMED:
+            self._send(200, _response()[:40])
+            return True
+        self._send(200, _response(status, message))
+        return True
+
+    def _send(self, code, body, contentType="text/xml; charset=utf-8"):
+        payload = body.encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", contentType)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockBSSServer(object):
+    """
+    Serveur HTTP local simulant l'API BSS
+
+    :ivar store: le stockage en mémoire (BSSStore)
+    :ivar latency: la latence ajoutée à chaque requête en secondes, ou un tuple (minimum, maximum)
+    :ivar errorRate: la probabilité qu'une requête échoue (erreur de type errorMode)
+    :ivar errorMode: STATUS, HTTP_ERROR, MALFORMED ou DISCONNECT
+    :ivar rate: le nombre de requêtes par seconde autorisées par domaine (None : pas de limite) ; au delà l'API \
+    renvoie RATE_LIMIT_STATUS
+    :ivar tokenTtl: la durée de validité des tokens en secondes
+    :ivar maxClockSkew: l'écart maximal toléré entre l'horodatage de la preauth et l'heure du serveur en secondes
+    """
+    def __init__(self, keys=None, latency=0, errorRate=0, errorMode=STATUS, rate=None, burst=None, tokenTtl=300,
+                 maxClockSkew=300, host="127.0.0.1", port=0):
+        self.store = BSSStore(keys)
+        self.latency = latency
+        self.errorRate = errorRate
+        self.errorMode = errorMode
+        self.rate = rate
+        self.burst = burst
+        self.tokenTtl = tokenTtl
+        self.maxClockSkew = maxClockSkew
+        self._buckets = {}
+        self._injected = []
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), _Handler)
+        self._server.mock = self
+        self._thread = None
+
+    @property
+    def url(self):
+        """
+        Lecture de l'url du serveur, à utiliser comme url de BSSConnexion
+
+        :return: l'url du serveur
+        """
+        host, port = self._server.server_address[:2]
+        return "http://" + host + ":" + str(port) + "/service/domain/"
+
+    def start(self):
+        """
+        Démarre le serveur dans un thread dédié
+
+        :return: le serveur
+        """
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Arrête le serveur
+        """
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, excType, excValue, traceback):
+        self.stop()
+        return False
+
+    def injectError(self, method=None, mode=STATUS, status=ERROR_STATUS, message="Erreur injectée", count=1):
+        """
+        Programme l'échec des prochains appels à une méthode
+
+        :param method: la méthode concernée (None pour toutes les méthodes)
+        :param mode: STATUS, HTTP_ERROR, MALFORMED ou DISCONNECT
+        :param status: le code d'erreur renvoyé en mode STATUS
+        :param message: le message d'erreur renvoyé en mode STATUS
+        :param count: le nombre d'appels en échec
+        """
+        with self._lock:
+            self._injected.append([method, mode, status, message, count])
+
+    def callCount(self, method=None):
+        """
+        Lecture du nombre d'appels reçus
+
+        :param method: la méthode concernée (None pour toutes les méthodes)
+        :return: le nombre d'appels
+        """
+        with self._lock:
+            if method is None:
+                return sum(self._calls.values())
+            return self._calls.get(method, 0)
+
+    def record(self, method):
+        with self._lock:
+            self._calls[method] = self._calls.get(method, 0) + 1
+
+    def latencyFor(self):
+        if isinstance(self.latency, (list, tuple)):
+            return random.uniform(*self.latency)
+        return self.latency
+
+    def nextFailure(self, method):
+        with self._lock:
+            for injected in self._injected:
+                if injected[0] in (None, method):
+                    injected[4] -= 1
+                    if injected[4] <= 0:
+                        self._injected.remove(injected)
+                    return injected[1], injected[2], injected[3]
+        if self.errorRate and random.random() < self.errorRate:
+            return self.errorMode, ERROR_STATUS, "Erreur aléatoire"
+        return None
+
+    def _allowed(self, domain):
+        if self.rate is None:
+            return True
+        with self._lock:
+            bucket = self._buckets.get(domain)
+            if bucket is None:
+                bucket = self._buckets[domain] = TokenBucket(self.rate, self.burst)
+        return bucket.tryAcquire() == 0
+
+    def handle(self, method, token, data):
+        """
+        Traite une requête et renvoie la réponse XML
+
+        :param method: la méthode appelée
+        :param token: le token présent dans l'url
+        :param data: les paramètres de la requête {nom: [valeurs]}
+        :return: la réponse XML
+        """
+        try:
+            if method == "Auth":
+                return _response(token=self._auth(data))
+            domain = self._domain(token)
+            if not self._allowed(domain):
+                raise _Error("Rate limit exceeded", RATE_LIMIT_STATUS)
+            return _response(**self.store.call(domain, method, data))
+        except _Error as err:
+            return _response(err.status, err.message)
+        except (KeyError, ValueError) as err:
+            return _response(ERROR_STATUS, "Requête invalide : " + str(err))
+
+    def _auth(self, data):
+        domain = data.get("domain", [""])[0]
+        timestamp = data.get("timestamp", ["0"])[0]
+        key = self.store.keys.get(domain)
+        if key is None:
+            raise _Error("Domaine inconnu : " + domain, AUTH_ERROR_STATUS)
+        expected = hmac.new(key.encode("utf-8"), (domain + "|" + timestamp).encode("utf-8"), hashlib.sha1).hexdigest()
+        if not hmac.compare_digest(expected, data.get("preauth", [""])[0]):
+            raise _Error("Preauth invalide", AUTH_ERROR_STATUS)
+        if abs(time() - int(timestamp)) > self.maxClockSkew:
+            raise _Error("Horodatage de la preauth expiré", AUTH_ERROR_STATUS)
+        token = uuid.uuid4().hex
+        with self.store.lock:
+            self.store.tokens[token] = (domain, time() + self.tokenTtl)
+        return token
+
+    def _domain(self, token):
+        with self.store.lock:
+            entry = self.store.tokens.get(token)
+        if entry is None or entry[1] < time():
+            raise _Error("Token invalide ou expiré", AUTH_ERROR_STATUS)
+        return entry[0]
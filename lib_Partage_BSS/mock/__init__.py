@@ -0,0 +1,3 @@
+"""Package mock"""
+from .MockBSSServer import MockBSSServer, BSSStore
+from .Cassette import Cassette, recording, replaying
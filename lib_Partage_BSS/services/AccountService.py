@@ -8,8 +8,18 @@ from time import time
 
 from lib_Partage_BSS import models, utils, services
 from lib_Partage_BSS.exceptions import NameException, DomainException, ServiceException
+from lib_Partage_BSS.utils.Bulk import BulkResult, DEFAULT_MAX_WORKERS, runBulk, raiseFirstError
+from lib_Partage_BSS.utils.Metrics import FILL, phase
+from lib_Partage_BSS.utils.SingleFlight import SingleFlight
+from lib_Partage_BSS.utils.Snapshot import Snapshot
+from lib_Partage_BSS.utils.Tracing import callSpan, traced
 from .GlobalService import callMethod
 
+_inFlight = SingleFlight()
+"""Les lectures de comptes en cours, partagées entre les threads"""
+_snapshot = Snapshot()
+"""La copie locale des comptes lus avec allowStale"""
+
 
 def fillAccount(accountResponse):
     """
@@ -44,10 +54,15 @@ def fillAccount(accountResponse):
     return retAccount
 
 
-def getAccount(name):
+def getAccount(name, allowStale=False):
     """
-    Méthode permettant de récupérer les informations d'un compte via l'API BSS
+    Méthode permettant de récupérer les informations d'un compte via l'API BSS.
+    Les lectures simultanées d'un même compte sont regroupées en une seule requête.
+    Avec allowStale, le compte peut être renvoyé depuis la copie locale de la dernière lecture, rafraîchie en
+    arrière-plan, et cette copie est renvoyée si l'API est injoignable (voir Snapshot et configureSnapshot).
 
+    :param name: le nom du compte
+    :param allowStale: accepte une copie locale éventuellement obsolète (optionnel)
     :return: Le compte récupéré ou None si le compte n'existe pas
     :raises ServiceException: Exception levée si la requête vers l'API à echoué. L'exception contient le code de l'erreur et le message
     :raises NameException: Exception levée si le nom n'est pas une adresse mail valide
@@ -55,13 +70,40 @@ def getAccount(name):
     """
     if not utils.checkIsMailAddress(name):
         raise NameException("L'adresse mail " + name + " n'est pas valide")
+    def read():
+        return _inFlight.do(("GetAccount", name), lambda: _getAccount(name))
+    if allowStale:
+        return _snapshot.get(name, read)
+    return read()
+
+
+def configureSnapshot(softTtl=60, hardTtl=3600, maxEntries=10000):
+    """
+    Configure la copie locale utilisée par getAccount(name, allowStale=True) ; les copies existantes sont supprimées
+
+    :param softTtl: l'âge en secondes au delà duquel une copie est rafraîchie en arrière-plan (optionnel)
+    :param hardTtl: l'âge en secondes au delà duquel l'API est interrogée avant de répondre (optionnel)
+    :param maxEntries: le nombre maximal de comptes conservés (optionnel)
+    """
+    global _snapshot
+    _snapshot = Snapshot(softTtl, hardTtl, maxEntries)
+
+
+def _invalidate(name):
+    # une lecture commencée avant l'écriture ne doit plus être partagée ni conservée
+    _inFlight.forget(("GetAccount", name))
+    _snapshot.invalidate(name)
+
+
+def _getAccount(name):
     data = {
         "name": name
     }
     response = callMethod(services.extractDomain(name), "GetAccount", data)
     if utils.checkResponseStatus(response["status"]):
         account = response["account"]
-        return fillAccount(account)
+        with phase("GetAccount", FILL), callSpan("GetAccount", step="fill"):
+            return fillAccount(account)
     elif re.search(".*no such account.*", response["message"]):
         return None
     else:
@@ -96,15 +138,67 @@ def getAllAccounts(domain, limit=100, offset=0, ldapQuery=""):
     else:
         accounts = response["accounts"]["account"]
         retAccounts = []
-        if isinstance(accounts, list):
-            for account in accounts:
-                retAccounts.append(fillAccount(account))
-        else:
-            retAccounts.append(fillAccount(accounts))
+        with phase("GetAllAccounts", FILL), callSpan("GetAllAccounts", step="fill"):
+            if isinstance(accounts, list):
+                for account in accounts:
+                    retAccounts.append(fillAccount(account))
+            else:
+                retAccounts.append(fillAccount(accounts))
         return retAccounts
 
 
+def iterAccountPages(domain, pageSize=100, ldapQuery=""):
+    """
+    Permet de parcourir tous les comptes mail d'un domaine, page par page
+
+    :param domain: le domaine de la recherche
+    :param pageSize: le nombre de comptes demandés par appel à l'API (optionnel)
+    :param ldapQuery: un filtre ldap pour affiner la rechercher (optionnel)
+    :return: un générateur des pages (listes de comptes)
+    :raises ServiceException: Exception levée si la requête vers l'API à echoué. L'exception contient le code de l'erreur et le message
+    :raises DomainException: Exception levée si le domaine n'est pas un domaine valide
+    """
+    offset = 0
+    while True:
+        accounts = getAllAccounts(domain, limit=pageSize, offset=offset, ldapQuery=ldapQuery)
+        yield accounts
+        if len(accounts) < pageSize:
+            return
+        offset += pageSize
+
+
+def iterAllAccounts(domain, pageSize=100, ldapQuery=""):
+    """
+    Permet de parcourir tous les comptes mail d'un domaine, page par page (voir iterAccountPages)
+
+    :param domain: le domaine de la recherche
+    :param pageSize: le nombre de comptes demandés par appel à l'API (optionnel)
+    :param ldapQuery: un filtre ldap pour affiner la rechercher (optionnel)
+    :return: un générateur des comptes
+    :raises ServiceException: Exception levée si la requête vers l'API à echoué. L'exception contient le code de l'erreur et le message
+    :raises DomainException: Exception levée si le domaine n'est pas un domaine valide
+    """
+    for accounts in iterAccountPages(domain, pageSize, ldapQuery):
+        for account in accounts:
+            yield account
+
+
+def countAccounts(domain, pageSize=100, ldapQuery=""):
+    """
+    Permet de compter les comptes mail d'un domaine
+
+    :param domain: le domaine de la recherche
+    :param pageSize: le nombre de comptes demandés par appel à l'API (optionnel)
+    :param ldapQuery: un filtre ldap pour affiner la rechercher (optionnel)
+    :return: le nombre de comptes
+    :raises ServiceException: Exception levée si la requête vers l'API à echoué. L'exception contient le code de l'erreur et le message
+    :raises DomainException: Exception levée si le domaine n'est pas un domaine valide
+    """
+    return sum(1 for account in iterAllAccounts(domain, pageSize, ldapQuery))
 
+
+
+@traced
 def createAccount(name,userPassword, cosId, account = None):
     """
     Méthode permettant de créer un compte via l'API BSS en lui passant en paramètre l'empreinte du mot de passe (SSHA) et le cosId
@@ -131,7 +225,10 @@ def createAccount(name,userPassword, cosId, account = None):
             "zimbraHideInGal": "FALSE",
             "zimbraCOSId": cosId
         }
-    response = callMethod(services.extractDomain(name), "CreateAccount", data)
+    try:
+        response = callMethod(services.extractDomain(name), "CreateAccount", data)
+    finally:
+        _invalidate(name)
 
     if not utils.checkResponseStatus(response["status"]):
         raise ServiceException(response["status"], response["message"])
@@ -142,6 +239,7 @@ def createAccount(name,userPassword, cosId, account = None):
     return getAccount(name)
 
 
+@traced
 def createAccountExt(account , password):
     """
     Méthode permettant de créer un compte via l'API BSS en lui passant en
@@ -169,8 +267,11 @@ def createAccountExt(account , password):
         'password': '',
         'userPassword': password,
     })
-    response = callMethod( services.extractDomain( account.name ) ,
-            'CreateAccount' , data )
+    try:
+        response = callMethod( services.extractDomain( account.name ) ,
+                'CreateAccount' , data )
+    finally:
+        _invalidate(account.name)
     if not utils.checkResponseStatus( response['status'] ):
         raise ServiceException( response['status'], response['message'] )
 
@@ -189,13 +290,17 @@ def deleteAccount(name):
     data = {
         "name": name
     }
-    response = callMethod(services.extractDomain(name), "DeleteAccount", data)
+    try:
+        response = callMethod(services.extractDomain(name), "DeleteAccount", data)
+    finally:
+        _invalidate(name)
     if not utils.checkResponseStatus(response["status"]):
         raise ServiceException(response["status"], response["message"])
 
 
 
 
+@traced
 def preDeleteAccount(name):
     """
     Permet de mettre un compte dans un état de préSuppression
@@ -216,6 +321,7 @@ def preDeleteAccount(name):
 
 
 
+@traced
 def restorePreDeleteAccount(name):
     """
     Permet d'annuler la préSuppression d'un compte
@@ -241,7 +347,10 @@ def modifyAccount(account):
     :raises NameException: Exception levée si le nom n'est pas une adresse mail preSupprimé
     :raises DomainException: Exception levée si le domaine de l'adresse mail n'est pas un domaine valide
     """
-    response = callMethod(services.extractDomain(account.name), "ModifyAccount", account.toData())
+    try:
+        response = callMethod(services.extractDomain(account.name), "ModifyAccount", account.toData())
+    finally:
+        _invalidate(account.name)
     if not utils.checkResponseStatus(response["status"]):
         raise ServiceException(response["status"], response["message"])
 
@@ -253,10 +362,14 @@ def setPassword(name, newPassword):
         "name": name,
         "password": newPassword
     }
-    response = callMethod(services.extractDomain(name), "SetPassword", data)
+    try:
+        response = callMethod(services.extractDomain(name), "SetPassword", data)
+    finally:
+        _invalidate(name)
     if not utils.checkResponseStatus(response["status"]):
         raise ServiceException(response["status"], response["message"])
 
+@traced
 def modifyPassword(name, newUserPassword):
     """
     Pour modifier le mot de passe on n'accepte que l'empreinte du mot de passe.
@@ -277,7 +390,10 @@ def modifyPassword(name, newUserPassword):
         "name": name,
         "userPassword": newUserPassword
     }
-    response = callMethod(services.extractDomain(name), "ModifyAccount", data)
+    try:
+        response = callMethod(services.extractDomain(name), "ModifyAccount", data)
+    finally:
+        _invalidate(name)
     if not utils.checkResponseStatus(response["status"]):
         raise ServiceException(response["status"], response["message"])
 
@@ -299,7 +415,10 @@ def addAccountAlias(name, newAlias):
         "name": name,
         "alias": newAlias
     }
-    response = callMethod(services.extractDomain(name), "AddAccountAlias", data)
+    try:
+        response = callMethod(services.extractDomain(name), "AddAccountAlias", data)
+    finally:
+        _invalidate(name)
     if not utils.checkResponseStatus(response["status"]):
         raise ServiceException(response["status"], response["message"])
 
@@ -322,12 +441,153 @@ def removeAccountAlias(name, aliasToDelete):
         "name": name,
         "alias": aliasToDelete
     }
-    response = callMethod(services.extractDomain(name), "RemoveAccountAlias", data)
+    try:
+        response = callMethod(services.extractDomain(name), "RemoveAccountAlias", data)
+    finally:
+        _invalidate(name)
     if not utils.checkResponseStatus(response["status"]):
         raise ServiceException(response["status"], response["message"])
 
 
 
+def _aliasSet(aliases):
+    """
+    Transforme la valeur de l'attribut zimbraMailAlias (None, str ou liste) en ensemble d'alias
+
+    :param aliases: la valeur à transformer
+    :return: l'ensemble des alias
+    """
+    if aliases is None:
+        return set()
+    if isinstance(aliases, str):
+        return {aliases}
+    return set(aliases)
+
+
+def _checkAliases(listOfAliases):
+    """
+    Vérifie que les adresses passées en paramètre sont des adresses mail valides
+
+    :param listOfAliases: la liste des alias à vérifier
+    :raises NameException: Exception levée si une adresse n'est pas une adresse mail valide
+    """
+    for alias in listOfAliases:
+        if not utils.checkIsMailAddress(alias):
+            raise NameException("L'adresse mail " + alias + " n'est pas valide")
+
+
+def _getCurrentAliases(name):
+    """
+    Récupère l'ensemble des alias actuels d'un compte via l'API BSS
+
+    :param name: le nom du compte
+    :return: l'ensemble des alias du compte
+    :raises NameException: Exception levée si le compte n'existe pas
+    """
+    account = getAccount(name)
+    if account is None:
+        raise NameException("Le compte " + name + " n'existe pas")
+    return _aliasSet(account.zimbraMailAlias)
+
+
+def _aliasOperations(name, wanted, current):
+    """
+    Calcule les appels à effectuer pour passer de l'ensemble d'alias current à l'ensemble wanted
+
+    :return: la liste des opérations (fonction, nom du compte, alias)
+    """
+    operations = [(addAccountAlias, name, alias) for alias in sorted(wanted - current)]
+    operations += [(removeAccountAlias, name, alias) for alias in sorted(current - wanted)]
+    return operations
+
+
+def _runAliasOperation(operation):
+    function, name, alias = operation
+    function(name, alias)
+
+
+@traced
+def syncAccountAliases(name, listOfAliases, currentAliases=None, maxWorkers=DEFAULT_MAX_WORKERS):
+    """
+    Méthode permettant de synchroniser l'ensemble des alias d'un compte avec ceux passés en paramètre.
+    Les ajouts et suppressions d'alias sont effectués en parallèle.
+
+    :param name: le nom du compte
+    :param listOfAliases: les alias souhaités pour le compte
+    :param currentAliases: les alias actuels du compte s'ils sont déjà connus ; évite la lecture du compte (optionnel)
+    :param maxWorkers: le nombre maximal de requêtes simultanées, ou un AdaptiveConcurrency (optionnel)
+    :return: un tuple (alias ajoutés, alias supprimés)
+    :raises ServiceException: Exception levée si la requête vers l'API à echoué. L'exception contient le code de l'erreur et le message
+    :raises NameException: Exception levée si le nom ou un alias n'est pas une adresse mail valide
+    :raises DomainException: Exception levée si le domaine de l'adresse mail n'est pas un domaine valide
+    """
+    if not utils.checkIsMailAddress(name):
+        raise NameException("L'adresse mail " + name + " n'est pas valide")
+    wanted = _aliasSet(listOfAliases)
+    _checkAliases(wanted)
+    if currentAliases is None:
+        current = _getCurrentAliases(name)
+    else:
+        current = _aliasSet(currentAliases)
+    operations = _aliasOperations(name, wanted, current)
+    raiseFirstError(runBulk(_runAliasOperation, operations, maxWorkers))
+    return wanted - current, current - wanted
+
+
+def syncAccountsAliases(aliasesByAccount, currentAliasesByAccount=None, maxWorkers=DEFAULT_MAX_WORKERS):
+    """
+    Méthode permettant de synchroniser les alias de plusieurs comptes en un seul traitement.
+    Les lectures des comptes dont les alias actuels ne sont pas fournis, puis l'ensemble des ajouts
+    et suppressions d'alias de tous les comptes, sont effectués en parallèle.
+
+    :param aliasesByAccount: dictionnaire {nom du compte: liste des alias souhaités}
+    :param currentAliasesByAccount: dictionnaire {nom du compte: alias actuels} pour les comptes déjà connus (optionnel)
+    :param maxWorkers: le nombre maximal de requêtes simultanées, ou un AdaptiveConcurrency (optionnel)
+    :return: dictionnaire {nom du compte: BulkResult} ; en cas de succès le résultat est le tuple (alias ajoutés, alias supprimés)
+    :raises NameException: Exception levée si un nom ou un alias n'est pas une adresse mail valide
+    """
+    if currentAliasesByAccount is None:
+        currentAliasesByAccount = {}
+    wantedByAccount = OrderedDict()
+    for name in aliasesByAccount:
+        if not utils.checkIsMailAddress(name):
+            raise NameException("L'adresse mail " + name + " n'est pas valide")
+        wantedByAccount[name] = _aliasSet(aliasesByAccount[name])
+        _checkAliases(wantedByAccount[name])
+
+    results = OrderedDict()
+    currentByAccount = {}
+    toRead = []
+    for name in wantedByAccount:
+        if currentAliasesByAccount.get(name) is not None:
+            currentByAccount[name] = _aliasSet(currentAliasesByAccount[name])
+        else:
+            toRead.append(name)
+    for read in runBulk(_getCurrentAliases, toRead, maxWorkers):
+        if read.ok:
+            currentByAccount[read.item] = read.result
+        else:
+            results[read.item] = read
+
+    operations = []
+    for name in currentByAccount:
+        operations += _aliasOperations(name, wantedByAccount[name], currentByAccount[name])
+    errors = {}
+    for done in runBulk(_runAliasOperation, operations, maxWorkers):
+        if not done.ok and done.item[1] not in errors:
+            errors[done.item[1]] = done.error
+
+    for name in wantedByAccount:
+        if name in results:
+            continue
+        if name in errors:
+            results[name] = BulkResult(name, error=errors[name])
+        else:
+            wanted, current = wantedByAccount[name], currentByAccount[name]
+            results[name] = BulkResult(name, result=(wanted - current, current - wanted))
+    return OrderedDict((name, results[name]) for name in wantedByAccount)
+
+
 def modifyAccountAliases(name, listOfAliases):
     """
     Méthode permettant de changer l'ensemble des alias d'un compte par ceux passés en paramètre
@@ -343,30 +603,7 @@ def modifyAccountAliases(name, listOfAliases):
         raise NameException("L'adresse mail " + name + " n'est pas valide")
     if not isinstance(listOfAliases, list):
         raise TypeError
-    account = getAccount(name)
-    #On vérifie que les adresses mail passées en paramètres sont des adresses valide
-    for alias in listOfAliases:
-        if not utils.checkIsMailAddress(alias):
-            raise NameException("L'adresse mail " + alias + " n'est pas valide")
-    #On parcour la liste passé en paramètre
-    for alias in listOfAliases:
-        if isinstance(account.zimbraMailAlias, list) or isinstance(account.zimbraMailAlias, str):
-            #si la l'adresse mail n'est pas présente dans partage on la rajoute
-            if alias not in account.zimbraMailAlias:
-                addAccountAlias(name, alias)
-        #si la liste partage est vide on rajoute l'adresse
-        elif account.zimbraMailAlias is None:
-            addAccountAlias(name, alias)
-    if isinstance(account.zimbraMailAlias, list):
-        #On parcours la liste des adresses partages
-        for alias in account.zimbraMailAlias:
-            #Si l'adresse n'est pas présente dans la liste passé en parametre on supprime l'adresse de partage
-            if alias not in listOfAliases:
-                removeAccountAlias(name, alias)
-    #Si le compte n'a qu'un alias on test si il est présent ou pas dans la liste passé en paramètre
-    elif isinstance(account.zimbraMailAlias, str):
-        if account.zimbraMailAlias not in listOfAliases:
-            removeAccountAlias(name, account.zimbraMailAlias)
+    syncAccountAliases(name, listOfAliases)
 
 
 def activateAccount(name):
@@ -385,6 +622,7 @@ def activateAccount(name):
     modifyAccount(account)
 
 
+@traced
 def lockAccount(name):
     """
     Méthode permettant de passer l'état d'un compte à lock
@@ -404,6 +642,7 @@ def lockAccount(name):
     modifyAccount(account)
 
 
+@traced
 def closeAccount(name):
     """
     Cette méthode déconnecte toutes les instances du compte et empêche la connexion à celui-ci.
@@ -439,6 +678,77 @@ def renameAccount(name, newName):
         "name": name,
         "newname": newName
     }
-    response = callMethod(services.extractDomain(name), "RenameAccount", data)
+    try:
+        response = callMethod(services.extractDomain(name), "RenameAccount", data)
+    finally:
+        _invalidate(name)
+        _invalidate(newName)
     if not utils.checkResponseStatus(response["status"]):
         raise ServiceException(response["status"], response["message"])
+
+
+def _runForAccounts(function, names, maxWorkers):
+    """
+    Applique une opération de cycle de vie à plusieurs comptes en parallèle.
+    Les étapes de l'opération restent séquentielles pour chaque compte ; un compte présent plusieurs fois n'est
+    traité qu'une fois.
+
+    :return: dictionnaire {nom du compte: BulkResult}
+    """
+    names = list(OrderedDict.fromkeys(names))
+    return OrderedDict((result.item, result) for result in runBulk(function, names, maxWorkers))
+
+
+def activateAccounts(names, maxWorkers=DEFAULT_MAX_WORKERS):
+    """
+    Méthode permettant de (ré)activer plusieurs comptes en parallèle (voir activateAccount)
+
+    :param names: les noms des comptes à (ré)activer
+    :param maxWorkers: le nombre maximal de comptes traités simultanément, ou un AdaptiveConcurrency (optionnel)
+    :return: dictionnaire {nom du compte: BulkResult}
+    """
+    return _runForAccounts(activateAccount, names, maxWorkers)
+
+
+def lockAccounts(names, maxWorkers=DEFAULT_MAX_WORKERS):
+    """
+    Méthode permettant de verrouiller plusieurs comptes en parallèle (voir lockAccount)
+
+    :param names: les noms des comptes à verrouiller
+    :param maxWorkers: le nombre maximal de comptes traités simultanément, ou un AdaptiveConcurrency (optionnel)
+    :return: dictionnaire {nom du compte: BulkResult}
+    """
+    return _runForAccounts(lockAccount, names, maxWorkers)
+
+
+def closeAccounts(names, maxWorkers=DEFAULT_MAX_WORKERS):
+    """
+    Méthode permettant de fermer plusieurs comptes en parallèle (voir closeAccount)
+
+    :param names: les noms des comptes à fermer
+    :param maxWorkers: le nombre maximal de comptes traités simultanément, ou un AdaptiveConcurrency (optionnel)
+    :return: dictionnaire {nom du compte: BulkResult}
+    """
+    return _runForAccounts(closeAccount, names, maxWorkers)
+
+
+def preDeleteAccounts(names, maxWorkers=DEFAULT_MAX_WORKERS):
+    """
+    Méthode permettant de mettre plusieurs comptes en préSuppression en parallèle (voir preDeleteAccount)
+
+    :param names: les noms des comptes à préSupprimer
+    :param maxWorkers: le nombre maximal de comptes traités simultanément, ou un AdaptiveConcurrency (optionnel)
+    :return: dictionnaire {nom du compte: BulkResult} ; en cas de succès le résultat est le nouveau nom du compte
+    """
+    return _runForAccounts(preDeleteAccount, names, maxWorkers)
+
+
+def restorePreDeleteAccounts(names, maxWorkers=DEFAULT_MAX_WORKERS):
+    """
+    Méthode permettant d'annuler la préSuppression de plusieurs comptes en parallèle (voir restorePreDeleteAccount)
+
+    :param names: les noms des comptes préSupprimés à restaurer
+    :param maxWorkers: le nombre maximal de comptes traités simultanément, ou un AdaptiveConcurrency (optionnel)
+    :return: dictionnaire {nom du compte: BulkResult}
+    """
+    return _runForAccounts(restorePreDeleteAccount, names, maxWorkers)
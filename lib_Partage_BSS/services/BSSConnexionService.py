@@ -2,11 +2,14 @@
 import json
 import hmac
 import hashlib
+import threading
 from time import time
 
 from lib_Partage_BSS import utils
 from lib_Partage_BSS.exceptions import BSSConnexionException, DomainException
 from lib_Partage_BSS.utils.BSSRequest import postBSS
+from lib_Partage_BSS.utils.CircuitBreaker import getCircuitBreaker
+from lib_Partage_BSS.utils.Metrics import TOKENS
 
 
 class BSSConnexion(object):
@@ -46,6 +49,10 @@ class BSSConnexion(object):
             self._url = "https://api.partage.renater.fr/service/domain/"
             """L'url vers l'API BSS Partage"""
             self._ttl = 300
+            self._lock = threading.Lock()
+            """Verrou protégeant les verrous par domaine et le changement d'url"""
+            self._domainLocks = {}
+            """Les verrous protégeant le renouvellement du token de chaque domaine"""
 
         @property
         def url(self):
@@ -64,6 +71,19 @@ class BSSConnexion(object):
             """
             return self._url
 
+        @url.setter
+        def url(self, value):
+            """
+            Change l'url de l'API (par exemple pour utiliser un serveur simulé, voir lib_Partage_BSS.mock) ;
+            les tokens obtenus auprès de l'ancienne url sont oubliés
+
+            :param value: la nouvelle url
+            """
+            with self._lock:
+                self._url = value
+                for domain in self._timestampOfLastToken:
+                    self._timestampOfLastToken[domain] = 0
+
         @property
         def domain(self):
             """Getter du domaine
@@ -81,6 +101,15 @@ class BSSConnexion(object):
             """
             return self._domain
 
+        @property
+        def domains(self):
+            """
+            Lecture des domaines initialisés via setDomainKey
+
+            :return: la liste des domaines
+            """
+            return list(self._key)
+
         @property
         def ttl(self):
             """
@@ -140,16 +169,21 @@ class BSSConnexion(object):
             """
             if isinstance(domain, str):
                 if utils.checkIsDomain(domain):
-
                     self._domain = domain
                     """Le domaine sur lequel on souhaite travailler"""
                     if domain not in self._key:
                         raise DomainException(domain + " : Domaine non initialisé")
-                    actualTimestamp = round(time())
-                    if (actualTimestamp - self._timestampOfLastToken[domain]) < int( self._ttl * .9 ):
+                    # un token valide est servi sans verrou ; seul le renouvellement est protégé, par un verrou propre
+                    # au domaine, pour qu'un appel /Auth lent ne bloque pas les autres domaines
+                    if self._isValid(domain):
+                        TOKENS.inc(result="hit")
                         return self._token[domain]
-                    else:
-                        self._timestampOfLastToken[domain] = actualTimestamp
+                    with self._domainLock(domain):
+                        if self._isValid(domain):
+                            TOKENS.inc(result="hit")
+                            return self._token[domain]
+                        TOKENS.inc(result="miss")
+                        actualTimestamp = round(time())
                         msg = domain + "|" + str(actualTimestamp)
                         preAuth = hmac.new(self._key[domain].encode("utf-8"), msg.encode("utf-8"), hashlib.sha1).hexdigest()
                         data = {
@@ -157,11 +191,14 @@ class BSSConnexion(object):
                             "timestamp": str(round(time())),
                             "preauth": preAuth
                         }
-                        response = postBSS(self._url + "/Auth", data)
+                        response = getCircuitBreaker("Auth").call(lambda: postBSS(self._url + "/Auth", data, "Auth"))
                         status_code = utils.changeToInt(response["status"])
                         message = response["message"]
                         if status_code == 0:
+                            # le token est écrit avant son timestamp : une lecture sans verrou ne peut pas
+                            # associer un timestamp récent à l'ancien token
                             self._token[domain] = response["token"]
+                            self._timestampOfLastToken[domain] = actualTimestamp
                         else:
                             raise BSSConnexionException(status_code, message)
                         return self._token[domain]
@@ -170,6 +207,13 @@ class BSSConnexion(object):
             else:
                 raise TypeError
 
+        def _isValid(self, domain):
+            return (round(time()) - self._timestampOfLastToken.get(domain, 0)) < int(self._ttl * .9)
+
+        def _domainLock(self, domain):
+            with self._lock:
+                return self._domainLocks.setdefault(domain, threading.Lock())
+
     instance = None
 
     def __new__(cls):  # _new_ est toujours une méthode de classe
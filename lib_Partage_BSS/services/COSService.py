@@ -8,8 +8,17 @@ from time import time
 
 from lib_Partage_BSS import models, utils, services
 from lib_Partage_BSS.exceptions import NameException, DomainException, ServiceException
+from lib_Partage_BSS.utils.Metrics import FILL, phase
+from lib_Partage_BSS.utils.SingleFlight import SingleFlight
+from lib_Partage_BSS.utils.Snapshot import Snapshot
+from lib_Partage_BSS.utils.Tracing import callSpan
 from .GlobalService import callMethod
 
+_inFlight = SingleFlight()
+"""Les lectures de classes de service en cours, partagées entre les threads"""
+_snapshot = Snapshot(softTtl=300, hardTtl=86400)
+"""Les copies locales des dernières classes de service lues (voir getCOS et getAllCOS avec allowStale)"""
+
 
 def fillCOS(cosResponse):
     """
@@ -42,23 +51,49 @@ def fillCOS(cosResponse):
     return retCOS
 
 
-def getCOS(domain, name):
+def getCOS(domain, name, allowStale=False):
     """
-    Méthode permettant de récupérer les informations d'une classe de service via l'API BSS
+    Méthode permettant de récupérer les informations d'une classe de service via l'API BSS.
+    Les lectures simultanées d'une même classe de service sont regroupées en une seule requête.
+    Avec allowStale, la classe de service peut être renvoyée depuis la copie locale de la dernière lecture,
+    rafraîchie en arrière-plan (voir Snapshot et configureCOSSnapshot).
 
+    :param domain: le domaine de la classe de service
+    :param name: le nom de la classe de service
+    :param allowStale: accepte une copie locale éventuellement obsolète (optionnel)
     :return: La classe de service récupérée ou None si la classe de service n'existe pas
     :raises ServiceException: Exception levée si la requête vers l'API à echoué. L'exception contient le code de l'erreur et le message
     :raises NameException: Exception levée si le nom n'est pas une adresse mail valide
     :raises DomainException: Exception levée si le domaine de l'adresse mail n'est pas un domaine valide
     """
+    def read():
+        return _inFlight.do(("GetCos", domain, name), lambda: _getCOS(domain, name))
+    if allowStale:
+        return _snapshot.get(("GetCos", domain, name), read)
+    return read()
+
+
+def configureCOSSnapshot(softTtl=300, hardTtl=86400, maxEntries=10000):
+    """
+    Configure la copie locale utilisée par getCOS et getAllCOS avec allowStale ; les copies existantes sont supprimées
+
+    :param softTtl: l'âge en secondes au delà duquel une copie est rafraîchie en arrière-plan (optionnel)
+    :param hardTtl: l'âge en secondes au delà duquel l'API est interrogée avant de répondre (optionnel)
+    :param maxEntries: le nombre maximal de lectures conservées (optionnel)
+    """
+    global _snapshot
+    _snapshot = Snapshot(softTtl, hardTtl, maxEntries)
+
 
+def _getCOS(domain, name):
     data = {
         "name": name
     }
     response = callMethod(domain, "GetCos", data)
     if utils.checkResponseStatus(response["status"]):
         cos = response["cos"]
-        return fillCOS(cos)
+        with phase("GetCos", FILL), callSpan("GetCos", step="fill"):
+            return fillCOS(cos)
     elif re.search(".*no such cos.*", response["message"]):
         return None
     else:
@@ -67,7 +102,7 @@ def getCOS(domain, name):
 
 
 
-def getAllCOS(domain, limit=100, offset=0, ldapQuery=""):
+def getAllCOS(domain, limit=100, offset=0, ldapQuery="", allowStale=False):
     """
     Permet de rechercher toutes les classes de service d'un domain
 
@@ -75,11 +110,57 @@ def getAllCOS(domain, limit=100, offset=0, ldapQuery=""):
     :param limit: le nombre de résultats renvoyés (optionnel)
     :param offset: le nombre à partir duquel les comptes sont renvoyés (optionnel)
     :param ldapQuery: un filtre ldap pour affiner la rechercher (optionnel)
+    :param allowStale: accepte une copie locale éventuellement obsolète du résultat (optionnel)
     :raises ServiceException: Exception levée si la requête vers l'API à echoué. L'exception contient le code de l'erreur et le message
     :raises DomainException: Exception levée si le domaine n'est pas un domaine valide
     """
     if not utils.checkIsDomain(domain):
         raise DomainException
+    if allowStale:
+        return _snapshot.get(("GetAllCos", domain, limit, offset, ldapQuery),
+                             lambda: _getAllCOS(domain, limit, offset, ldapQuery))
+    return _getAllCOS(domain, limit, offset, ldapQuery)
+
+
+def iterCOSPages(domain, pageSize=100, ldapQuery="", allowStale=False):
+    """
+    Permet de parcourir toutes les classes de service d'un domaine, page par page
+
+    :param domain: le domaine de la recherche
+    :param pageSize: le nombre de classes de service demandées par appel à l'API (optionnel)
+    :param ldapQuery: un filtre ldap pour affiner la rechercher (optionnel)
+    :param allowStale: accepte une copie locale éventuellement obsolète de chaque page (optionnel)
+    :return: un générateur des pages (listes de classes de service)
+    :raises ServiceException: Exception levée si la requête vers l'API à echoué. L'exception contient le code de l'erreur et le message
+    :raises DomainException: Exception levée si le domaine n'est pas un domaine valide
+    """
+    offset = 0
+    while True:
+        coses = getAllCOS(domain, limit=pageSize, offset=offset, ldapQuery=ldapQuery, allowStale=allowStale)
+        yield coses
+        if len(coses) < pageSize:
+            return
+        offset += pageSize
+
+
+def iterAllCOS(domain, pageSize=100, ldapQuery="", allowStale=False):
+    """
+    Permet de parcourir toutes les classes de service d'un domaine, page par page (voir iterCOSPages)
+
+    :param domain: le domaine de la recherche
+    :param pageSize: le nombre de classes de service demandées par appel à l'API (optionnel)
+    :param ldapQuery: un filtre ldap pour affiner la rechercher (optionnel)
+    :param allowStale: accepte une copie locale éventuellement obsolète de chaque page (optionnel)
+    :return: un générateur des classes de service
+    :raises ServiceException: Exception levée si la requête vers l'API à echoué. L'exception contient le code de l'erreur et le message
+    :raises DomainException: Exception levée si le domaine n'est pas un domaine valide
+    """
+    for coses in iterCOSPages(domain, pageSize, ldapQuery, allowStale):
+        for cos in coses:
+            yield cos
+
+
+def _getAllCOS(domain, limit, offset, ldapQuery):
     data = {
         "limit": limit,
         "offset": offset,
@@ -93,10 +174,11 @@ def getAllCOS(domain, limit=100, offset=0, ldapQuery=""):
     else:
         coses = response["coses"]["cose"]
         retCoses = []
-        if isinstance(coses, list):
-            for cos in coses:
-                retCoses.append(fillCOS(cos))
-        else:
-            retCoses.append(fillCOS(coses))
+        with phase("GetAllCos", FILL), callSpan("GetAllCos", step="fill"):
+            if isinstance(coses, list):
+                for cos in coses:
+                    retCoses.append(fillCOS(cos))
+            else:
+                retCoses.append(fillCOS(coses))
         return retCoses
 
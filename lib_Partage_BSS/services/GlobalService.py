@@ -2,10 +2,22 @@
 """
 Module général regroupant les méthodes communes des différents services
 """
+import logging
+from collections import OrderedDict
+from time import monotonic
+
 from lib_Partage_BSS import utils
-from lib_Partage_BSS.exceptions import NameException
+from lib_Partage_BSS.exceptions import NameException, ServiceException
 from lib_Partage_BSS.services import BSSConnexion
 from lib_Partage_BSS.utils.BSSRequest import postBSS
+from lib_Partage_BSS.utils.Bulk import runBulk
+from lib_Partage_BSS.utils.CircuitBreaker import getCircuitBreaker
+from lib_Partage_BSS.utils.Log import getLogger, logEvent
+from lib_Partage_BSS.utils.Metrics import TOTAL, phase, recordStatus
+from lib_Partage_BSS.utils.Scheduler import getScheduler
+from lib_Partage_BSS.utils.Tracing import STATUS, callSpan
+
+_log = getLogger("services")
 
 
 def extractDomain(mailAddress):
@@ -24,7 +36,12 @@ def extractDomain(mailAddress):
 
 def callMethod(domain, methodName, data):
     """
-    Méthode permettant d'appeler une méthode de l'API BSS
+    Méthode permettant d'appeler une méthode de l'API BSS.
+    L'appel attend si nécessaire que l'ordonnanceur l'autorise, selon sa classe de priorité et les limites de débit
+    configurées pour le domaine (voir Scheduler et RateLimiter), et les erreurs transitoires sont rejouées selon la politique de rejeu courante (voir Retry).
+    Lorsque l'API est indisponible pour le domaine, l'appel échoue immédiatement (voir CircuitBreaker).
+    La durée et le statut de l'appel sont enregistrés (voir Metrics), l'appel est tracé (voir Tracing) et journalisé
+    au niveau DEBUG, ou WARNING s'il lève une exception (voir Log).
 
     :param domain: le nom de domaine
     :param methodName: le nom de la méthode à appeler
@@ -32,9 +49,82 @@ def callMethod(domain, methodName, data):
     :return: la réponse reçue de l'API BSS
     :raises ServiceException: Exception levée si la requête vers l'API à echoué. L'exception contient le code de l'erreur et le message
     :raises DomainException: Exception levée si le domaine de l'adresse mail n'est pas un domaine valide
+    :raises CircuitOpenException: Exception levée si l'API est considérée comme indisponible pour le domaine
     """
     con = BSSConnexion()
-    return postBSS(con.url+"/"+methodName+"/"+con.token(domain), data)
 
+    def send():
+        with getScheduler().slot(domain, methodName):
+            with callSpan(methodName, domain, "token"):
+                token = con.token(domain)
+            return postBSS(con.url+"/"+methodName+"/"+token, data, methodName)
+    start = monotonic()
+    with phase(methodName, TOTAL), callSpan(methodName, domain) as current:
+        try:
+            response = getCircuitBreaker(domain).call(send)
+        except ServiceException as err:
+            recordStatus(methodName, err.code)
+            current.set_attribute(STATUS, err.code)
+            logEvent(_log, logging.WARNING, "Échec de l'appel à l'API BSS", domain=domain, method=methodName,
+                     status=err.code, duration=monotonic() - start)
+            raise
+        except Exception as err:
+            recordStatus(methodName, type(err).__name__)
+            logEvent(_log, logging.WARNING, "Échec de l'appel à l'API BSS", domain=domain, method=methodName,
+                     error=type(err).__name__, duration=monotonic() - start)
+            raise
+        status = _statusCode(response)
+        recordStatus(methodName, status)
+        current.set_attribute(STATUS, status)
+    logEvent(_log, logging.DEBUG, "Appel à l'API BSS", domain=domain, method=methodName, status=status,
+             account=data.get("name") if isinstance(data, dict) else None, duration=monotonic() - start)
+    return response
+
+
+def _statusCode(response):
+    try:
+        return utils.changeToInt(response["status"])
+    except (KeyError, TypeError, ValueError):
+        return "unknown"
 
 
+def fanOut(function, domains=None):
+    """
+    Méthode permettant d'exécuter une opération sur plusieurs domaines en parallèle (un thread par domaine).
+    Une erreur sur un domaine n'interrompt pas le traitement des autres domaines. Le nombre de requêtes simultanées
+    de chaque domaine est limité par l'ordonnanceur (voir Scheduler.setDomainLimit et maxInFlightPerDomain), et
+    chaque domaine dispose de son propre disjoncteur (voir CircuitBreaker) : un domaine lent ou indisponible ne
+    pénalise pas les autres.
+
+    :param function: la fonction à appeler, elle reçoit le domaine en paramètre
+    :param domains: les domaines concernés (optionnel, par défaut les domaines initialisés dans BSSConnexion)
+    :return: un OrderedDict {domaine: BulkResult}
+    """
+    if domains is None:
+        domains = BSSConnexion().domains
+    domains = list(domains)
+    results = runBulk(function, domains, maxWorkers=len(domains))
+    return OrderedDict((result.item, result) for result in results)
+
+
+def fanOutMerged(function, domains=None):
+    """
+    Méthode permettant d'exécuter sur plusieurs domaines en parallèle une opération renvoyant une liste, et de
+    fusionner les listes obtenues (voir fanOut)::
+
+        accounts, errors = fanOutMerged(lambda domain: list(AccountService.iterAllAccounts(domain)))
+        coses, errors = fanOutMerged(COSService.getAllCOS)
+
+    :param function: la fonction à appeler, elle reçoit le domaine en paramètre et renvoie une liste
+    :param domains: les domaines concernés (optionnel, par défaut les domaines initialisés dans BSSConnexion)
+    :return: un tuple (la liste fusionnée dans l'ordre des domaines, un OrderedDict {domaine: exception} des \
+    domaines en erreur)
+    """
+    merged = []
+    errors = OrderedDict()
+    for domain, result in fanOut(function, domains).items():
+        if result.ok:
+            merged.extend(result.result)
+        else:
+            errors[domain] = result.error
+    return merged, errors
@@ -1,6 +1,34 @@
 """Package services"""
-from .BSSConnexionService import BSSConnexion
-from .GlobalService import *
-from .AccountService import *
-from .COSService import *
+import importlib
+import sys
 
+_MODULES = ("BSSConnexionService", "GlobalService", "AccountService", "COSService")
+_EXPORTS = ("COSService", "AccountService", "GlobalService")
+"""Modules dont les noms publics sont exposés par le package, par ordre de priorité"""
+
+
+def __getattr__(name):
+    # les services (et requests) ne sont importés qu'à leur première utilisation
+    if name in _MODULES:
+        return importlib.import_module("." + name, __name__)
+    if name == "BSSConnexion":
+        value = importlib.import_module(".BSSConnexionService", __name__).BSSConnexion
+    elif not name.startswith("_"):
+        for moduleName in _EXPORTS:
+            module = importlib.import_module("." + moduleName, __name__)
+            if hasattr(module, name):
+                value = getattr(module, name)
+                break
+        else:
+            raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    else:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    globals()[name] = value
+    return value
+
+
+if sys.version_info < (3, 7):
+    from .BSSConnexionService import BSSConnexion
+    from .GlobalService import *
+    from .AccountService import *
+    from .COSService import *
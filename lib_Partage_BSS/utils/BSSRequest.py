@@ -2,11 +2,61 @@
 """
 Module permettant de faire des requêtes HTTP vers l'API BSS et de parser la réponse
 """
-import xml.etree.ElementTree as et
-from xmljson import yahoo as ya
-import requests
+from time import monotonic
 
-from lib_Partage_BSS.exceptions import ServiceException
+from lib_Partage_BSS.exceptions import DeadlineExceededException, ServiceException
+from lib_Partage_BSS.utils.Deadline import callTimeout, getDefaultTimeout
+from lib_Partage_BSS.utils.Hooks import AFTER_PARSE, AFTER_RESPONSE, BEFORE_REQUEST, ON_ERROR, RequestEvent, \
+    hasHooks, runHooks
+from lib_Partage_BSS.utils.Metrics import DURATION, NETWORK, PARSE, RESPONSE_BYTES
+from lib_Partage_BSS.utils.Retry import getRetryPolicy
+from lib_Partage_BSS.utils.Tracing import callSpan
+
+
+def _post(url, data, timeout):
+    # requests n'est importé qu'à la première requête (voir le démarrage de cli-bss.py)
+    import requests
+    return requests.post(url, data, timeout=timeout)
+
+
+_transport = _post
+
+
+def getTransport():
+    """
+    Renvoie la fonction utilisée pour envoyer les requêtes HTTP à l'API BSS
+
+    :return: la fonction transport(url, data, timeout), qui renvoie un objet ayant les attributs text et content
+    """
+    return _transport
+
+
+def setTransport(transport=None):
+    """
+    Change la fonction utilisée pour envoyer les requêtes HTTP à l'API BSS (par exemple pour rejouer des échanges \
+    enregistrés, voir Cassette)
+
+    :param transport: la fonction transport(url, data, timeout) (None pour revenir à requests.post)
+    """
+    global _transport
+    _transport = transport if transport is not None else _post
+
+
+def sessionTransport(session=None):
+    """
+    Renvoie un transport utilisant une session requests : les connexions HTTP vers l'API sont conservées et \
+    réutilisées d'une requête à l'autre (par exemple pour un traitement en mode batch)
+
+    :param session: la session à utiliser (optionnel, par défaut une nouvelle requests.Session)
+    :return: la fonction transport(url, data, timeout)
+    """
+    if session is None:
+        import requests
+        session = requests.Session()
+
+    def post(url, data, timeout):
+        return session.post(url, data, timeout=timeout)
+    return post
 
 
 def parseResponse(stringXml):
@@ -16,7 +66,12 @@ def parseResponse(stringXml):
     :param stringXml: la chaine XML à transformer en objet python
     :return: l'objet response obtenu
     """
-    response = ya.data(et.fromstring(stringXml))
+    import xml.etree.ElementTree as et
+    from xmljson import yahoo as ya
+    try:
+        response = ya.data(et.fromstring(stringXml))
+    except et.ParseError:
+        raise ServiceException(3, "Problème format réponse")
     if "Response" in response:
         return response["Response"]
     elif "response" in response:
@@ -25,12 +80,76 @@ def parseResponse(stringXml):
         raise ServiceException(3,"Problème format réponse")
 
 
-def postBSS(url, data):
+def postBSS(url, data, methodName=None):
     """
-    Permet de récupérer la réponse d'une requête auprès de l'API BSS
+    Permet de récupérer la réponse d'une requête auprès de l'API BSS.
+    La requête est limitée par le délai d'attente par défaut et par l'échéance courante (voir Deadline).
+    Si le nom de la méthode est fourni, la requête est rejouée selon la politique de rejeu courante (voir Retry).
+    La durée de chaque tentative (réseau et analyse du XML) et la taille des réponses sont enregistrées (voir Metrics)
+    et tracées (voir Tracing), et les fonctions enregistrées via Hooks sont appelées à chaque étape.
 
     :param url: url de l'action demandée avec si nécessaire le token
     :param data: le body de la requête post
+    :param methodName: le nom de la méthode de l'API appelée (optionnel)
     :return: BSSResponse la réponse de l'API BSS
+    :raises DeadlineExceededException: Exception levée si l'échéance courante est dépassée, y compris pendant la \
+    requête
     """
-    return parseResponse(requests.post(url, data).text)
\ No newline at end of file
+    label = methodName or "unknown"
+
+    def send():
+        event = RequestEvent(label, url, data) if hasHooks() else None
+        try:
+            return _send(label, url, data, event)
+        except Exception as err:
+            if event is not None:
+                event.error = err
+                runHooks(ON_ERROR, event)
+            raise
+    if methodName is None:
+        return send()
+    return getRetryPolicy().call(methodName, send)
+
+
+def _raiseIfDeadlineExceeded(error, timeout):
+    # un timeout réduit à l'échéance courante signifie que le temps alloué à l'opération est écoulé
+    if timeout >= getDefaultTimeout():
+        return
+    import requests
+    if isinstance(error, requests.exceptions.Timeout):
+        raise DeadlineExceededException("Temps alloué à l'opération écoulé") from error
+
+
+def _send(label, url, data, event):
+    if event is not None:
+        runHooks(BEFORE_REQUEST, event)
+    timeout = callTimeout()
+    start = monotonic()
+    try:
+        with callSpan(label, step="http"):
+            httpResponse = _transport(url, data, timeout)
+    except Exception as err:
+        _raiseIfDeadlineExceeded(err, timeout)
+        raise
+    finally:
+        networkTime = monotonic() - start
+        DURATION.observe(networkTime, method=label, phase=NETWORK)
+    size = len(httpResponse.content)
+    RESPONSE_BYTES.observe(size, method=label)
+    if event is not None:
+        event.networkTime = networkTime
+        event.responseSize = size
+        event.httpResponse = httpResponse
+        runHooks(AFTER_RESPONSE, event)
+    start = monotonic()
+    try:
+        with callSpan(label, step="parse"):
+            response = parseResponse(httpResponse.text)
+    finally:
+        parseTime = monotonic() - start
+        DURATION.observe(parseTime, method=label, phase=PARSE)
+    if event is not None:
+        event.parseTime = parseTime
+        event.response = response
+        runHooks(AFTER_PARSE, event)
+    return response
\ No newline at end of file
@@ -0,0 +1,197 @@
+# -*-coding:utf-8 -*
+"""
+Module permettant d'exécuter une même opération sur un ensemble d'éléments en parallèle (traitements de masse)
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from time import monotonic
+
+from lib_Partage_BSS.exceptions import CircuitOpenException
+from lib_Partage_BSS.utils.CircuitBreaker import isFailure
+from lib_Partage_BSS.utils.Deadline import currentDeadline, withDeadline
+from lib_Partage_BSS.utils.Scheduler import currentPriority, withPriority
+
+DEFAULT_MAX_WORKERS = 4
+"""Nombre de requêtes simultanées par défaut pour les traitements de masse"""
+
+
+class BulkResult(object):
+    """
+    Classe représentant le résultat d'une opération pour un élément d'un traitement de masse
+
+    :ivar item: l'élément traité
+    :ivar result: la valeur renvoyée par l'opération (None en cas d'erreur)
+    :ivar error: l'exception levée par l'opération (None en cas de succès)
+    """
+    def __init__(self, item, result=None, error=None):
+        self.item = item
+        self.result = result
+        self.error = error
+
+    @property
+    def ok(self):
+        """
+        Indique si l'opération a réussi
+
+        :return: True si aucune exception n'a été levée, False sinon
+        """
+        return self.error is None
+
+    def __repr__(self):
+        if self.ok:
+            return "BulkResult({!r}, result={!r})".format(self.item, self.result)
+        return "BulkResult({!r}, error={!r})".format(self.item, self.error)
+
+
+class AdaptiveConcurrency(object):
+    """
+    Contrôleur AIMD (augmentation additive, diminution multiplicative) du nombre de requêtes simultanées.
+    Le nombre de requêtes simultanées augmente de 1 après chaque fenêtre d'appels dont le p95 de latence et le taux
+    d'erreur restent satisfaisants ; il est multiplié par decrease lors d'une indisponibilité de l'API (erreur réseau,
+    timeout, réponse mal formée, disjoncteur ouvert), lorsque le taux d'erreur dépasse maxErrorRate ou lorsque la
+    latence augmente. Les erreurs fonctionnelles (compte inexistant, déjà existant...) sont sans effet.
+
+    :ivar limit: le nombre actuel de requêtes simultanées autorisées
+    :ivar minimum: le nombre minimal de requêtes simultanées
+    :ivar maximum: le nombre maximal de requêtes simultanées
+    :ivar targetLatency: le p95 de latence (secondes) au delà duquel on réduit la concurrence ; par défaut \
+    latencyTolerance fois le meilleur p95 observé
+    :ivar maxErrorRate: le taux d'erreur maximal toléré sur une fenêtre
+    :ivar window: le nombre d'appels d'une fenêtre d'observation
+    :ivar decrease: le facteur de réduction de la concurrence
+    :ivar latencyTolerance: l'augmentation tolérée du p95 par rapport au meilleur p95 observé
+    """
+    def __init__(self, initial=2, minimum=1, maximum=32, targetLatency=None, maxErrorRate=0.05, window=20,
+                 decrease=0.5, latencyTolerance=1.5):
+        if not 1 <= minimum <= initial <= maximum:
+            raise ValueError("Il faut 1 <= minimum <= initial <= maximum")
+        self.limit = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.targetLatency = targetLatency
+        self.maxErrorRate = maxErrorRate
+        self.window = window
+        self.decrease = decrease
+        self.latencyTolerance = latencyTolerance
+        self._bestP95 = None
+        self._latencies = []
+        self._errors = 0
+        self._sinceBackOff = initial
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def isOverloadError(error):
+        """
+        Indique si une erreur doit entraîner une réduction de la concurrence
+
+        :param error: l'exception levée par un appel
+        :return: True pour les erreurs traduisant une indisponibilité de l'API (voir CircuitBreaker.isFailure), \
+        les timeouts et les disjoncteurs ouverts
+        """
+        return isinstance(error, (CircuitOpenException, TimeoutError)) or isFailure(error)
+
+    def _backOff(self):
+        self.limit = max(self.minimum, int(self.limit * self.decrease))
+        self._latencies = []
+        self._errors = 0
+        self._sinceBackOff = 0
+
+    def record(self, latency, error=None):
+        """
+        Enregistre le résultat d'un appel et ajuste la concurrence autorisée
+
+        :param latency: la durée de l'appel en secondes
+        :param error: l'exception levée par l'appel (None en cas de succès)
+        """
+        with self._lock:
+            self._sinceBackOff += 1
+            overload = error is not None and self.isOverloadError(error)
+            if overload and self._sinceBackOff > self.limit:
+                # les appels déjà en vol lors d'une réduction échouent souvent ensemble : on ne réduit
+                # à nouveau qu'une fois ceux-ci terminés
+                self._backOff()
+                return
+            self._latencies.append(latency)
+            if overload:
+                self._errors += 1
+            if len(self._latencies) < self.window:
+                return
+            latencies = sorted(self._latencies)
+            p95 = latencies[int(0.95 * (len(latencies) - 1))]
+            errorRate = float(self._errors) / len(latencies)
+            threshold = self.targetLatency
+            if threshold is None and self._bestP95 is not None:
+                threshold = self._bestP95 * self.latencyTolerance
+            if self._bestP95 is None or p95 < self._bestP95:
+                self._bestP95 = p95
+            if errorRate > self.maxErrorRate or (threshold is not None and p95 > threshold):
+                self._backOff()
+            else:
+                self.limit = min(self.maximum, self.limit + 1)
+                self._latencies = []
+                self._errors = 0
+
+
+def _runOne(function, item):
+    try:
+        return BulkResult(item, result=function(item))
+    except Exception as err:
+        return BulkResult(item, error=err)
+
+
+def _runTimed(function, item):
+    start = monotonic()
+    result = _runOne(function, item)
+    return result, monotonic() - start
+
+
+def _runAdaptive(function, items, controller):
+    results = [None] * len(items)
+    pending = {}
+    index = 0
+    with ThreadPoolExecutor(max_workers=controller.maximum) as executor:
+        while index < len(items) or pending:
+            while index < len(items) and len(pending) < controller.limit:
+                pending[executor.submit(_runTimed, function, items[index])] = index
+                index += 1
+            done, notDone = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result, latency = future.result()
+                controller.record(latency, result.error)
+                results[pending.pop(future)] = result
+    return results
+
+
+def runBulk(function, items, maxWorkers=DEFAULT_MAX_WORKERS):
+    """
+    Applique une fonction à chacun des éléments d'une liste, avec au plus maxWorkers appels simultanés.
+    Une erreur sur un élément n'interrompt pas le traitement des autres éléments.
+    L'échéance courante (voir Deadline) et la classe de priorité courante (voir Scheduler) s'appliquent aux appels
+    effectués par les threads du traitement.
+
+    :param function: la fonction à appeler, elle reçoit un élément en paramètre
+    :param items: les éléments à traiter
+    :param maxWorkers: le nombre maximal d'appels simultanés (1 pour un traitement séquentiel), ou un \
+    AdaptiveConcurrency pour ajuster ce nombre en fonction des latences et des erreurs observées
+    :return: la liste des BulkResult, dans l'ordre des éléments
+    """
+    items = list(items)
+    function = withDeadline(currentDeadline(), withPriority(currentPriority(), function))
+    if isinstance(maxWorkers, AdaptiveConcurrency):
+        return _runAdaptive(function, items, maxWorkers)
+    if maxWorkers is None or maxWorkers <= 1 or len(items) <= 1:
+        return [_runOne(function, item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(maxWorkers, len(items))) as executor:
+        return list(executor.map(lambda item: _runOne(function, item), items))
+
+
+def raiseFirstError(results):
+    """
+    Lève la première exception rencontrée dans une liste de résultats
+
+    :param results: la liste des BulkResult
+    :raises Exception: la première exception présente dans les résultats
+    """
+    for result in results:
+        if not result.ok:
+            raise result.error
@@ -0,0 +1,161 @@
+# -*-coding:utf-8 -*
+"""
+Module implémentant un disjoncteur par domaine : lorsque l'API BSS est indisponible, les appels échouent immédiatement
+au lieu d'attendre l'expiration du délai réseau, puis des appels de test permettent de détecter le rétablissement
+"""
+import threading
+from time import monotonic
+
+from lib_Partage_BSS.exceptions import CircuitOpenException, ServiceException
+
+CLOSED = "closed"
+"""Etat normal : les appels sont transmis à l'API"""
+OPEN = "open"
+"""Etat ouvert : les appels échouent immédiatement"""
+HALF_OPEN = "half-open"
+"""Etat semi-ouvert : quelques appels de test sont transmis pour vérifier le rétablissement de l'API"""
+
+
+def isFailure(error):
+    """
+    Indique si une exception traduit une indisponibilité de l'API (et non une erreur fonctionnelle)
+
+    :param error: l'exception levée par l'appel
+    :return: True pour les erreurs réseau, les timeouts et les réponses mal formées
+    """
+    if isinstance(error, ServiceException):
+        return error.code == 3
+    import requests
+    return isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+
+class CircuitBreaker(object):
+    """
+    Disjoncteur protégeant les appels vers un domaine (ou vers l'authentification)
+
+    :ivar name: le nom du disjoncteur
+    :ivar failureThreshold: le nombre d'échecs consécutifs provoquant l'ouverture
+    :ivar resetTimeout: la durée en secondes pendant laquelle le disjoncteur reste ouvert avant un appel de test
+    :ivar halfOpenMaxCalls: le nombre d'appels de test simultanés en état semi-ouvert
+    """
+    def __init__(self, name, failureThreshold=5, resetTimeout=30, halfOpenMaxCalls=1):
+        self.name = name
+        self.failureThreshold = failureThreshold
+        self.resetTimeout = resetTimeout
+        self.halfOpenMaxCalls = halfOpenMaxCalls
+        self._state = CLOSED
+        self._failures = 0
+        self._openedAt = 0
+        self._probes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        """
+        Lecture de l'état du disjoncteur
+
+        :return: CLOSED, OPEN ou HALF_OPEN
+        """
+        with self._lock:
+            if self._state == OPEN and monotonic() - self._openedAt >= self.resetTimeout:
+                return HALF_OPEN
+            return self._state
+
+    def before(self):
+        """
+        Vérifie qu'un appel peut être effectué
+
+        :raises CircuitOpenException: Exception levée si le disjoncteur est ouvert
+        """
+        with self._lock:
+            if self._state == CLOSED:
+                return
+            remaining = self.resetTimeout - (monotonic() - self._openedAt)
+            if self._state == OPEN and remaining <= 0:
+                self._state = HALF_OPEN
+                self._probes = 0
+            if self._state == HALF_OPEN and self._probes < self.halfOpenMaxCalls:
+                self._probes += 1
+                return
+            raise CircuitOpenException(self.name, max(0, remaining))
+
+    def onSuccess(self):
+        """
+        Enregistre un appel réussi : le disjoncteur se referme
+        """
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._probes = 0
+
+    def onFailure(self):
+        """
+        Enregistre une indisponibilité de l'API : le disjoncteur s'ouvre après failureThreshold échecs consécutifs,
+        ou immédiatement si l'appel était un appel de test
+        """
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failureThreshold:
+                self._state = OPEN
+                self._openedAt = monotonic()
+                self._probes = 0
+
+    def onIgnored(self):
+        """
+        Enregistre un appel dont le résultat ne renseigne pas sur la disponibilité de l'API
+        """
+        with self._lock:
+            if self._state == HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def call(self, function):
+        """
+        Exécute un appel à travers le disjoncteur
+
+        :param function: la fonction effectuant l'appel
+        :return: le résultat de la fonction
+        :raises CircuitOpenException: Exception levée si le disjoncteur est ouvert
+        """
+        self.before()
+        try:
+            result = function()
+        except Exception as err:
+            if isFailure(err):
+                self.onFailure()
+            else:
+                self.onIgnored()
+            raise
+        self.onSuccess()
+        return result
+
+
+_settings = {"failureThreshold": 5, "resetTimeout": 30, "halfOpenMaxCalls": 1}
+_breakers = {}
+_lock = threading.Lock()
+
+
+def getCircuitBreaker(name):
+    """
+    Renvoie le disjoncteur associé à un domaine (ou à l'authentification), en le créant si nécessaire
+
+    :param name: le nom de domaine, ou "Auth"
+    :return: le CircuitBreaker
+    """
+    with _lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name, **_settings)
+        return _breakers[name]
+
+
+def configureCircuitBreakers(failureThreshold=5, resetTimeout=30, halfOpenMaxCalls=1):
+    """
+    Configure les disjoncteurs ; les disjoncteurs existants sont réinitialisés
+
+    :param failureThreshold: le nombre d'échecs consécutifs provoquant l'ouverture
+    :param resetTimeout: la durée en secondes pendant laquelle un disjoncteur reste ouvert avant un appel de test
+    :param halfOpenMaxCalls: le nombre d'appels de test simultanés en état semi-ouvert
+    """
+    with _lock:
+        _settings.update(failureThreshold=failureThreshold, resetTimeout=resetTimeout,
+                         halfOpenMaxCalls=halfOpenMaxCalls)
+        _breakers.clear()
@@ -0,0 +1,124 @@
+# -*-coding:utf-8 -*
+"""
+Module gérant les délais d'attente des requêtes vers l'API BSS et les échéances des opérations composées.
+
+Chaque requête HTTP est limitée par un délai par défaut. Une échéance peut en outre être fixée pour un ensemble
+d'appels ; elle s'applique à tous les appels effectués dans le bloc, y compris par les opérations composées
+(createAccount, preDeleteAccount, ...) et par les traitements de masse::
+
+    with deadline(10):
+        AccountService.preDeleteAccount("user@x.fr")
+"""
+import threading
+from contextlib import contextmanager
+from time import monotonic
+
+from lib_Partage_BSS.exceptions import DeadlineExceededException
+
+_defaultTimeout = 30.0
+_local = threading.local()
+
+
+def getDefaultTimeout():
+    """
+    Renvoie le délai d'attente par défaut d'une requête HTTP vers l'API BSS
+
+    :return: le délai en secondes
+    """
+    return _defaultTimeout
+
+
+def setDefaultTimeout(seconds):
+    """
+    Change le délai d'attente par défaut d'une requête HTTP vers l'API BSS
+
+    :param seconds: le délai en secondes
+    """
+    global _defaultTimeout
+    _defaultTimeout = float(seconds)
+
+
+def currentDeadline():
+    """
+    Renvoie l'échéance courante du thread
+
+    :return: l'échéance (valeur de time.monotonic) ou None si aucune échéance n'est fixée
+    """
+    return getattr(_local, "deadline", None)
+
+
+@contextmanager
+def deadline(seconds):
+    """
+    Fixe une échéance pour l'ensemble des appels effectués dans le bloc. Une échéance imbriquée ne peut pas
+    repousser l'échéance englobante.
+
+    :param seconds: le temps alloué en secondes
+    """
+    previous = currentDeadline()
+    new = monotonic() + seconds
+    _local.deadline = new if previous is None else min(previous, new)
+    try:
+        yield
+    finally:
+        _local.deadline = previous
+
+
+def withDeadline(absoluteDeadline, function):
+    """
+    Renvoie une fonction exécutant function avec l'échéance donnée ; permet de propager l'échéance vers d'autres threads
+
+    :param absoluteDeadline: l'échéance (valeur de time.monotonic) ou None
+    :param function: la fonction à exécuter
+    :return: la fonction encapsulée
+    """
+    if absoluteDeadline is None:
+        return function
+
+    def wrapped(*args, **kwargs):
+        previous = currentDeadline()
+        _local.deadline = absoluteDeadline
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _local.deadline = previous
+    return wrapped
+
+
+def remainingTime():
+    """
+    Renvoie le temps restant avant l'échéance courante
+
+    :return: le temps restant en secondes, ou None si aucune échéance n'est fixée
+    """
+    current = currentDeadline()
+    if current is None:
+        return None
+    return current - monotonic()
+
+
+def checkDeadline(wait=0):
+    """
+    Vérifie qu'il reste assez de temps avant l'échéance pour attendre wait secondes
+
+    :param wait: le temps d'attente envisagé en secondes
+    :raises DeadlineExceededException: Exception levée si l'échéance est (ou sera) dépassée
+    """
+    remaining = remainingTime()
+    if remaining is not None and remaining <= wait:
+        raise DeadlineExceededException("Temps alloué à l'opération écoulé")
+
+
+def callTimeout():
+    """
+    Calcule le délai d'attente d'une requête HTTP : le délai par défaut, réduit au temps restant avant l'échéance
+
+    :return: le délai en secondes
+    :raises DeadlineExceededException: Exception levée si l'échéance est dépassée
+    """
+    remaining = remainingTime()
+    if remaining is None:
+        return _defaultTimeout
+    if remaining <= 0:
+        raise DeadlineExceededException("Temps alloué à l'opération écoulé")
+    return min(_defaultTimeout, remaining)
@@ -0,0 +1,122 @@
+# -*-coding:utf-8 -*
+"""
+Module permettant d'enregistrer des fonctions appelées à chaque étape d'une requête vers l'API BSS (profilage,
+journal des appels lents, enregistrement des échanges, ...), sans remplacer requests.post::
+
+    def slowCalls(event):
+        if event.networkTime > 1:
+            print(event.methodName, event.networkTime)
+    addHook(AFTER_RESPONSE, slowCalls)
+
+Chaque fonction reçoit un RequestEvent, le même objet pour toutes les étapes d'une tentative. Une exception levée
+par une fonction est journalisée et n'interrompt pas la requête. Sans fonction enregistrée, aucun RequestEvent
+n'est créé.
+"""
+import logging
+import threading
+from time import monotonic, time
+from urllib.parse import urlencode
+
+BEFORE_REQUEST = "before_request"
+"""Étape précédant l'envoi de la requête HTTP"""
+AFTER_RESPONSE = "after_response"
+"""Étape suivant la réception de la réponse HTTP (networkTime, responseSize, httpResponse renseignés)"""
+AFTER_PARSE = "after_parse"
+"""Étape suivant l'analyse de la réponse XML (parseTime, response renseignés)"""
+ON_ERROR = "on_error"
+"""Étape suivant une exception levée par la requête ou l'analyse de la réponse (error renseigné)"""
+
+EVENTS = (BEFORE_REQUEST, AFTER_RESPONSE, AFTER_PARSE, ON_ERROR)
+
+_hooks = dict((event, ()) for event in EVENTS)
+_lock = threading.Lock()
+
+
+class RequestEvent(object):
+    """
+    Informations sur une tentative de requête vers l'API BSS
+
+    :ivar methodName: la méthode de l'API appelée
+    :ivar url: l'url de la requête ; elle contient le token, à masquer avant tout enregistrement
+    :ivar data: le body de la requête
+    :ivar requestSize: la taille du body encodé en octets
+    :ivar startTime: l'horodatage (time.time) du début de la tentative
+    :ivar networkTime: la durée de la requête HTTP en secondes
+    :ivar responseSize: la taille de la réponse en octets
+    :ivar httpResponse: la réponse HTTP (requests.Response)
+    :ivar parseTime: la durée de l'analyse de la réponse XML en secondes
+    :ivar response: la réponse analysée
+    :ivar error: l'exception levée
+    :ivar elapsed: la durée de la tentative jusqu'à l'étape courante en secondes
+    """
+    def __init__(self, methodName, url, data):
+        self.methodName = methodName
+        self.url = url
+        self.data = data
+        self.requestSize = len(urlencode(data).encode("utf-8")) if isinstance(data, dict) else 0
+        self.startTime = time()
+        self.networkTime = None
+        self.responseSize = None
+        self.httpResponse = None
+        self.parseTime = None
+        self.response = None
+        self.error = None
+        self._start = monotonic()
+
+    @property
+    def elapsed(self):
+        return monotonic() - self._start
+
+
+def addHook(event, callback):
+    """
+    Enregistre une fonction appelée à une étape des requêtes
+
+    :param event: BEFORE_REQUEST, AFTER_RESPONSE, AFTER_PARSE ou ON_ERROR
+    :param callback: la fonction, elle reçoit le RequestEvent
+    """
+    if event not in _hooks:
+        raise ValueError(str(event) + " n'est pas une étape valide")
+    with _lock:
+        _hooks[event] = _hooks[event] + (callback,)
+
+
+def removeHook(event, callback):
+    """
+    Retire une fonction enregistrée via addHook
+
+    :param event: l'étape
+    :param callback: la fonction
+    """
+    with _lock:
+        _hooks[event] = tuple(hook for hook in _hooks[event] if hook is not callback)
+
+
+def clearHooks():
+    """
+    Retire toutes les fonctions enregistrées
+    """
+    with _lock:
+        for event in EVENTS:
+            _hooks[event] = ()
+
+
+def hasHooks():
+    """
+    :return: True si au moins une fonction est enregistrée
+    """
+    return any(_hooks[event] for event in EVENTS)
+
+
+def runHooks(event, requestEvent):
+    """
+    Appelle les fonctions enregistrées pour une étape
+
+    :param event: l'étape
+    :param requestEvent: le RequestEvent transmis aux fonctions
+    """
+    for callback in _hooks[event]:
+        try:
+            callback(requestEvent)
+        except Exception:
+            logging.getLogger("lib_Partage_BSS.hooks").exception("Erreur dans la fonction " + repr(callback))
@@ -0,0 +1,421 @@
+# -*-coding:utf-8 -*
+"""
+Module implémentant une file de travail persistante (SQLite) pour les traitements de masse.
+
+Chaque élément d'un traitement passe par les états pending, inflight, done ou failed. Les éléments sont loués par les
+workers pour une durée limitée, les échecs sont rejoués un nombre limité de fois, et un traitement interrompu reprend
+là où il s'était arrêté sans refaire le travail déjà effectué::
+
+    queue = JobQueue("/var/lib/bss/jobs.sqlite", "fermeture-2018")
+    queue.add(names)
+    queue.run(AccountService.closeAccount, maxWorkers=8)
+
+Pour répartir un traitement entre plusieurs processus ou plusieurs hôtes partageant la même base, ShardedJobQueue
+découpe les éléments en lots (shards) selon un hachage de leur valeur ; chaque lot est loué par un seul worker à la fois.
+"""
+import json
+import os
+import socket
+import sqlite3
+import zlib
+from contextlib import contextmanager
+from time import sleep, time
+
+from lib_Partage_BSS.exceptions import CircuitOpenException
+from lib_Partage_BSS.utils.Bulk import DEFAULT_MAX_WORKERS, runBulk
+from lib_Partage_BSS.utils.Scheduler import BULK, priority
+
+PENDING = "pending"
+"""Elément en attente de traitement"""
+IN_FLIGHT = "inflight"
+"""Elément loué par un worker, en cours de traitement"""
+DONE = "done"
+"""Elément traité avec succès"""
+FAILED = "failed"
+"""Elément en échec après maxAttempts tentatives"""
+
+_POLL_INTERVAL = 1.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    job TEXT NOT NULL,
+    item TEXT NOT NULL,
+    shard INTEGER NOT NULL DEFAULT 0,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    leaseOwner TEXT,
+    leaseExpires REAL,
+    result TEXT,
+    error TEXT,
+    updated REAL,
+    PRIMARY KEY (job, item)
+);
+CREATE INDEX IF NOT EXISTS items_state ON items (job, shard, state);
+CREATE TABLE IF NOT EXISTS shards (
+    job TEXT NOT NULL,
+    shard INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    leaseOwner TEXT,
+    leaseExpires REAL,
+    PRIMARY KEY (job, shard)
+);
+"""
+
+
+def defaultOwner():
+    """
+    Renvoie l'identifiant par défaut d'un worker (nom d'hôte et numéro de processus)
+
+    :return: l'identifiant hôte:pid
+    """
+    return socket.gethostname() + ":" + str(os.getpid())
+
+
+class JobQueue(object):
+    """
+    File de travail persistante d'un traitement de masse
+
+    :ivar path: le chemin de la base SQLite
+    :ivar job: le nom du traitement ; plusieurs traitements peuvent partager une même base
+    :ivar maxAttempts: le nombre maximal de tentatives par élément
+    :ivar leaseDuration: la durée en secondes d'une location ; passé ce délai un élément peut être repris par un autre worker
+    :ivar owner: l'identifiant du worker
+    """
+    def __init__(self, path, job, maxAttempts=3, leaseDuration=300, owner=None):
+        self.path = path
+        self.job = job
+        self.maxAttempts = maxAttempts
+        self.leaseDuration = leaseDuration
+        self.owner = owner if owner is not None else defaultOwner()
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+
+    @contextmanager
+    def _transaction(self):
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except Exception:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+
+    def close(self):
+        """
+        Ferme la connexion à la base
+        """
+        self._db.close()
+
+    def add(self, items):
+        """
+        Ajoute des éléments au traitement ; les éléments déjà présents (y compris terminés) sont ignorés
+
+        :param items: les éléments à ajouter (valeurs sérialisables en JSON, par exemple des noms de comptes)
+        :return: le nombre d'éléments ajoutés
+        """
+        now = time()
+        keys = [json.dumps(item, sort_keys=True) for item in items]
+        before = self._db.total_changes
+        with self._transaction():
+            self._db.executemany(
+                "INSERT OR IGNORE INTO items (job, item, shard, state, updated) VALUES (?, ?, ?, ?, ?)",
+                [(self.job, key, self._shardOf(key), PENDING, now) for key in keys])
+            added = self._db.total_changes - before
+            self._afterAdd(keys)
+        return added
+
+    def _shardOf(self, key):
+        return 0
+
+    def _afterAdd(self, keys):
+        pass
+
+    def lease(self, count, shard=None):
+        """
+        Loue des éléments à traiter : éléments en attente, ou en cours dont la location a expiré
+
+        :param count: le nombre maximal d'éléments à louer
+        :param shard: ne louer que les éléments de ce lot (optionnel)
+        :return: la liste des éléments loués
+        """
+        now = time()
+        shardFilter = "" if shard is None else " AND shard = %d" % shard
+        with self._transaction():
+            self._db.execute(
+                "UPDATE items SET state = ?, error = ?, leaseOwner = NULL, leaseExpires = NULL, updated = ? "
+                "WHERE job = ? AND state = ? AND leaseExpires < ? AND attempts >= ?" + shardFilter,
+                (FAILED, "Location expirée", now, self.job, IN_FLIGHT, now, self.maxAttempts))
+            rows = self._db.execute(
+                "SELECT item FROM items WHERE job = ? AND attempts < ? "
+                "AND (state = ? OR (state = ? AND leaseExpires < ?))" + shardFilter + " ORDER BY rowid LIMIT ?",
+                (self.job, self.maxAttempts, PENDING, IN_FLIGHT, now, count)).fetchall()
+            self._db.executemany(
+                "UPDATE items SET state = ?, attempts = attempts + 1, leaseOwner = ?, leaseExpires = ?, updated = ? "
+                "WHERE job = ? AND item = ?",
+                [(IN_FLIGHT, self.owner, now + self.leaseDuration, now, self.job, row[0]) for row in rows])
+        return [json.loads(row[0]) for row in rows]
+
+    def _finish(self, item, state, result=None, error=None, attempt=0):
+        # seul le worker qui détient la location peut terminer l'élément : un worker dont la location a expiré
+        # (élément repris par un autre worker) ne modifie plus l'élément
+        return self._db.execute(
+            "UPDATE items SET state = ?, result = ?, error = ?, attempts = attempts + ?, leaseOwner = NULL, "
+            "leaseExpires = NULL, updated = ? WHERE job = ? AND item = ? AND state = ? AND leaseOwner = ?",
+            (state, result, error, attempt, time(), self.job, json.dumps(item, sort_keys=True), IN_FLIGHT,
+             self.owner)).rowcount == 1
+
+    def complete(self, item, result=None):
+        """
+        Marque un élément comme traité
+
+        :param item: l'élément
+        :param result: le résultat du traitement, conservé sous forme JSON (optionnel)
+        :return: True si l'élément a été marqué, False s'il n'est plus loué par ce worker
+        """
+        return self._finish(item, DONE, result=json.dumps(result, default=str))
+
+    def fail(self, item, error):
+        """
+        Enregistre l'échec du traitement d'un élément ; l'élément sera rejoué tant que maxAttempts n'est pas atteint
+
+        :param item: l'élément
+        :param error: l'exception ou le message d'erreur
+        :return: True si l'échec a été enregistré, False si l'élément n'est plus loué par ce worker
+        """
+        attempts = self._db.execute("SELECT attempts FROM items WHERE job = ? AND item = ?",
+                                    (self.job, json.dumps(item, sort_keys=True))).fetchone()
+        state = FAILED if attempts is not None and attempts[0] >= self.maxAttempts else PENDING
+        return self._finish(item, state, error=_describe(error))
+
+    def release(self, item):
+        """
+        Remet un élément en attente sans compter la tentative (traitement différé)
+
+        :param item: l'élément
+        :return: True si l'élément a été remis en attente, False s'il n'est plus loué par ce worker
+        """
+        return self._finish(item, PENDING, attempt=-1)
+
+    def requeueInFlight(self):
+        """
+        Remet en attente tous les éléments en cours, sans attendre l'expiration de leur location.
+        A n'utiliser au redémarrage d'un traitement interrompu que si aucun autre worker ne travaille sur la file.
+
+        :return: le nombre d'éléments remis en attente
+        """
+        return self._db.execute(
+            "UPDATE items SET state = ?, leaseOwner = NULL, leaseExpires = NULL WHERE job = ? AND state = ?",
+            (PENDING, self.job, IN_FLIGHT)).rowcount
+
+    def retryFailed(self):
+        """
+        Remet en attente les éléments en échec, avec un nouveau crédit de tentatives
+
+        :return: le nombre d'éléments remis en attente
+        """
+        return self._db.execute(
+            "UPDATE items SET state = ?, attempts = 0, error = NULL WHERE job = ? AND state = ?",
+            (PENDING, self.job, FAILED)).rowcount
+
+    def counts(self):
+        """
+        Compte les éléments du traitement par état
+
+        :return: dictionnaire {état: nombre d'éléments}
+        """
+        counts = dict.fromkeys([PENDING, IN_FLIGHT, DONE, FAILED], 0)
+        for state, count in self._db.execute("SELECT state, COUNT(*) FROM items WHERE job = ? GROUP BY state",
+                                             (self.job,)):
+            counts[state] = count
+        return counts
+
+    def errors(self):
+        """
+        Renvoie les éléments en échec et leur dernière erreur
+
+        :return: dictionnaire {élément: message d'erreur}
+        """
+        return dict((json.loads(item), error) for item, error in self._db.execute(
+            "SELECT item, error FROM items WHERE job = ? AND state = ? ORDER BY rowid", (self.job, FAILED)))
+
+    def run(self, function, maxWorkers=DEFAULT_MAX_WORKERS, batchSize=100):
+        """
+        Traite les éléments de la file jusqu'à ce qu'il ne reste plus d'élément à louer.
+        Les appels sont effectués avec la classe de priorité BULK (voir Scheduler). Lorsque l'API est indisponible
+        (CircuitOpenException), les éléments sont différés sans consommer de tentative.
+
+        :param function: la fonction à appliquer, elle reçoit un élément en paramètre
+        :param maxWorkers: le nombre maximal d'appels simultanés, ou un AdaptiveConcurrency (voir runBulk)
+        :param batchSize: le nombre d'éléments loués à la fois
+        :return: le nombre d'éléments par état à la fin du traitement
+        """
+        while True:
+            items = self.lease(batchSize)
+            if not items:
+                return self.counts()
+            self._process(function, items, maxWorkers)
+
+    def _process(self, function, items, maxWorkers):
+        retryAfter = 0
+        with priority(BULK):
+            results = runBulk(function, items, maxWorkers)
+        with self._transaction():
+            for result in results:
+                if result.ok:
+                    self.complete(result.item, result.result)
+                elif isinstance(result.error, CircuitOpenException):
+                    self.release(result.item)
+                    retryAfter = max(retryAfter, result.error.retryAfter)
+                else:
+                    self.fail(result.item, result.error)
+        if retryAfter:
+            sleep(retryAfter)
+
+
+class ShardedJobQueue(JobQueue):
+    """
+    File de travail persistante dont les éléments sont répartis en lots (shards) selon un hachage de leur valeur.
+    Plusieurs processus, éventuellement sur plusieurs hôtes, peuvent exécuter run() sur la même base partagée :
+    chaque lot n'est loué que par un seul worker à la fois, et chaque élément n'est traité qu'une fois.
+    La location d'un lot est renouvelée après chaque groupe d'éléments traités ; leaseDuration doit donc
+    être supérieure à la durée de traitement d'un groupe.
+
+    :ivar shardCount: le nombre de lots ; il doit rester le même pour tous les workers d'un traitement
+    """
+    def __init__(self, path, job, shardCount=16, maxAttempts=3, leaseDuration=300, owner=None):
+        JobQueue.__init__(self, path, job, maxAttempts=maxAttempts, leaseDuration=leaseDuration, owner=owner)
+        self.shardCount = shardCount
+
+    def _shardOf(self, key):
+        return zlib.crc32(key.encode("utf-8")) % self.shardCount
+
+    def _afterAdd(self, keys):
+        shards = set(self._shardOf(key) for key in keys)
+        self._db.executemany("INSERT OR IGNORE INTO shards (job, shard, state) VALUES (?, ?, ?)",
+                             [(self.job, shard, PENDING) for shard in shards])
+        # un lot terminé redevient disponible si de nouveaux éléments y sont ajoutés
+        self._db.executemany("UPDATE shards SET state = ? WHERE job = ? AND shard = ? AND state = ?",
+                             [(PENDING, self.job, shard, DONE) for shard in shards])
+
+    def _reopenShards(self):
+        self._db.execute(
+            "UPDATE shards SET state = ? WHERE job = ? AND state = ? AND shard IN "
+            "(SELECT DISTINCT shard FROM items WHERE job = ? AND state = ?)",
+            (PENDING, self.job, DONE, self.job, PENDING))
+
+    def requeueInFlight(self):
+        """
+        Remet en attente tous les éléments en cours et rouvre les lots qui les contiennent (voir JobQueue.requeueInFlight)
+
+        :return: le nombre d'éléments remis en attente
+        """
+        with self._transaction():
+            count = JobQueue.requeueInFlight(self)
+            self._reopenShards()
+        return count
+
+    def retryFailed(self):
+        """
+        Remet en attente les éléments en échec et rouvre les lots qui les contiennent (voir JobQueue.retryFailed)
+
+        :return: le nombre d'éléments remis en attente
+        """
+        with self._transaction():
+            count = JobQueue.retryFailed(self)
+            self._reopenShards()
+        return count
+
+    def outstanding(self, shard):
+        """
+        Renvoie les éléments d'un lot restant à traiter
+
+        :param shard: le numéro du lot
+        :return: le nombre d'éléments en attente ou en cours, et l'expiration la plus proche des locations en cours \
+        (None s'il n'y en a pas)
+        """
+        return tuple(self._db.execute(
+            "SELECT COUNT(*), MIN(leaseExpires) FROM items WHERE job = ? AND shard = ? "
+            "AND (state = ? OR (state = ? AND attempts < ?))",
+            (self.job, shard, IN_FLIGHT, PENDING, self.maxAttempts)).fetchone())
+
+    def leaseShard(self, exclude=()):
+        """
+        Loue un lot non terminé, libre ou dont la location a expiré
+
+        :param exclude: les lots à ne pas louer (optionnel)
+        :return: le numéro du lot, ou None s'il n'y a plus de lot disponible
+        """
+        now = time()
+        excludeFilter = "".join(" AND shard != %d" % shard for shard in exclude)
+        with self._transaction():
+            row = self._db.execute(
+                "SELECT shard FROM shards WHERE job = ? AND state != ? "
+                "AND (leaseOwner IS NULL OR leaseExpires < ? OR leaseOwner = ?)" + excludeFilter +
+                " ORDER BY shard LIMIT 1",
+                (self.job, DONE, now, self.owner)).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE shards SET state = ?, leaseOwner = ?, leaseExpires = ? WHERE job = ? AND shard = ?",
+                             (IN_FLIGHT, self.owner, now + self.leaseDuration, self.job, row[0]))
+        return row[0]
+
+    def renewShard(self, shard):
+        """
+        Prolonge la location d'un lot
+
+        :param shard: le numéro du lot
+        :return: True si le lot est toujours loué par ce worker, False s'il a été repris par un autre worker
+        """
+        return self._db.execute(
+            "UPDATE shards SET leaseExpires = ? WHERE job = ? AND shard = ? AND leaseOwner = ?",
+            (time() + self.leaseDuration, self.job, shard, self.owner)).rowcount == 1
+
+    def releaseShard(self, shard, done=False):
+        """
+        Libère un lot
+
+        :param shard: le numéro du lot
+        :param done: True si tous les éléments du lot ont été traités
+        """
+        self._db.execute(
+            "UPDATE shards SET state = ?, leaseOwner = NULL, leaseExpires = NULL "
+            "WHERE job = ? AND shard = ? AND leaseOwner = ?",
+            (DONE if done else PENDING, self.job, shard, self.owner))
+
+    def run(self, function, maxWorkers=DEFAULT_MAX_WORKERS, batchSize=100):
+        """
+        Traite les lots disponibles les uns après les autres jusqu'à ce qu'il n'en reste plus.
+        Un lot dont des éléments sont encore loués par un autre worker (reprise après expiration de la location du
+        lot) n'est terminé qu'une fois ces éléments traités, ou repris ici lorsque leur location expire.
+
+        :param function: la fonction à appliquer, elle reçoit un élément en paramètre
+        :param maxWorkers: le nombre maximal d'appels simultanés, ou un AdaptiveConcurrency (voir runBulk)
+        :param batchSize: le nombre d'éléments loués à la fois
+        :return: le nombre d'éléments par état à la fin du traitement
+        """
+        waiting = {}
+        while True:
+            shard = self.leaseShard(exclude=waiting)
+            if shard is None:
+                if not waiting:
+                    return self.counts()
+                sleep(min(_POLL_INTERVAL, max(0, min(waiting.values()) - time())))
+                waiting = {}
+                continue
+            while True:
+                items = self.lease(batchSize, shard)
+                if not items:
+                    count, expires = self.outstanding(shard)
+                    self.releaseShard(shard, done=count == 0)
+                    if count:
+                        waiting[shard] = expires if expires is not None else time()
+                    break
+                self._process(function, items, maxWorkers)
+                if not self.renewShard(shard):
+                    break
+
+
+def _describe(error):
+    if isinstance(error, Exception):
+        return type(error).__name__ + " : " + str(getattr(error, "msg", error))
+    return str(error)
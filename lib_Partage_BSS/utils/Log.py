@@ -2,30 +2,200 @@
 # vim: set tabstop=4 softtabstop=4 shiftwidth=4 expandtab:
 
 """
-Logger (singleton)
+Journalisation de la bibliothèque, basée sur le module standard logging.
 
-Logger pour les consommateurs RMQ
+Les messages sont émis par les loggers "lib_Partage_BSS.*" avec des champs structurés (domain, method, account,
+duration, ...) passés via fields. configureLogging installe un handler non bloquant : les messages sont placés
+dans une file et écrits (syslog, flux) par un thread dédié, le syslog n'étant ouvert qu'une seule fois::
+
+    configureLogging(level=logging.INFO, syslogIdent="bss")
+    logEvent(getLogger(), logging.INFO, "compte créé", account="test@domain.com")
+
+Logger (singleton) est conservé pour les consommateurs RMQ
 DSI plamaizi 25/04/2017
 
 """
-import syslog
+import logging
+import logging.handlers
+import queue
+import threading
+
+LOGGER_NAME = "lib_Partage_BSS"
+"""Nom du logger racine de la bibliothèque"""
+
+DEFAULT_FORMAT = "%(asctime)s %(name)s %(levelname)s %(message)s"
+"""Format par défaut des messages écrits dans un flux"""
+
+logging.getLogger(LOGGER_NAME).addHandler(logging.NullHandler())
+
+# noms des priorités syslog : le module syslog, absent de certaines plateformes (Windows), n'est importé que par
+# SyslogHandler
+_SYSLOG_PRIORITIES = {
+    logging.DEBUG: "LOG_DEBUG",
+    logging.INFO: "LOG_INFO",
+    logging.WARNING: "LOG_WARNING",
+    logging.ERROR: "LOG_ERR",
+    logging.CRITICAL: "LOG_CRIT",
+}
+
+
+def getLogger(name=None):
+    """
+    Renvoie un logger de la bibliothèque
+
+    :param name: le suffixe du logger (optionnel, par exemple "services")
+    :return: le logger "lib_Partage_BSS" ou "lib_Partage_BSS.<name>"
+    """
+    if name is None:
+        return logging.getLogger(LOGGER_NAME)
+    return logging.getLogger(LOGGER_NAME + "." + name)
+
+
+def logEvent(logger, level, message, **fields):
+    """
+    Émet un message accompagné de champs structurés ; rien n'est calculé si le niveau n'est pas actif
+
+    :param logger: le logger
+    :param level: le niveau du message (logging.INFO, ...)
+    :param message: le message
+    :param fields: les champs structurés (domain, method, account, duration, ...)
+    """
+    if logger.isEnabledFor(level):
+        logger.log(level, message, extra={"fields": fields})
+
+
+def _formatValue(value):
+    if isinstance(value, float):
+        value = round(value, 6)
+    value = str(value)
+    if not value or any(char in value for char in " \"=\n"):
+        return "\"" + value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") + "\""
+    return value
+
+
+class StructuredFormatter(logging.Formatter):
+    """
+    Formateur ajoutant au message les champs structurés sous la forme cle=valeur
+    """
+    def format(self, record):
+        message = super(StructuredFormatter, self).format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            message += " " + " ".join(key + "=" + _formatValue(fields[key]) for key in sorted(fields))
+        return message
+
+
+class SyslogHandler(logging.Handler):
+    """
+    Handler écrivant dans le syslog local ; le syslog est ouvert une seule fois, à la création du handler
+
+    :ivar ident: l'identifiant des messages dans le syslog
+    :ivar facility: la facility syslog (par défaut syslog.LOG_USER)
+    """
+    def __init__(self, ident=None, facility=None):
+        super(SyslogHandler, self).__init__()
+        import syslog
+        self._syslog = syslog
+        self.ident = ident
+        self.facility = facility if facility is not None else syslog.LOG_USER
+        if ident is None:
+            syslog.openlog(facility=self.facility)
+        else:
+            syslog.openlog(ident=ident, facility=self.facility)
+
+    def emit(self, record):
+        try:
+            priority = getattr(self._syslog, _SYSLOG_PRIORITIES.get(record.levelno, "LOG_INFO"))
+            self._syslog.syslog(priority, self.format(record))
+        except Exception:
+            self.handleError(record)
+
+
+_listener = None
+_queueHandler = None
+_configuredLogger = None
+_lock = threading.Lock()
+
+
+def configureLogging(level=logging.INFO, syslogIdent=None, stream=None, handlers=(), logger=None):
+    """
+    Installe sur le logger de la bibliothèque un handler non bloquant : les messages sont placés dans une file et
+    transmis aux handlers de destination par un thread dédié. Un appel précédent à configureLogging est annulé.
+
+    :param level: le niveau minimal des messages (optionnel)
+    :param syslogIdent: l'identifiant syslog ; si fourni les messages sont écrits dans le syslog (optionnel)
+    :param stream: un flux (par exemple sys.stderr) dans lequel écrire les messages (optionnel)
+    :param handlers: d'autres handlers de destination (optionnel)
+    :param logger: le logger à configurer (optionnel, par défaut le logger de la bibliothèque)
+    :return: la liste des handlers de destination
+    """
+    global _listener, _queueHandler, _configuredLogger
+    targets = list(handlers)
+    if syslogIdent is not None:
+        handler = SyslogHandler(syslogIdent)
+        handler.setFormatter(StructuredFormatter("%(name)s %(levelname)s %(message)s"))
+        targets.append(handler)
+    if stream is not None:
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(StructuredFormatter(DEFAULT_FORMAT))
+        targets.append(handler)
+    for handler in targets:
+        if handler.formatter is None:
+            handler.setFormatter(StructuredFormatter(DEFAULT_FORMAT))
+    if logger is None:
+        logger = getLogger()
+    with _lock:
+        stopLogging()
+        _queueHandler = logging.handlers.QueueHandler(queue.Queue(-1))
+        _listener = logging.handlers.QueueListener(_queueHandler.queue, *targets, respect_handler_level=True)
+        _listener.start()
+        logger.addHandler(_queueHandler)
+        logger.setLevel(level)
+        _configuredLogger = logger
+    return targets
+
+
+def stopLogging():
+    """
+    Vide la file des messages en attente et retire le handler installé par configureLogging
+    """
+    global _listener, _queueHandler, _configuredLogger
+    if _listener is not None:
+        _listener.stop()
+        _configuredLogger.removeHandler(_queueHandler)
+        _listener = None
+        _queueHandler = None
+        _configuredLogger = None
+
+
+def isConfigured():
+    """
+    :return: True si configureLogging a été appelé
+    """
+    return _listener is not None
 
 
 class Logger(object):
+    """
+    Logger (singleton) historique ; les messages sont transmis au logger de la bibliothèque.
+    Si la journalisation n'a pas été configurée, elle l'est au premier message vers le syslog avec l'identifiant ident.
+
+    :ivar ident: l'identifiant des messages dans le syslog
+    """
     class __Logger:
         def __init__(self):
             self.ident = None
 
-        def loginfo(self, text):
-            print(self.ident)
-            syslog.openlog(ident=self.ident, facility=syslog.LOG_USER)
-            syslog.syslog(syslog.LOG_INFO, str(text))
-            print(text)
+        def _logger(self):
+            if not isConfigured():
+                configureLogging(syslogIdent=self.ident if self.ident is not None else LOGGER_NAME)
+            return getLogger()
+
+        def loginfo(self, text, **fields):
+            logEvent(self._logger(), logging.INFO, str(text), **fields)
 
-        def logerror(self, text):
-            syslog.openlog(ident=self.ident, facility=syslog.LOG_USER)
-            syslog.syslog(syslog.LOG_ERR, str(text))
-            print(text)
+        def logerror(self, text, **fields):
+            logEvent(self._logger(), logging.ERROR, str(text), **fields)
 
     instance = None
 
@@ -37,5 +207,5 @@ class Logger(object):
     def __getattr__(self, name):
         return getattr(self.instance, name)
 
-    def __setattr__(self, name):
-        return setattr(self.instance, name)
+    def __setattr__(self, name, value):
+        return setattr(self.instance, name, value)
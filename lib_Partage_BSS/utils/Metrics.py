@@ -0,0 +1,387 @@
+# -*-coding:utf-8 -*
+"""
+Module regroupant les métriques des appels à l'API BSS : nombre de requêtes, latences par phase (réseau, analyse du
+XML, remplissage des modèles), taille des réponses, codes d'erreur et utilisation du cache des tokens.
+
+Les métriques sont consultables via Metrics().snapshot() ou au format texte de Prometheus via
+Metrics().exposition(), qu'un démon peut servir avec serveMetrics::
+
+    server = serveMetrics(9100)
+"""
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from time import monotonic
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+"""Bornes par défaut des histogrammes de latence, en secondes"""
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+"""Bornes des histogrammes de taille de réponse, en octets"""
+
+NETWORK = "network"
+"""Phase d'envoi de la requête et de réception de la réponse"""
+PARSE = "parse"
+"""Phase d'analyse de la réponse XML"""
+FILL = "fill"
+"""Phase de remplissage des objets du modèle"""
+TOTAL = "total"
+"""Durée totale de l'appel vu par callMethod (attente de l'ordonnanceur et rejeux compris)"""
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _formatLabels(labelNames, labels, extra=None):
+    pairs = list(zip(labelNames, labels))
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(name + "=\"" + _escape(value) + "\"" for name, value in pairs) + "}"
+
+
+def _formatNumber(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric(object):
+    type = None
+
+    def __init__(self, name, help, labelNames=()):
+        self.name = name
+        self.help = help
+        self.labelNames = tuple(labelNames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelNames)
+
+    def reset(self):
+        """
+        Remet la métrique à zéro
+        """
+        with self._lock:
+            self._values = {}
+
+    def exposition(self):
+        """
+        Renvoie la métrique au format texte de Prometheus
+
+        :return: les lignes de la métrique
+        """
+        lines = ["# HELP " + self.name + " " + self.help, "# TYPE " + self.name + " " + self.type]
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(self._lines(key, value) for key, value in items)
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """
+    Compteur, ventilé selon les valeurs de ses étiquettes
+
+    :ivar name: le nom de la métrique
+    :ivar help: la description de la métrique
+    :ivar labelNames: les noms des étiquettes
+    """
+    type = "counter"
+
+    def inc(self, value=1, **labels):
+        """
+        Incrémente le compteur
+
+        :param value: l'incrément (optionnel)
+        :param labels: les valeurs des étiquettes
+        """
+        if not Metrics().enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def value(self, **labels):
+        """
+        Lecture de la valeur du compteur
+
+        :param labels: les valeurs des étiquettes
+        :return: la valeur du compteur
+        """
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def snapshot(self):
+        """
+        :return: la liste des (étiquettes, valeur)
+        """
+        with self._lock:
+            return [(dict(zip(self.labelNames, key)), value) for key, value in sorted(self._values.items())]
+
+    def _lines(self, key, value):
+        return self.name + _formatLabels(self.labelNames, key) + " " + _formatNumber(value)
+
+
+class Histogram(_Metric):
+    """
+    Histogramme des valeurs observées, ventilé selon les valeurs de ses étiquettes
+
+    :ivar name: le nom de la métrique
+    :ivar help: la description de la métrique
+    :ivar labelNames: les noms des étiquettes
+    :ivar buckets: les bornes supérieures des intervalles de l'histogramme
+    """
+    type = "histogram"
+
+    def __init__(self, name, help, labelNames=(), buckets=DEFAULT_BUCKETS):
+        super(Histogram, self).__init__(name, help, labelNames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        """
+        Enregistre une valeur
+
+        :param value: la valeur observée
+        :param labels: les valeurs des étiquettes
+        """
+        if not Metrics().enabled:
+            return
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """
+        Bloc dont la durée est enregistrée dans l'histogramme
+
+        :param labels: les valeurs des étiquettes
+        """
+        start = monotonic()
+        try:
+            yield
+        finally:
+            self.observe(monotonic() - start, **labels)
+
+    def count(self, **labels):
+        """
+        :param labels: les valeurs des étiquettes
+        :return: le nombre de valeurs observées
+        """
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return state[2] if state is not None else 0
+
+    def sum(self, **labels):
+        """
+        :param labels: les valeurs des étiquettes
+        :return: la somme des valeurs observées
+        """
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return state[1] if state is not None else 0.0
+
+    def snapshot(self):
+        """
+        :return: la liste des (étiquettes, {"count", "sum", "buckets": {borne: nombre cumulé}})
+        """
+        result = []
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                cumulated = 0
+                buckets = {}
+                for bound, bucketCount in zip(self.buckets + (float("inf"),), counts):
+                    cumulated += bucketCount
+                    buckets[bound] = cumulated
+                result.append((dict(zip(self.labelNames, key)), {"count": count, "sum": total, "buckets": buckets}))
+        return result
+
+    def _lines(self, key, value):
+        counts, total, count = value
+        lines = []
+        cumulated = 0
+        for bound, bucketCount in zip(self.buckets + (float("inf"),), counts):
+            cumulated += bucketCount
+            lines.append(self.name + "_bucket" + _formatLabels(self.labelNames, key, ("le", _formatNumber(bound)))
+                         + " " + str(cumulated))
+        labels = _formatLabels(self.labelNames, key)
+        lines.append(self.name + "_sum" + labels + " " + _formatNumber(total))
+        lines.append(self.name + "_count" + labels + " " + str(count))
+        return "\n".join(lines)
+
+
+class Metrics(object):
+    """
+    Classe (singleton) regroupant les métriques du processus
+
+    :ivar enabled: active l'enregistrement des métriques (True par défaut)
+    :ivar _metrics: les métriques déclarées {nom: Counter ou Histogram}
+    """
+    class __Metrics:
+
+        def __init__(self):
+            self.enabled = True
+            self._metrics = {}
+            self._lock = threading.Lock()
+
+        def _register(self, metric):
+            with self._lock:
+                existing = self._metrics.get(metric.name)
+                if existing is not None:
+                    if type(existing) is not type(metric) or existing.labelNames != metric.labelNames:
+                        raise ValueError("La métrique " + metric.name + " est déjà déclarée avec un autre type")
+                    return existing
+                self._metrics[metric.name] = metric
+                return metric
+
+        def counter(self, name, help, labelNames=()):
+            """
+            Déclare un compteur, ou renvoie le compteur déjà déclaré sous ce nom
+
+            :param name: le nom de la métrique
+            :param help: la description de la métrique
+            :param labelNames: les noms des étiquettes
+            :return: le Counter
+            """
+            return self._register(Counter(name, help, labelNames))
+
+        def histogram(self, name, help, labelNames=(), buckets=DEFAULT_BUCKETS):
+            """
+            Déclare un histogramme, ou renvoie l'histogramme déjà déclaré sous ce nom
+
+            :param name: le nom de la métrique
+            :param help: la description de la métrique
+            :param labelNames: les noms des étiquettes
+            :param buckets: les bornes supérieures des intervalles
+            :return: l'Histogram
+            """
+            return self._register(Histogram(name, help, labelNames, buckets))
+
+        def get(self, name):
+            """
+            :param name: le nom de la métrique
+            :return: la métrique déclarée sous ce nom, ou None
+            """
+            with self._lock:
+                return self._metrics.get(name)
+
+        def reset(self):
+            """
+            Remet toutes les métriques à zéro
+            """
+            with self._lock:
+                metrics = list(self._metrics.values())
+            for metric in metrics:
+                metric.reset()
+
+        def snapshot(self):
+            """
+            Renvoie les valeurs de toutes les métriques
+
+            :return: un dictionnaire {nom: liste des (étiquettes, valeur)}
+            """
+            with self._lock:
+                metrics = list(self._metrics.values())
+            return dict((metric.name, metric.snapshot()) for metric in metrics)
+
+        def exposition(self):
+            """
+            Renvoie toutes les métriques au format texte de Prometheus
+
+            :return: le texte à servir sur /metrics
+            """
+            with self._lock:
+                metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+            return "\n".join(metric.exposition() for metric in metrics) + "\n"
+
+    instance = None
+
+    def __new__(cls):
+        if not Metrics.instance:
+            Metrics.instance = Metrics.__Metrics()
+        return Metrics.instance
+
+    def __getattr__(self, attr):
+        return getattr(self.instance, attr)
+
+    def __setattr__(self, attr, val):
+        return setattr(self.instance, attr, val)
+
+
+REQUESTS = Metrics().counter("bss_requests_total", "Nombre d'appels aux méthodes de l'API BSS", ("method", "status"))
+"""Nombre d'appels par méthode et par statut (code renvoyé par l'API ou nom de l'exception)"""
+ERRORS = Metrics().counter("bss_errors_total", "Nombre d'appels en erreur", ("method", "code"))
+"""Nombre d'appels en erreur par méthode et par code d'erreur (ou nom de l'exception)"""
+DURATION = Metrics().histogram("bss_request_duration_seconds", "Durée des appels à l'API BSS par phase",
+                               ("method", "phase"))
+"""Durée des appels par méthode et par phase (NETWORK, PARSE, FILL, TOTAL)"""
+RESPONSE_BYTES = Metrics().histogram("bss_response_bytes", "Taille des réponses de l'API BSS", ("method",),
+                                     SIZE_BUCKETS)
+"""Taille des réponses par méthode"""
+TOKENS = Metrics().counter("bss_token_requests_total", "Utilisation du cache des tokens", ("result",))
+"""Nombre de demandes de token servies par le cache (hit) ou par l'API (miss)"""
+
+
+def phase(methodName, name):
+    """
+    Bloc dont la durée est enregistrée comme une phase d'un appel à l'API
+
+    :param methodName: la méthode de l'API appelée
+    :param name: NETWORK, PARSE, FILL ou TOTAL
+    """
+    return DURATION.time(method=methodName, phase=name)
+
+
+def recordStatus(methodName, status):
+    """
+    Enregistre le statut d'un appel à l'API
+
+    :param methodName: la méthode de l'API appelée
+    :param status: le code renvoyé par l'API (0 en cas de succès) ou le nom de l'exception levée
+    """
+    REQUESTS.inc(method=methodName, status=status)
+    if str(status) != "0":
+        ERRORS.inc(method=methodName, code=status)
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = Metrics().exposition().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serveMetrics(port, address="127.0.0.1"):
+    """
+    Sert les métriques au format texte de Prometheus sur http://address:port/metrics, dans un thread dédié
+
+    :param port: le port d'écoute (0 pour un port libre)
+    :param address: l'adresse d'écoute (optionnel)
+    :return: le HTTPServer démarré (server.shutdown() pour l'arrêter)
+    """
+    server = HTTPServer((address, port), _Handler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
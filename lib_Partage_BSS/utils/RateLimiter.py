@@ -0,0 +1,159 @@
+# -*-coding:utf-8 -*
+"""
+Module permettant de limiter le débit des appels à l'API BSS (seau à jetons par domaine et par type de méthode)
+"""
+import threading
+from time import monotonic, sleep
+
+from lib_Partage_BSS.utils.Deadline import checkDeadline
+
+READ = "read"
+"""Classe des méthodes en lecture (GetAccount, GetAllAccounts, GetCos, ...)"""
+WRITE = "write"
+"""Classe des méthodes en écriture (CreateAccount, ModifyAccount, ...)"""
+
+
+def methodClass(methodName):
+    """
+    Détermine la classe (lecture ou écriture) d'une méthode de l'API BSS
+
+    :param methodName: le nom de la méthode de l'API
+    :return: READ si la méthode est une lecture, WRITE sinon
+    """
+    if methodName.startswith("Get"):
+        return READ
+    return WRITE
+
+
+class TokenBucket(object):
+    """
+    Seau à jetons : le seau se remplit de rate jetons par seconde, dans la limite de burst jetons.
+    Chaque appel consomme un jeton.
+
+    :ivar rate: le nombre de jetons ajoutés par seconde
+    :ivar burst: le nombre maximal de jetons dans le seau
+    """
+    def __init__(self, rate, burst=None):
+        if rate <= 0:
+            raise ValueError("Le débit doit être strictement positif")
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(1, rate))
+        self._tokens = self.burst
+        self._last = monotonic()
+        self._lock = threading.Lock()
+
+    def tryAcquire(self):
+        """
+        Tente de consommer un jeton
+
+        :return: 0 si un jeton a été consommé, sinon le délai en secondes avant qu'un jeton soit disponible
+        """
+        with self._lock:
+            now = monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self):
+        """
+        Consomme un jeton, en attendant si nécessaire qu'un jeton soit disponible
+
+        :raises DeadlineExceededException: Exception levée si l'attente dépasse l'échéance courante
+        """
+        wait = self.tryAcquire()
+        while wait > 0:
+            checkDeadline(wait)
+            sleep(wait)
+            wait = self.tryAcquire()
+
+
+class RateLimiter(object):
+    """
+    Classe (singleton) regroupant les seaux à jetons de tous les domaines, partagée par tous les threads du processus.
+    Par défaut aucune limite n'est appliquée.
+
+    :ivar _rates: les débits configurés {(domaine ou None, classe): (débit, rafale)} ; None désigne tous les domaines
+    :ivar _buckets: les seaux à jetons instanciés {(domaine, classe): TokenBucket}
+    """
+    class __RateLimiter:
+
+        def __init__(self):
+            self._rates = {}
+            self._buckets = {}
+            self._lock = threading.Lock()
+
+        def setRate(self, methodClass, rate, burst=None, domain=None):
+            """
+            Configure le débit maximal pour une classe de méthodes
+
+            :param methodClass: READ ou WRITE
+            :param rate: le nombre d'appels par seconde autorisés (None pour supprimer la limite)
+            :param burst: le nombre d'appels pouvant être effectués d'un coup (optionnel, par défaut le débit)
+            :param domain: le domaine concerné (optionnel, par défaut tous les domaines)
+            """
+            if methodClass not in (READ, WRITE):
+                raise ValueError(str(methodClass) + " n'est pas une classe de méthode valide")
+            with self._lock:
+                if rate is None:
+                    self._rates.pop((domain, methodClass), None)
+                else:
+                    self._rates[(domain, methodClass)] = (rate, burst)
+                self._buckets = {}
+
+        def reset(self):
+            """
+            Supprime toutes les limites configurées
+            """
+            with self._lock:
+                self._rates = {}
+                self._buckets = {}
+
+        def _bucket(self, domain, methodName):
+            key = (domain, methodClass(methodName))
+            with self._lock:
+                if key in self._buckets:
+                    return self._buckets[key]
+                rate = self._rates.get(key, self._rates.get((None, key[1])))
+                bucket = TokenBucket(*rate) if rate is not None else None
+                self._buckets[key] = bucket
+                return bucket
+
+        def tryAcquire(self, domain, methodName):
+            """
+            Tente de consommer un jeton pour un appel à une méthode sur un domaine
+
+            :param domain: le domaine de l'appel
+            :param methodName: la méthode de l'API appelée
+            :return: 0 si l'appel peut être effectué, sinon le délai en secondes avant qu'il puisse l'être
+            """
+            bucket = self._bucket(domain, methodName)
+            if bucket is None:
+                return 0
+            return bucket.tryAcquire()
+
+        def acquire(self, domain, methodName):
+            """
+            Attend que l'appel à une méthode sur un domaine soit autorisé par la limite de débit
+
+            :param domain: le domaine de l'appel
+            :param methodName: la méthode de l'API appelée
+            """
+            bucket = self._bucket(domain, methodName)
+            if bucket is not None:
+                bucket.acquire()
+
+    instance = None
+
+    def __new__(cls):
+        if not RateLimiter.instance:
+            RateLimiter.instance = RateLimiter.__RateLimiter()
+        return RateLimiter.instance
+
+    def __getattr__(self, attr):
+        return getattr(self.instance, attr)
+
+    def __setattr__(self, attr, val):
+        return setattr(self.instance, attr, val)
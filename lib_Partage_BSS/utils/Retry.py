@@ -0,0 +1,180 @@
+# -*-coding:utf-8 -*
+"""
+Module permettant de rejouer les appels à l'API BSS en cas d'erreur transitoire
+(attente exponentielle avec gigue et budget global de rejeux)
+"""
+import random
+import threading
+from time import sleep
+
+from lib_Partage_BSS.exceptions import ServiceException
+from lib_Partage_BSS.utils.Deadline import remainingTime
+
+IDEMPOTENT_METHODS = frozenset(["Auth", "GetAccount", "GetAllAccounts", "GetCos", "GetAllCos"])
+"""Les méthodes de l'API BSS pouvant être rejouées sans risque"""
+
+FORMAT_ERROR_CODE = 3
+"""Code de la ServiceException levée lorsque la réponse de l'API n'a pas le format attendu"""
+
+
+class RetryBudget(object):
+    """
+    Budget global de rejeux, pour éviter les tempêtes de rejeux lorsque l'API est indisponible.
+    Chaque échec consomme un jeton, chaque succès en rend tokenRatio ; les rejeux ne sont autorisés
+    que tant que plus de la moitié des jetons est disponible.
+
+    :ivar maxTokens: le nombre maximal de jetons
+    :ivar tokenRatio: le nombre de jetons rendus par un succès
+    """
+    def __init__(self, maxTokens=10, tokenRatio=0.1):
+        self.maxTokens = float(maxTokens)
+        self.tokenRatio = tokenRatio
+        self._tokens = self.maxTokens
+        self._lock = threading.Lock()
+
+    def onSuccess(self):
+        """
+        Enregistre un appel réussi
+        """
+        with self._lock:
+            self._tokens = min(self.maxTokens, self._tokens + self.tokenRatio)
+
+    def onFailure(self):
+        """
+        Enregistre un appel en échec
+
+        :return: True si un rejeu est autorisé, False si le budget est épuisé
+        """
+        with self._lock:
+            self._tokens = max(0.0, self._tokens - 1)
+            return self._tokens > self.maxTokens / 2
+
+
+class RetryPolicy(object):
+    """
+    Politique de rejeu des appels à l'API BSS.
+
+    Les méthodes idempotentes (lectures et Auth) sont rejouées sur erreur réseau, timeout ou réponse mal formée.
+    Les écritures ne sont rejouées que si retryWrites est activé, et uniquement lorsque l'API renvoie un des codes
+    d'erreur listés dans retryableWriteCodes. Une écriture interrompue par une erreur réseau ou un timeout a pu être
+    appliquée par l'API : elle n'est rejouée que si retryWritesOnNetworkError est également activé. Les codes de
+    retryableCodes sont rejoués pour toutes les méthodes idempotentes.
+
+    :ivar maxAttempts: le nombre maximal de tentatives (1 pour désactiver les rejeux)
+    :ivar baseDelay: le délai d'attente avant le premier rejeu en secondes
+    :ivar maxDelay: le délai d'attente maximal entre deux tentatives en secondes
+    :ivar retryWrites: autorise le rejeu des écritures
+    :ivar retryWritesOnNetworkError: autorise le rejeu des écritures sur erreur réseau ou timeout (si retryWrites), \
+    à réserver aux écritures sans effet si elles sont appliquées deux fois
+    :ivar retryableCodes: les codes d'erreur de l'API rejoués pour les méthodes idempotentes
+    :ivar retryableWriteCodes: les codes d'erreur de l'API rejoués pour les écritures (si retryWrites)
+    :ivar budget: le budget de rejeux partagé (RetryBudget)
+    """
+    def __init__(self, maxAttempts=3, baseDelay=0.2, maxDelay=5.0, retryWrites=False, retryableCodes=(),
+                 retryableWriteCodes=(), budget=None, retryWritesOnNetworkError=False):
+        self.maxAttempts = maxAttempts
+        self.baseDelay = baseDelay
+        self.maxDelay = maxDelay
+        self.retryWrites = retryWrites
+        self.retryWritesOnNetworkError = retryWritesOnNetworkError
+        self.retryableCodes = frozenset(retryableCodes)
+        self.retryableWriteCodes = frozenset(retryableWriteCodes)
+        self.budget = budget if budget is not None else RetryBudget()
+
+    def isRetryableError(self, methodName, error):
+        """
+        Indique si une exception levée lors d'un appel peut donner lieu à un rejeu
+
+        :param methodName: la méthode de l'API appelée
+        :param error: l'exception levée
+        :return: True si l'appel peut être rejoué
+        """
+        if isinstance(error, ServiceException):
+            return self.isRetryableCode(methodName, error.code)
+        import requests
+        if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+            return methodName in IDEMPOTENT_METHODS or (self.retryWrites and self.retryWritesOnNetworkError)
+        return False
+
+    def isRetryableCode(self, methodName, code):
+        """
+        Indique si un code d'erreur renvoyé par l'API peut donner lieu à un rejeu
+
+        :param methodName: la méthode de l'API appelée
+        :param code: le code d'erreur
+        :return: True si l'appel peut être rejoué
+        """
+        if methodName in IDEMPOTENT_METHODS:
+            return code == FORMAT_ERROR_CODE or code in self.retryableCodes
+        return self.retryWrites and code in self.retryableWriteCodes
+
+    def delay(self, attempt):
+        """
+        Calcule le délai d'attente avant un rejeu (attente exponentielle avec gigue complète)
+
+        :param attempt: le numéro de la tentative ayant échoué (à partir de 0)
+        :return: le délai d'attente en secondes
+        """
+        return random.uniform(0, min(self.maxDelay, self.baseDelay * (2 ** attempt)))
+
+    def _canWait(self, delay):
+        remaining = remainingTime()
+        return remaining is None or delay < remaining
+
+    def call(self, methodName, function):
+        """
+        Exécute un appel à l'API en le rejouant si nécessaire.
+        Aucun rejeu n'est tenté s'il ne peut avoir lieu avant l'échéance courante (voir Deadline).
+
+        :param methodName: la méthode de l'API appelée
+        :param function: la fonction effectuant l'appel et renvoyant la réponse de l'API
+        :return: la réponse de l'API
+        """
+        attempt = 0
+        while True:
+            delay = self.delay(attempt)
+            try:
+                response = function()
+            except Exception as err:
+                if not self.isRetryableError(methodName, err):
+                    raise
+                if not self.budget.onFailure() or attempt + 1 >= self.maxAttempts or not self._canWait(delay):
+                    raise
+            else:
+                code = _statusCode(response)
+                if not code or not self.isRetryableCode(methodName, code):
+                    self.budget.onSuccess()
+                    return response
+                if not self.budget.onFailure() or attempt + 1 >= self.maxAttempts or not self._canWait(delay):
+                    return response
+            sleep(delay)
+            attempt += 1
+
+
+def _statusCode(response):
+    try:
+        return int(response["status"]["content"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+_policy = RetryPolicy()
+
+
+def getRetryPolicy():
+    """
+    Renvoie la politique de rejeu utilisée pour les appels à l'API BSS
+
+    :return: la RetryPolicy courante
+    """
+    return _policy
+
+
+def setRetryPolicy(policy):
+    """
+    Change la politique de rejeu utilisée pour les appels à l'API BSS
+
+    :param policy: la nouvelle RetryPolicy (RetryPolicy(maxAttempts=1) pour désactiver les rejeux)
+    """
+    global _policy
+    _policy = policy
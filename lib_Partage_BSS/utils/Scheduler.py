@@ -0,0 +1,296 @@
+# -*-coding:utf-8 -*
+"""
+Module implémentant l'ordonnanceur des appels à l'API BSS.
+
+Lorsque les appels sont limités (nombre de requêtes simultanées ou débit, voir RateLimiter), les appels en attente sont
+servis selon leur classe de priorité (interactive, normal, bulk) avec une file équitable pondérée, et équitablement
+entre les domaines au sein d'une même classe. Un appel interactif passe ainsi devant un traitement de masse qui sature
+la limite de débit. Le nombre de requêtes simultanées peut aussi être limité par domaine, afin qu'un domaine lent
+ou saturé n'accapare pas toutes les requêtes::
+
+    with priority(BULK):
+        AccountService.closeAccounts(names)
+"""
+import threading
+from contextlib import contextmanager
+
+from lib_Partage_BSS.exceptions import DeadlineExceededException
+from lib_Partage_BSS.utils.Deadline import remainingTime
+from lib_Partage_BSS.utils.RateLimiter import RateLimiter, methodClass
+
+INTERACTIVE = "interactive"
+"""Classe des appels pour lesquels un utilisateur attend la réponse"""
+NORMAL = "normal"
+"""Classe par défaut"""
+BULK = "bulk"
+"""Classe des traitements de masse"""
+
+DEFAULT_WEIGHTS = {INTERACTIVE: 16, NORMAL: 4, BULK: 1}
+"""Poids par défaut des classes de priorité"""
+
+_local = threading.local()
+
+_DOMAIN_FULL = object()
+
+
+def currentPriority():
+    """
+    Renvoie la classe de priorité courante du thread
+
+    :return: INTERACTIVE, NORMAL ou BULK
+    """
+    return getattr(_local, "priority", NORMAL)
+
+
+@contextmanager
+def priority(name):
+    """
+    Fixe la classe de priorité des appels effectués dans le bloc
+
+    :param name: INTERACTIVE, NORMAL ou BULK
+    """
+    if name not in DEFAULT_WEIGHTS:
+        raise ValueError(str(name) + " n'est pas une classe de priorité valide")
+    previous = currentPriority()
+    _local.priority = name
+    try:
+        yield
+    finally:
+        _local.priority = previous
+
+
+def withPriority(name, function):
+    """
+    Renvoie une fonction exécutant function avec la classe de priorité donnée ; permet de propager la priorité
+    vers d'autres threads
+
+    :param name: la classe de priorité
+    :param function: la fonction à exécuter
+    :return: la fonction encapsulée
+    """
+    def wrapped(*args, **kwargs):
+        with priority(name):
+            return function(*args, **kwargs)
+    return wrapped
+
+
+class _Waiter(object):
+    def __init__(self, domain, methodName):
+        self.domain = domain
+        self.methodName = methodName
+        self.granted = False
+        self.unbounded = False
+        self.event = threading.Event()
+
+
+class Scheduler(object):
+    """
+    Ordonnanceur des appels à l'API BSS
+
+    :ivar maxInFlight: le nombre maximal de requêtes simultanées (None : pas de limite)
+    :ivar maxInFlightPerDomain: le nombre maximal de requêtes simultanées par domaine (None : pas de limite)
+    :ivar weights: les poids des classes de priorité
+    """
+    def __init__(self, maxInFlight=None, weights=None, maxInFlightPerDomain=None):
+        self.maxInFlight = maxInFlight
+        self.maxInFlightPerDomain = maxInFlightPerDomain
+        self.weights = dict(weights if weights is not None else DEFAULT_WEIGHTS)
+        self._domainLimits = {}
+        self._inFlight = 0
+        self._domainInFlight = {}
+        # files d'attente : {classe: {(domaine, classe de méthode): [waiters]}}
+        self._queues = dict((name, {}) for name in self.weights)
+        self._classTime = dict.fromkeys(self.weights, 0.0)
+        self._queueTime = {}
+        self._nextWake = None
+        self._lock = threading.Lock()
+
+    @property
+    def inFlight(self):
+        """
+        Lecture du nombre de requêtes en cours
+
+        :return: le nombre de requêtes en cours
+        """
+        return self._inFlight
+
+    def setDomainLimit(self, domain, limit):
+        """
+        Fixe le nombre maximal de requêtes simultanées pour un domaine, à la place de maxInFlightPerDomain
+
+        :param domain: le domaine
+        :param limit: le nombre maximal de requêtes simultanées (None pour revenir à maxInFlightPerDomain)
+        """
+        with self._lock:
+            if limit is None:
+                self._domainLimits.pop(domain, None)
+            else:
+                self._domainLimits[domain] = limit
+            self._dispatch()
+
+    def _queued(self):
+        return any(self._queues[name] for name in self._queues)
+
+    def _tryGrant(self, domain, methodName):
+        """
+        :return: 0 si l'appel est autorisé, None si le nombre maximal de requêtes simultanées est atteint, \
+        _DOMAIN_FULL si celui du domaine est atteint, sinon le délai avant qu'un jeton de débit soit disponible
+        """
+        if self.maxInFlight is not None and self._inFlight >= self.maxInFlight:
+            return None
+        limit = self._domainLimits.get(domain, self.maxInFlightPerDomain)
+        if limit is not None and self._domainInFlight.get(domain, 0) >= limit:
+            return _DOMAIN_FULL
+        wait = RateLimiter().tryAcquire(domain, methodName)
+        if wait > 0:
+            return wait
+        self._inFlight += 1
+        self._domainInFlight[domain] = self._domainInFlight.get(domain, 0) + 1
+        return 0
+
+    def _dispatch(self):
+        self._nextWake = None
+        self._grantWaiters()
+        if self._nextWake is not None:
+            # les appels en attente sans délai (file pleine lors de leur mise en attente) ne seraient réveillés par
+            # aucune fin d'appel : on les réveille pour qu'ils attendent le prochain jeton de débit
+            for queues in self._queues.values():
+                for queue in queues.values():
+                    for waiter in queue:
+                        if waiter.unbounded:
+                            waiter.event.set()
+
+    def _grantWaiters(self):
+        while True:
+            active = [name for name in self._queues if self._queues[name]]
+            if not active:
+                return
+            granted = False
+            for name in sorted(active, key=lambda name: self._classTime[name]):
+                queues = self._queues[name]
+                for key in sorted(queues, key=lambda key: self._queueTime.get((name, key), 0.0)):
+                    waiter = queues[key][0]
+                    wait = self._tryGrant(waiter.domain, waiter.methodName)
+                    if wait is None:
+                        return
+                    if wait is _DOMAIN_FULL:
+                        continue
+                    if wait > 0:
+                        self._nextWake = wait if self._nextWake is None else min(self._nextWake, wait)
+                        continue
+                    queues[key].pop(0)
+                    if not queues[key]:
+                        del queues[key]
+                    self._classTime[name] += 1.0 / self.weights[name]
+                    self._queueTime[(name, key)] = self._queueTime.get((name, key), 0.0) + 1.0
+                    waiter.granted = True
+                    waiter.event.set()
+                    granted = True
+                    break
+                if granted:
+                    break
+            if not granted:
+                return
+
+    def _enqueue(self, name, waiter):
+        key = (waiter.domain, methodClass(waiter.methodName))
+        queues = self._queues[name]
+        if not queues:
+            # une classe qui redevient active ne cumule pas de crédit pour la période où elle était inactive
+            active = [self._classTime[other] for other in self._queues if self._queues[other]]
+            if active:
+                self._classTime[name] = max(self._classTime[name], min(active))
+        if key not in queues:
+            others = [self._queueTime.get((name, other), 0.0) for other in queues]
+            if others:
+                self._queueTime[(name, key)] = max(self._queueTime.get((name, key), 0.0), min(others))
+            queues[key] = []
+        queues[key].append(waiter)
+
+    def _cancel(self, name, waiter):
+        key = (waiter.domain, methodClass(waiter.methodName))
+        queue = self._queues[name].get(key, [])
+        if waiter in queue:
+            queue.remove(waiter)
+            if not queue:
+                del self._queues[name][key]
+
+    def acquire(self, domain, methodName):
+        """
+        Attend que l'appel à une méthode sur un domaine puisse être effectué, selon la classe de priorité courante
+
+        :param domain: le domaine de l'appel
+        :param methodName: la méthode de l'API appelée
+        :raises DeadlineExceededException: Exception levée si l'échéance courante est atteinte pendant l'attente
+        """
+        name = currentPriority()
+        waiter = _Waiter(domain, methodName)
+        with self._lock:
+            if not self._queued() and self._tryGrant(domain, methodName) == 0:
+                return
+            self._enqueue(name, waiter)
+            self._dispatch()
+        while True:
+            with self._lock:
+                if waiter.granted:
+                    return
+                remaining = remainingTime()
+                if remaining is not None and remaining <= 0:
+                    self._cancel(name, waiter)
+                    raise DeadlineExceededException("Temps alloué à l'opération écoulé")
+                wait = self._nextWake
+                if remaining is not None:
+                    wait = remaining if wait is None else min(wait, remaining)
+                waiter.unbounded = wait is None
+                waiter.event.clear()
+            waiter.event.wait(wait)
+            with self._lock:
+                if not waiter.granted:
+                    self._dispatch()
+
+    def release(self, domain):
+        """
+        Signale la fin d'un appel autorisé par acquire
+
+        :param domain: le domaine de l'appel
+        """
+        with self._lock:
+            self._inFlight -= 1
+            self._domainInFlight[domain] -= 1
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, domain, methodName):
+        """
+        Bloc exécuté une fois l'appel autorisé par l'ordonnanceur
+
+        :param domain: le domaine de l'appel
+        :param methodName: la méthode de l'API appelée
+        """
+        self.acquire(domain, methodName)
+        try:
+            yield
+        finally:
+            self.release(domain)
+
+
+_scheduler = Scheduler()
+
+
+def getScheduler():
+    """
+    Renvoie l'ordonnanceur utilisé pour les appels à l'API BSS
+
+    :return: le Scheduler courant
+    """
+    return _scheduler
+
+
+def setScheduler(scheduler):
+    """
+    Change l'ordonnanceur utilisé pour les appels à l'API BSS
+
+    :param scheduler: le nouveau Scheduler (par exemple Scheduler(maxInFlight=8))
+    """
+    global _scheduler
+    _scheduler = scheduler
@@ -0,0 +1,95 @@
+# -*-coding:utf-8 -*
+"""
+Module permettant de regrouper les lectures identiques effectuées simultanément par plusieurs threads :
+une seule requête est envoyée à l'API BSS et son résultat est partagé entre tous les appelants
+"""
+import copy
+import threading
+
+from lib_Partage_BSS.exceptions import DeadlineExceededException
+from lib_Partage_BSS.utils.Deadline import remainingTime
+
+
+class _Call(object):
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class SingleFlight(object):
+    """
+    Regroupement des appels identiques en cours : pendant qu'un appel est en vol pour une clé, les autres appels
+    pour la même clé attendent son résultat au lieu d'effectuer leur propre requête.
+    Chaque appelant reçoit son propre exemplaire du résultat, qu'il peut modifier sans effet sur les autres.
+    Un appelant en attente respecte sa propre échéance (voir Deadline) ; si l'appel en vol échoue parce que
+    l'échéance de son émetteur est dépassée, l'appelant en attente effectue l'appel lui-même.
+    Après une écriture, forget(key) garantit que les appels suivants ne rejoignent pas un appel commencé avant elle.
+    """
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, function):
+        """
+        Exécute la fonction, ou attend le résultat de l'appel en cours pour la même clé
+
+        :param key: la clé identifiant l'appel (par exemple la méthode de l'API et ses paramètres)
+        :param function: la fonction effectuant l'appel
+        :return: le résultat de la fonction
+        :raises DeadlineExceededException: Exception levée si l'échéance de l'appelant est dépassée pendant l'attente
+        :raises Exception: l'exception levée par la fonction
+        """
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = _Call()
+                    self._calls[key] = call
+                else:
+                    call.followers += 1
+            if leader:
+                return self._lead(key, call, function)
+            remaining = remainingTime()
+            if not call.event.wait(None if remaining is None else max(0, remaining)):
+                raise DeadlineExceededException("Temps alloué à l'opération écoulé")
+            if isinstance(call.error, DeadlineExceededException):
+                # l'échéance dépassée est celle de l'émetteur de l'appel : on réessaie avec la nôtre
+                continue
+            if call.error is not None:
+                raise call.error
+            # le résultat partagé n'est jamais rendu tel quel, il n'est donc modifié par aucun appelant
+            return copy.deepcopy(call.result)
+
+    def forget(self, key):
+        """
+        Détache l'appel en cours pour une clé : les appels suivants pour cette clé effectuent une nouvelle requête,
+        les appelants déjà en attente reçoivent toujours le résultat de l'appel en cours
+
+        :param key: la clé identifiant l'appel
+        """
+        with self._lock:
+            self._calls.pop(key, None)
+
+    def _lead(self, key, call, function):
+        result = None
+        try:
+            call.result = result = function()
+        except Exception as err:
+            call.error = err
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+                followers = call.followers
+            try:
+                if followers and call.error is None:
+                    # copie faite avant de libérer les appelants en attente, qui copient à leur tour call.result
+                    result = copy.deepcopy(call.result)
+            finally:
+                call.event.set()
+        if call.error is not None:
+            raise call.error
+        return result
@@ -0,0 +1,152 @@
+# -*-coding:utf-8 -*
+"""
+Module implémentant un stockage local des dernières réponses de lecture de l'API BSS, pour les lectures pouvant
+se contenter d'une donnée légèrement obsolète (stale-while-revalidate) :
+
+- une copie plus récente que softTtl est renvoyée directement ;
+- une copie plus ancienne que softTtl mais plus récente que hardTtl est renvoyée directement et rafraîchie en
+  arrière-plan ;
+- au delà de hardTtl, l'appel attend la réponse de l'API ;
+- si l'API est injoignable, la dernière copie connue est renvoyée quel que soit son âge.
+
+Une lecture commencée avant une invalidation (modification de la donnée) n'est pas conservée.
+"""
+import copy
+import threading
+from time import monotonic
+
+from lib_Partage_BSS.exceptions import BSSConnexionException, CircuitOpenException, DeadlineExceededException, \
+    ServiceException
+from lib_Partage_BSS.utils.Retry import FORMAT_ERROR_CODE
+
+MAX_GENERATIONS = 10000
+"""Nombre de clés invalidées suivies ; au delà, les lectures en cours ne sont plus conservées et le suivi repart à zéro"""
+
+
+def isUnreachableError(error):
+    """
+    Indique si une erreur signifie que l'API est injoignable, auquel cas la dernière copie connue peut être utilisée
+
+    :param error: l'exception levée par l'appel
+    :return: True pour les erreurs réseau, les timeouts, les disjoncteurs ouverts, les échecs d'authentification \
+    et les réponses mal formées
+    """
+    if isinstance(error, ServiceException):
+        return error.code == FORMAT_ERROR_CODE
+    import requests
+    return isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                              CircuitOpenException, DeadlineExceededException, BSSConnexionException))
+
+
+class _Entry(object):
+    def __init__(self, value):
+        self.value = value
+        self.stored = monotonic()
+
+
+class Snapshot(object):
+    """
+    Stockage local des dernières valeurs lues
+
+    :ivar softTtl: l'âge en secondes au delà duquel une copie est rafraîchie en arrière-plan
+    :ivar hardTtl: l'âge en secondes au delà duquel une copie n'est plus renvoyée sans interroger l'API
+    :ivar maxEntries: le nombre maximal de copies conservées (None : pas de limite)
+    :ivar maxRefreshes: le nombre maximal de rafraîchissements simultanés en arrière-plan ; au delà, la copie est \
+    renvoyée sans être rafraîchie et le rafraîchissement sera tenté au prochain appel
+    """
+    def __init__(self, softTtl=60, hardTtl=3600, maxEntries=10000, maxRefreshes=4):
+        if softTtl > hardTtl:
+            raise ValueError("softTtl doit être inférieur ou égal à hardTtl")
+        self.softTtl = softTtl
+        self.hardTtl = hardTtl
+        self.maxEntries = maxEntries
+        self.maxRefreshes = maxRefreshes
+        self._entries = {}
+        self._refreshing = set()
+        self._generations = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+
+    def _generation(self, key):
+        return self._epoch, self._generations.get(key, 0)
+
+    def _store(self, key, value, generation):
+        with self._lock:
+            if generation != self._generation(key):
+                # la donnée a été modifiée pendant la lecture : la valeur lue est peut-être déjà obsolète
+                return
+            if self.maxEntries is not None and key not in self._entries and len(self._entries) >= self.maxEntries:
+                oldest = min(self._entries, key=lambda other: self._entries[other].stored)
+                del self._entries[oldest]
+            self._entries[key] = _Entry(copy.deepcopy(value))
+
+    def _refresh(self, key, function, generation):
+        try:
+            self._store(key, function(), generation)
+        except Exception:
+            # la copie actuelle reste utilisable, le prochain appel retentera le rafraîchissement
+            pass
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _refreshInBackground(self, key, function):
+        with self._lock:
+            if key in self._refreshing or len(self._refreshing) >= self.maxRefreshes:
+                return
+            self._refreshing.add(key)
+            generation = self._generation(key)
+        thread = threading.Thread(target=self._refresh, args=(key, function, generation))
+        thread.daemon = True
+        thread.start()
+
+    def get(self, key, function):
+        """
+        Renvoie la valeur associée à la clé, depuis la copie locale ou depuis l'API selon l'âge de la copie
+
+        :param key: la clé identifiant la lecture
+        :param function: la fonction effectuant la lecture via l'API
+        :return: une copie de la valeur
+        :raises Exception: l'exception levée par la fonction, si aucune copie n'est utilisable
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            generation = self._generation(key)
+        age = monotonic() - entry.stored if entry is not None else None
+        if entry is not None and age < self.hardTtl:
+            if age >= self.softTtl:
+                self._refreshInBackground(key, function)
+            return copy.deepcopy(entry.value)
+        try:
+            value = function()
+        except Exception as err:
+            if entry is not None and isUnreachableError(err):
+                return copy.deepcopy(entry.value)
+            raise
+        self._store(key, value, generation)
+        return value
+
+    def invalidate(self, key):
+        """
+        Supprime la copie associée à une clé, par exemple après une modification
+
+        :param key: la clé identifiant la lecture
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+            if key not in self._generations and len(self._generations) >= MAX_GENERATIONS:
+                # changer d'époque écarte les lectures en cours sans risquer de réutiliser un numéro de génération
+                self._newEpoch()
+            self._generations[key] = self._generations.get(key, 0) + 1
+
+    def clear(self):
+        """
+        Supprime toutes les copies
+        """
+        with self._lock:
+            self._entries = {}
+            self._newEpoch()
+
+    def _newEpoch(self):
+        self._epoch += 1
+        self._generations = {}
@@ -0,0 +1,107 @@
+# -*-coding:utf-8 -*
+"""
+Module permettant de tracer les appels à l'API BSS avec un traceur compatible OpenTelemetry.
+
+Chaque appel à callMethod produit un span, avec des spans enfants pour la récupération du token, la requête HTTP,
+l'analyse du XML et le remplissage des objets du modèle ; les opérations composées (createAccount,
+preDeleteAccount, ...) produisent un span parent. Le traçage est désactivé par défaut : span et callSpan renvoient
+alors un unique objet sans effet, et callSpan ne construit ni le nom ni les attributs du span::
+
+    from opentelemetry import trace
+    setTracer(trace.get_tracer("lib_Partage_BSS"))
+"""
+import functools
+
+DOMAIN = "bss.domain"
+"""Attribut portant le domaine de l'appel"""
+METHOD = "bss.method"
+"""Attribut portant la méthode de l'API appelée"""
+STATUS = "bss.status"
+"""Attribut portant le code renvoyé par l'API"""
+
+
+class _NoopSpan(object):
+    """
+    Span utilisé lorsque le traçage est désactivé
+    """
+    def set_attribute(self, key, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        return False
+
+
+_NOOP = _NoopSpan()
+_tracer = None
+
+
+def getTracer():
+    """
+    Renvoie le traceur utilisé
+
+    :return: le traceur, ou None si le traçage est désactivé
+    """
+    return _tracer
+
+
+def setTracer(tracer):
+    """
+    Active le traçage des appels à l'API BSS
+
+    :param tracer: un traceur OpenTelemetry (ou tout objet fournissant start_as_current_span(name, attributes=...)), \
+    None pour désactiver le traçage
+    """
+    global _tracer
+    _tracer = tracer
+
+
+def span(name, attributes=None):
+    """
+    Bloc tracé par un span, enfant du span courant
+
+    :param name: le nom du span
+    :param attributes: les attributs du span (optionnel)
+    :return: le gestionnaire de contexte du span ; il fournit le span (set_attribute)
+    """
+    if _tracer is None:
+        return _NOOP
+    return _tracer.start_as_current_span(name, attributes=attributes)
+
+
+def callSpan(method, domain=None, step=None):
+    """
+    Bloc tracé par le span d'un appel à l'API BSS ("BSS <méthode>") ou d'une de ses étapes ("BSS <étape>").
+    Le nom et les attributs du span ne sont construits que si le traçage est activé.
+
+    :param method: la méthode de l'API appelée
+    :param domain: le domaine de l'appel (optionnel)
+    :param step: l'étape de l'appel : "token", "http", "parse" ou "fill" (optionnel)
+    :return: le gestionnaire de contexte du span ; il fournit le span (set_attribute)
+    """
+    if _tracer is None:
+        return _NOOP
+    attributes = {METHOD: method}
+    if domain is not None:
+        attributes[DOMAIN] = domain
+    return _tracer.start_as_current_span("BSS " + (step or method), attributes=attributes)
+
+
+def traced(function):
+    """
+    Décorateur traçant chaque appel de la fonction par un span portant son nom
+
+    :param function: la fonction à tracer
+    :return: la fonction décorée
+    """
+    name = function.__module__.split(".")[-1] + "." + function.__name__
+
+    @functools.wraps(function)
+    def wrapped(*args, **kwargs):
+        if _tracer is None:
+            return function(*args, **kwargs)
+        with _tracer.start_as_current_span(name):
+            return function(*args, **kwargs)
+    return wrapped
@@ -1,3 +1,24 @@
 """Package utils"""
+import importlib
+import importlib.util
+import sys
+
 from .CheckMethods import *
-from .BSSRequest import *
\ No newline at end of file
+
+
+def __getattr__(name):
+    # les modules et les noms de BSSRequest (requests, xmljson) sont importés à leur première utilisation
+    if name.startswith("__"):
+        raise AttributeError(name)
+    if importlib.util.find_spec("." + name, __name__) is not None:
+        return importlib.import_module("." + name, __name__)
+    module = importlib.import_module(".BSSRequest", __name__)
+    if not hasattr(module, name):
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    value = getattr(module, name)
+    globals()[name] = value
+    return value
+
+
+if sys.version_info < (3, 7):
+    from .BSSRequest import *
@@ -0,0 +1,71 @@
+#!venv/bin/python
+# This Python file uses the following encoding: utf-8
+# Générateur de charge pour lib_Partage_BSS : estimation de la durée d'une migration
+
+import argparse, sys
+import json
+
+from lib_Partage_BSS.mock.LoadGenerator import parseMix, runLoad, standardOperations
+from lib_Partage_BSS.services.BSSConnexionService import BSSConnexion
+
+epilog = "Exemples d'appel :\n" + \
+    "./load-bss.py --mock --latency=0.02:0.08 --mix=create=3000,modify=5000,close=500 --concurrency=16\n" + \
+    "./load-bss.py --domain=x.fr --domainKey=yourKey --url=https://preprod/service/domain/ " + \
+        "--mix=create=100,get=500 --rate=20 --cosId=yourCos\n"
+parser = argparse.ArgumentParser(description="Générateur de charge pour l'API BSS Partage", epilog=epilog, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument('--domain', metavar='mondomaine.fr', help="domaine cible (par défaut loadtest.fr avec --mock)")
+parser.add_argument('--domainKey', metavar="6b7ead4bd425836e8c", help="clé du domaine cible")
+parser.add_argument('--url', metavar='http://localhost:8080/service/domain/', help="url de l'API (par défaut celle de Partage)")
+parser.add_argument('--mock', action='store_true', help="démarre un serveur BSS simulé local et l'utilise comme cible")
+parser.add_argument('--latency', metavar='0.02:0.08', default="0", help="latence du serveur simulé en secondes (valeur ou intervalle min:max)")
+parser.add_argument('--errorRate', metavar='0.01', type=float, default=0, help="taux d'erreur du serveur simulé")
+parser.add_argument('--mix', required=True, metavar='create=30000,modify=50000,close=5000',
+                    help="opérations et nombre d'appels : create, get, modify, lock, activate, close, delete, list, listCos, getCos")
+parser.add_argument('--concurrency', metavar='8', type=int, default=4, help="nombre d'appels simultanés")
+parser.add_argument('--rate', metavar='50', type=float, help="débit cible en appels par seconde")
+parser.add_argument('--shuffle', action='store_true', help="mélange les opérations au lieu de les exécuter l'une après l'autre")
+parser.add_argument('--cosId', metavar='829a2781-c41e-4r4e2-b1a8-69f99dd20', default="", help="classe de service des comptes créés")
+parser.add_argument('--cosName', metavar='staff_l_univ_rennes1', help="classe de service lue par getCos")
+parser.add_argument('--prefix', metavar='loadtest', default="loadtest", help="préfixe des comptes créés")
+parser.add_argument('--asJson', action='store_true', help="affiche le rapport au format JSON")
+
+args = parser.parse_args()
+
+try:
+    mix = parseMix(args.mix)
+except ValueError as err:
+    parser.error(str(err))
+
+server = None
+if args.mock:
+    from lib_Partage_BSS.mock.MockBSSServer import MockBSSServer
+    domain = args.domain or "loadtest.fr"
+    key = args.domainKey or "loadtest"
+    latency = tuple(float(value) for value in args.latency.split(":")) if ":" in args.latency else float(args.latency)
+    server = MockBSSServer({domain: key}, latency=latency, errorRate=args.errorRate).start()
+    server.store.addCOS(domain, args.cosName or "loadtest", zimbraFeatureMailEnabled=True)
+    url = server.url
+    cosName = args.cosName or "loadtest"
+else:
+    if not args.domain or not args.domainKey:
+        parser.error("--domain et --domainKey sont obligatoires sans --mock")
+    domain, key, url, cosName = args.domain, args.domainKey, args.url, args.cosName
+
+try:
+    bss = BSSConnexion()
+    if url:
+        bss.url = url
+    bss.setDomainKey({domain: key})
+    operations = standardOperations(domain, cosId=args.cosId, cosName=cosName, prefix=args.prefix)
+    report = runLoad(operations, mix, concurrency=args.concurrency, rate=args.rate, sequential=not args.shuffle)
+except ValueError as err:
+    print("Echec d'exécution : %s" % err)
+    sys.exit(2)
+finally:
+    if server is not None:
+        server.stop()
+
+if args.asJson:
+    print(json.dumps(report.summary(), indent=4))
+else:
+    print(report.format())
@@ -5,6 +5,7 @@ setup(
     version='2.1.0',
     packages=['lib_Partage_BSS',
               'lib_Partage_BSS.utils', 'lib_Partage_BSS.exceptions', 'lib_Partage_BSS.models','lib_Partage_BSS.services',
+              'lib_Partage_BSS.mock', 'lib_Partage_BSS.cli',
               ],
     url='https://gitlab.univ-rennes1.fr/57NUM/libPythonBssApi',
     license='',
@@ -0,0 +1,30 @@
+import pytest
+
+from lib_Partage_BSS.mock.MockBSSServer import MockBSSServer
+from lib_Partage_BSS.services import BSSConnexion, COSService
+from lib_Partage_BSS.utils.CircuitBreaker import configureCircuitBreakers
+from lib_Partage_BSS.utils.Retry import RetryPolicy, getRetryPolicy, setRetryPolicy
+
+DOMAIN = "mock.com"
+KEY = "cle-du-domaine"
+
+
+@pytest.fixture()
+def connexion():
+    connexion = BSSConnexion()
+    previousUrl = connexion.url
+    previousPolicy = getRetryPolicy()
+    setRetryPolicy(RetryPolicy(maxAttempts=1))
+    COSService.configureCOSSnapshot()
+    connexion.setDomainKey({DOMAIN: KEY})
+    yield connexion
+    connexion.url = previousUrl
+    setRetryPolicy(previousPolicy)
+    configureCircuitBreakers()
+
+
+@pytest.fixture()
+def server(connexion):
+    with MockBSSServer({DOMAIN: KEY}) as server:
+        connexion.url = server.url
+        yield server
@@ -0,0 +1,49 @@
+import io
+
+import pytest
+
+from lib_Partage_BSS.cli.Batch import runBatch
+from lib_Partage_BSS.cli.Commands import COMMANDS, PRECEDENCE, executeCommand, runCommand, selectCommand
+
+from test_unitaire.conftest import DOMAIN
+
+
+def test_runCommand_verifie_les_arguments():
+    with pytest.raises(ValueError):
+        runCommand("getAccount", {"domain": DOMAIN})
+    with pytest.raises(ValueError):
+        runCommand("inconnue", {"domain": DOMAIN})
+
+
+def test_selectCommand_ordre_historique():
+    assert sorted(PRECEDENCE) == sorted(COMMANDS)
+    assert selectCommand({"getAccount": True, "getAllAccounts": True}) == "getAllAccounts"
+    assert selectCommand({"getAccount": None}) is None
+
+
+def test_modifyAccount_fichier_json_invalide(tmpdir):
+    path = tmpdir.join("account.json")
+    path.write("{invalide")
+    output, exitCode = executeCommand("modifyAccount", {"domain": DOMAIN, "email": "a@" + DOMAIN,
+                                                        "jsonData": str(path)})
+    assert exitCode == 2
+    assert output.startswith("Echec chargement fichier JSON %s : " % path)
+
+
+@pytest.mark.parametrize("jobs", [1, 3])
+def test_runBatch_ecrit_les_resultats_dans_l_ordre(server, jobs):
+    for index in range(6):
+        server.store.addAccount("user{0}@{1}".format(index, DOMAIN), displayName="User")
+    lines = ['{"op": "lockAccount", "email": "user%d@%s"}\n' % (index, DOMAIN) for index in range(6)]
+    lines += ['\n', '# commentaire\n', '{"op": "getAccount", "email": "user0@%s", "id": "a"}\n' % DOMAIN,
+              '{"op": "deleteAccount", "email": "absent@%s"}\n' % DOMAIN, '{"op": "getAccount"}\n', 'pas du json\n']
+    records = []
+    count, failures = runBatch(io.StringIO("".join(lines)), {"domain": DOMAIN}, jobs=jobs, write=records.append)
+    assert (count, failures) == (10, 3)
+    assert [record["line"] for record in records] == [1, 2, 3, 4, 5, 6, 9, 10, 11, 12]
+    assert all(record["ok"] for record in records[:7])
+    assert records[6]["id"] == "a"
+    assert records[6]["result"]["name"] == "user0@" + DOMAIN
+    assert records[6]["result"]["zimbraAccountStatus"] == "locked"
+    assert [record["error"] for record in records[7:]] == ["ServiceException", "ValueError", "JSONDecodeError"]
+    assert server.callCount("Auth") == 1
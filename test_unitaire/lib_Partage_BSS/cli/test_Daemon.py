@@ -0,0 +1,63 @@
+import os
+import stat
+
+import pytest
+
+from lib_Partage_BSS.cli.Client import sendRequest
+from lib_Partage_BSS.cli.Daemon import Daemon
+from lib_Partage_BSS.utils.BSSRequest import getTransport
+
+from test_unitaire.conftest import DOMAIN
+
+
+def test_daemon_execute_les_operations_recues(server, tmpdir):
+    server.store.addAccount("test@" + DOMAIN, displayName="Test")
+    server.store.addCOS(DOMAIN, "staff")
+    path = str(tmpdir.join("bss.sock"))
+    previous = getTransport()
+    with Daemon(path, domains=[DOMAIN], defaults={"domain": DOMAIN}) as daemon:
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+        assert server.callCount("Auth") == 1
+        response = sendRequest({"op": "getAccount", "email": "test@" + DOMAIN}, path)
+        assert response["exitCode"] == 0
+        assert response["output"].startswith("Informations sur le compte test@" + DOMAIN)
+        for _ in range(3):
+            assert sendRequest({"op": "getCos", "cosName": "staff"}, path)["exitCode"] == 0
+        assert sendRequest({"op": "lockAccount"}, path) == {"exitCode": 1, "output": "Argument '--email' manquant"}
+        assert sendRequest({"op": "deleteAccount", "email": "absent@" + DOMAIN}, path)["exitCode"] == 2
+        assert daemon.requestCount == 6
+        with pytest.raises(OSError):
+            Daemon(path).start()
+    assert server.callCount("Auth") == 1
+    assert server.callCount("GetCos") == 1
+    assert not os.path.exists(path)
+    assert getTransport() is previous
+
+
+def test_daemon_cree_un_repertoire_prive(server, tmpdir):
+    path = str(tmpdir.join("prive", "bss.sock"))
+    previousUmask = os.umask(0o022)
+    try:
+        with Daemon(path, domains=[DOMAIN]):
+            assert os.umask(0o022) == 0o022
+            assert stat.S_IMODE(os.stat(os.path.dirname(path)).st_mode) == 0o700
+            assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+            assert os.listdir(os.path.dirname(path)) == ["bss.sock"]
+    finally:
+        os.umask(previousUmask)
+
+
+def test_daemon_cas_repertoire_modifiable_par_les_autres(server, tmpdir):
+    directory = tmpdir.mkdir("public")
+    directory.chmod(0o777)
+    with pytest.raises(PermissionError):
+        Daemon(str(directory.join("bss.sock")), domains=[DOMAIN]).start()
+
+
+def test_client_cas_socket_d_un_autre_utilisateur(server, tmpdir, monkeypatch):
+    path = str(tmpdir.join("bss.sock"))
+    with Daemon(path, domains=[DOMAIN], defaults={"domain": DOMAIN}) as daemon:
+        monkeypatch.setattr(os, "getuid", lambda: os.stat(path).st_uid + 1)
+        with pytest.raises(PermissionError):
+            sendRequest({"op": "getCos", "cosName": "staff"}, path)
+        assert daemon.requestCount == 0
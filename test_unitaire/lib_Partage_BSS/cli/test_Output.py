@@ -0,0 +1,82 @@
+import io
+import json
+
+import pytest
+
+from lib_Partage_BSS.cli.Commands import executeCommand, streamCommand
+from lib_Partage_BSS.cli.Output import RecordWriter, parseFields, writeRecords
+from lib_Partage_BSS.models.Account import Account
+
+from test_unitaire.conftest import DOMAIN
+
+
+def account(index):
+    account = Account("user{0}@{1}".format(index, DOMAIN))
+    account.displayName = "User, {0}".format(index)
+    account.zimbraMailAlias = ["a{0}@{1}".format(index, DOMAIN), "b{0}@{1}".format(index, DOMAIN)]
+    return account
+
+
+class Stream(io.StringIO):
+    def __init__(self):
+        super(Stream, self).__init__()
+        self.flushed = []
+
+    def flush(self):
+        self.flushed.append(self.getvalue().count("\n"))
+
+
+def test_parseFields():
+    assert parseFields(" name, displayName ,") == ["name", "displayName"]
+    assert parseFields("") is None
+
+
+def test_writeRecords_csv_vide_le_flux_a_chaque_page():
+    stream = Stream()
+    count = writeRecords([[account(0), account(1)], [account(2)]], stream, "csv", ["name", "displayName",
+                                                                                     "zimbraMailAlias"])
+    assert count == 3
+    lines = stream.getvalue().splitlines()
+    assert lines[0] == "name,displayName,zimbraMailAlias"
+    assert lines[1] == 'user0@mock.com,"User, 0","a0@mock.com,b0@mock.com"'
+    assert stream.flushed == [3, 4]
+
+
+def test_writeRecords_jsonl_et_tsv():
+    stream = io.StringIO()
+    writeRecords([[account(0)]], stream, "jsonl")
+    record = json.loads(stream.getvalue())
+    assert record["name"] == "user0@" + DOMAIN
+    assert "givenName" not in record
+    stream = io.StringIO()
+    writeRecords([[account(0)]], stream, "tsv", ["name", "givenName"])
+    assert stream.getvalue() == "name\tgivenName\nuser0@mock.com\t\n"
+    with pytest.raises(ValueError):
+        RecordWriter(stream, "xml")
+
+
+def test_streamCommand_parcourt_tout_le_domaine(server):
+    for index in range(7):
+        server.store.addAccount("user{0}@{1}".format(index, DOMAIN))
+    stream = io.StringIO()
+    args = {"domain": DOMAIN, "limit": 3, "all": True, "format": "jsonl", "fields": "name"}
+    assert streamCommand("getAllAccounts", args, stream) == 7
+    assert server.callCount("GetAllAccounts") == 3
+    assert json.loads(stream.getvalue().splitlines()[6]) == {"name": "user6@" + DOMAIN}
+    args["all"] = False
+    assert streamCommand("getAllAccounts", args, io.StringIO()) == 3
+
+
+def test_streamCommand_parcourt_toutes_les_classes_de_service(server):
+    for index in range(5):
+        server.store.addCOS(DOMAIN, "cos{0}".format(index))
+    stream = io.StringIO()
+    args = {"domain": DOMAIN, "limit": 2, "all": True, "format": "jsonl", "fields": "name"}
+    assert streamCommand("getAllCos", args, stream) == 5
+    assert server.callCount("GetAllCos") == 3
+
+
+def test_executeCommand_cas_fields_sans_format():
+    output, exitCode = executeCommand("getAllAccounts", {"domain": DOMAIN, "fields": "name"})
+    assert exitCode == 1
+    assert "--fields" in output
@@ -0,0 +1,69 @@
+import json
+
+import pytest
+import requests
+
+from lib_Partage_BSS.mock.Cassette import REDACTED, Cassette, ReplayedResponse, methodOf, recording, redactResponse, \
+    replaying
+from lib_Partage_BSS.mock.MockBSSServer import MockBSSServer
+from lib_Partage_BSS.services import AccountService
+from lib_Partage_BSS.utils.BSSRequest import getTransport
+from lib_Partage_BSS.utils.CircuitBreaker import isFailure
+from lib_Partage_BSS.utils.Retry import RetryPolicy
+
+from test_unitaire.conftest import DOMAIN, KEY
+
+
+def test_methodOf():
+    assert methodOf("https://bss/service/domain/Auth") == "Auth"
+    assert methodOf("https://bss/service/domain/GetAccount/abcdef") == "GetAccount"
+
+
+def test_redactResponse():
+    text = "<Response><token>abcdef</token><userPassword>{SSHA}x</userPassword></Response>"
+    assert redactResponse(text) == "<Response><token>{0}</token><userPassword>{0}</userPassword></Response>".format(
+        REDACTED)
+
+
+def test_enregistrement_puis_rejeu_sans_reseau(connexion, tmpdir):
+    path = str(tmpdir.join("cassette.json"))
+    previous = getTransport()
+    with MockBSSServer({DOMAIN: KEY}) as server:
+        server.store.addAccount("test@" + DOMAIN, displayName="Test")
+        connexion.url = server.url
+        with recording(path) as cassette:
+            recorded = AccountService.getAccount("test@" + DOMAIN)
+            AccountService.modifyAccountAliases("test@" + DOMAIN, ["alias@" + DOMAIN])
+    assert getTransport() is previous
+    assert [interaction["method"] for interaction in cassette.interactions] == \
+        ["Auth", "GetAccount", "GetAccount", "AddAccountAlias"]
+    content = open(path, encoding="utf-8").read()
+    assert server.store.tokens
+    for token in server.store.tokens:
+        assert token not in content
+    assert json.loads(content)["interactions"][0]["data"]["preauth"] == REDACTED
+
+    connexion.url = "http://127.0.0.1:9/service/domain/"
+    with replaying(path):
+        replayed = AccountService.getAccount("test@" + DOMAIN)
+        AccountService.modifyAccountAliases("test@" + DOMAIN, ["alias@" + DOMAIN])
+        with pytest.raises(LookupError):
+            AccountService.modifyAccountAliases("test@" + DOMAIN, ["autre@" + DOMAIN])
+    assert replayed.displayName == recorded.displayName == "Test"
+    assert getTransport() is previous
+
+
+def test_rejeu_en_boucle_et_duree():
+    interaction = {"method": "GetAccount", "data": {"name": "a@b.c"}, "status": 200,
+                   "response": "<Response/>", "duration": 0.05}
+    cassette = Cassette([interaction])
+    play = cassette.player(loop=True)
+    for _ in range(3):
+        assert isinstance(play("http://bss/GetAccount/token", {"name": "a@b.c"}, None), ReplayedResponse)
+    with pytest.raises(LookupError):
+        cassette.player()("http://bss/GetAccount/token", {"name": "a@b.c"}, None)
+    cassette.rewind()
+    with pytest.raises(requests.exceptions.ReadTimeout) as error:
+        cassette.player(timing=True)("http://bss/GetAccount/token", {"name": "a@b.c"}, 0.01)
+    assert isFailure(error.value)
+    assert RetryPolicy().isRetryableError("GetAccount", error.value)
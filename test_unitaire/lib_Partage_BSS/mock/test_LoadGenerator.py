@@ -0,0 +1,34 @@
+import pytest
+
+from lib_Partage_BSS.mock.LoadGenerator import OperationStats, parseMix, runLoad
+
+
+def test_parseMix():
+    assert parseMix("create=3, modify=5,close=1") == [("create", 3), ("modify", 5), ("close", 1)]
+    with pytest.raises(ValueError):
+        parseMix("create")
+
+
+def test_runLoad_mesure_les_operations():
+    calls = []
+
+    def fail(index):
+        if index % 2:
+            raise LookupError()
+
+    operations = {"ok": calls.append, "ko": fail}
+    report = runLoad(operations, [("ok", 10), ("ko", 4)], concurrency=3)
+    assert sorted(calls) == list(range(10))
+    assert report.operations["ok"].count == 10
+    assert report.operations["ko"].errors == {"LookupError": 2}
+    assert report.summary()["count"] == 14
+    assert "LookupError x2" in report.format()
+    with pytest.raises(ValueError):
+        runLoad(operations, [("inconnue", 1)])
+
+
+def test_percentile():
+    stats = OperationStats("op")
+    stats.latencies = [float(value) for value in range(1, 101)]
+    assert stats.percentile(50) == 50
+    assert stats.percentile(99) == 99
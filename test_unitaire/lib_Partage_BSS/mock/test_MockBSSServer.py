@@ -0,0 +1,62 @@
+import pytest
+
+from lib_Partage_BSS.exceptions.BSSConnexionException import BSSConnexionException
+from lib_Partage_BSS.exceptions.ServiceException import ServiceException
+from lib_Partage_BSS.mock.MockBSSServer import DISCONNECT, parseLdapFilter
+from lib_Partage_BSS.services import AccountService, BSSConnexion, COSService
+
+from test_unitaire.conftest import DOMAIN
+
+
+def test_cycle_de_vie_d_un_compte(server):
+    account = AccountService.createAccount("test@" + DOMAIN, "{SSHA}empreinte", "cosId")
+    assert account.name == "test@" + DOMAIN
+    assert account.zimbraCOSId == "cosId"
+    AccountService.addAccountAlias("test@" + DOMAIN, "alias@" + DOMAIN)
+    AccountService.renameAccount("test@" + DOMAIN, "nouveau@" + DOMAIN)
+    assert AccountService.getAccount("test@" + DOMAIN) is None
+    assert AccountService.getAccount("nouveau@" + DOMAIN).zimbraMailAlias == "alias@" + DOMAIN
+    AccountService.lockAccount("nouveau@" + DOMAIN)
+    assert AccountService.getAccount("nouveau@" + DOMAIN).zimbraAccountStatus == "locked"
+    AccountService.deleteAccount("nouveau@" + DOMAIN)
+    with pytest.raises(ServiceException):
+        AccountService.deleteAccount("nouveau@" + DOMAIN)
+    assert server.callCount("Auth") == 1
+
+
+def test_getAllAccounts_pagination_et_filtre(server):
+    for index in range(5):
+        server.store.addAccount("user{0}@{1}".format(index, DOMAIN), givenName="Prenom" if index % 2 else "Autre")
+    names = [account.name for account in AccountService.getAllAccounts(DOMAIN, limit=2, offset=2)]
+    assert names == ["user2@" + DOMAIN, "user3@" + DOMAIN]
+    filtered = AccountService.getAllAccounts(DOMAIN, ldapQuery="(&(givenName=prenom)(!(uid=user1)))")
+    assert [account.name for account in filtered] == ["user3@" + DOMAIN]
+    assert AccountService.countAccounts(DOMAIN, pageSize=2) == 5
+
+
+def test_cos(server):
+    server.store.addCOS(DOMAIN, "cos1", zimbraFeatureMailEnabled=True)
+    assert COSService.getCOS(DOMAIN, "cos1").zimbraFeatureMailEnabled is True
+    assert COSService.getCOS(DOMAIN, "inconnue") is None
+    assert [cos.name for cos in COSService.getAllCOS(DOMAIN)] == ["cos1"]
+
+
+def test_erreurs_injectees_et_preauth(server):
+    server.injectError("GetAccount", status=5, message="erreur")
+    with pytest.raises(ServiceException):
+        AccountService.getAccount("test@" + DOMAIN)
+    server.injectError("GetAccount", mode=DISCONNECT)
+    with pytest.raises(Exception):
+        AccountService.getAccount("test@" + DOMAIN)
+    BSSConnexion().setDomainKey({DOMAIN: "mauvaise-cle"})
+    with pytest.raises(BSSConnexionException):
+        AccountService.getAccount("test@" + DOMAIN)
+
+
+def test_parseLdapFilter():
+    predicate = parseLdapFilter("(|(sn=Dup*)(mail=alias@domain.com))")
+    assert predicate({"name": "a@domain.com", "sn": "Dupont"})
+    assert predicate({"name": "b@domain.com", "zimbraMailAlias": ["alias@domain.com"]})
+    assert not predicate({"name": "c@domain.com", "sn": "Martin"})
+    with pytest.raises(ValueError):
+        parseLdapFilter("(sn=Dupont")
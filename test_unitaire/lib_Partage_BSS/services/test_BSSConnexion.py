@@ -113,3 +113,33 @@ def test_getToken_5minApresCreation(mocker):
         token = con.token("domain.com")
         assert hmac.new.call_count == 1
     BSSConnexion.instance = None
+
+
+def test_getToken_renouvellementNeBloquePasLesAutresDomaines(mocker, create_connexion):
+    import threading
+    con = create_connexion
+    con._token["autre.com"] = "tokenAutre"
+    con._timestampOfLastToken["autre.com"] = round(timer.time())
+    started, release = threading.Event(), threading.Event()
+    response = MagicMock(Response)
+    response.text = "<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n<Response>\n  <status type=\"integer\">0</status>\n  <message>OK</message>\n  <token>tokenDeTest</token>\n</Response>\n"
+
+    def slowPost(*args, **kwargs):
+        started.set()
+        release.wait(5)
+        return response
+    mocker.patch('requests.post', side_effect=slowPost)
+    thread = threading.Thread(target=con.token, args=("domain.com",))
+    thread.start()
+    try:
+        assert started.wait(5)
+        tokens = []
+        reader = threading.Thread(target=lambda: tokens.append(con.token("autre.com")))
+        reader.start()
+        reader.join(1)
+        assert tokens == ["tokenAutre"]
+    finally:
+        release.set()
+        thread.join()
+    assert con.token("domain.com") == "tokenDeTest"
+    BSSConnexion.instance = None
@@ -104,3 +104,129 @@ def test_getAccount_cas_compte_inexistant(mocker):
                 AccountService.getAccount("test@domain.com")
 
 
+
+
+def test_syncAccountAliases_sans_lecture_du_compte(mocker):
+    getAccount = mocker.patch.object(AccountService, 'getAccount')
+    add = mocker.patch.object(AccountService, 'addAccountAlias')
+    remove = mocker.patch.object(AccountService, 'removeAccountAlias')
+    added, removed = AccountService.syncAccountAliases("test@domain.com", ["a@domain.com", "b@domain.com"],
+                                                       currentAliases=["b@domain.com", "c@domain.com"])
+    assert getAccount.call_count == 0
+    assert added == {"a@domain.com"}
+    assert removed == {"c@domain.com"}
+    add.assert_called_once_with("test@domain.com", "a@domain.com")
+    remove.assert_called_once_with("test@domain.com", "c@domain.com")
+
+
+def test_modifyAccountAliases_alias_unique(mocker):
+    account = Account("test@domain.com")
+    account._zimbraMailAlias = "old@domain.com"
+    mocker.patch.object(AccountService, 'getAccount', return_value=account)
+    add = mocker.patch.object(AccountService, 'addAccountAlias')
+    remove = mocker.patch.object(AccountService, 'removeAccountAlias')
+    AccountService.modifyAccountAliases("test@domain.com", ["new@domain.com"])
+    add.assert_called_once_with("test@domain.com", "new@domain.com")
+    remove.assert_called_once_with("test@domain.com", "old@domain.com")
+
+
+def test_syncAccountsAliases_erreur_isolee_par_compte(mocker):
+    def add(name, alias):
+        if name == "ko@domain.com":
+            raise ServiceException(None, "erreur")
+    mocker.patch.object(AccountService, 'addAccountAlias', side_effect=add)
+    mocker.patch.object(AccountService, 'removeAccountAlias')
+    results = AccountService.syncAccountsAliases(
+        {"ok@domain.com": ["a@domain.com"], "ko@domain.com": ["b@domain.com"]},
+        currentAliasesByAccount={"ok@domain.com": [], "ko@domain.com": []})
+    assert results["ok@domain.com"].ok
+    assert results["ok@domain.com"].result == ({"a@domain.com"}, set())
+    assert isinstance(results["ko@domain.com"].error, ServiceException)
+
+
+def test_preDeleteAccounts_ordre_des_etapes_par_compte(mocker):
+    calls = []
+    mocker.patch.object(AccountService, 'setPassword', side_effect=lambda name, pwd: calls.append(("SetPassword", name)))
+    mocker.patch.object(AccountService, 'modifyAccount', side_effect=lambda account: calls.append(("ModifyAccount", account.name)))
+    mocker.patch.object(AccountService, 'renameAccount', side_effect=lambda name, newName: calls.append(("RenameAccount", name)))
+    names = ["user%d@domain.com" % i for i in range(10)]
+    results = AccountService.preDeleteAccounts(names, maxWorkers=4)
+    assert list(results) == names
+    for name in names:
+        assert results[name].result.endswith("_" + name)
+        steps = [method for method, account in calls if account == name]
+        assert steps == ["SetPassword", "ModifyAccount", "RenameAccount"]
+
+
+
+def test_lockAccounts_doublons_traites_une_fois(mocker):
+    lock = mocker.patch.object(AccountService, 'lockAccount', return_value=None)
+    results = AccountService.lockAccounts(["b@domain.com", "a@domain.com", "b@domain.com"], maxWorkers=4)
+    assert list(results) == ["b@domain.com", "a@domain.com"]
+    assert sorted(call[0][0] for call in lock.call_args_list) == ["a@domain.com", "b@domain.com"]
+
+
+def test_addAccountAlias_invalide_la_copie_meme_en_cas_de_timeout(mocker):
+    import requests
+    AccountService.configureSnapshot()
+    mocker.patch.object(AccountService, 'callMethod', side_effect=requests.exceptions.Timeout)
+    AccountService._snapshot.get("user@domain.com", lambda: "copie")
+    with pytest.raises(requests.exceptions.Timeout):
+        AccountService.addAccountAlias("user@domain.com", "alias@domain.com")
+    assert AccountService._snapshot.get("user@domain.com", lambda: "relu") == "relu"
+    AccountService.configureSnapshot()
+
+@pytest.mark.parametrize("write", [
+    lambda: AccountService.setPassword("user@domain.com", "secret"),
+    lambda: AccountService.modifyPassword("user@domain.com", "{SSHA}empreinte"),
+])
+def test_modification_du_mot_de_passe_invalide_la_copie_meme_en_cas_de_timeout(mocker, write):
+    import requests
+    AccountService.configureSnapshot()
+    mocker.patch.object(AccountService, 'callMethod', side_effect=requests.exceptions.Timeout)
+    AccountService._snapshot.get("user@domain.com", lambda: "copie")
+    with pytest.raises(requests.exceptions.Timeout):
+        write()
+    assert AccountService._snapshot.get("user@domain.com", lambda: "relu") == "relu"
+    AccountService.configureSnapshot()
+
+
+def test_getAccount_lecture_posterieure_a_une_ecriture_non_regroupee(mocker):
+    import threading
+    import time
+    from collections import OrderedDict
+    release = threading.Event()
+    reads = []
+
+    def read(name):
+        reads.append(name)
+        if len(reads) == 1:
+            release.wait(5)
+            return "avant"
+        return "après"
+    mocker.patch.object(AccountService, '_getAccount', side_effect=read)
+    mocker.patch.object(AccountService, 'callMethod', return_value={
+        "status": OrderedDict([("type", "integer"), ("content", "0")]), "message": "ok"})
+    results = []
+    reader = threading.Thread(target=lambda: results.append(AccountService.getAccount("user@domain.com")))
+    reader.start()
+    time.sleep(0.05)
+    try:
+        AccountService.activateAccount("user@domain.com")
+        assert AccountService.getAccount("user@domain.com") == "après"
+    finally:
+        release.set()
+        reader.join()
+    assert results == ["avant"]
+
+
+def test_iterAllAccounts_parcourt_toutes_les_pages(mocker):
+    pages = [["a", "b"], ["c", "d"], ["e"]]
+    getAll = mocker.patch("lib_Partage_BSS.services.AccountService.getAllAccounts", side_effect=pages)
+    assert list(AccountService.iterAllAccounts("domain.com", pageSize=2)) == ["a", "b", "c", "d", "e"]
+    assert [call[1]["offset"] for call in getAll.call_args_list] == [0, 2, 4]
+
+
+def test_iterAccountPages_renvoie_les_pages(mocker):
+    mocker.patch("lib_Partage_BSS.services.AccountService.getAllAccounts", side_effect=[["a", "b"], []])
+    assert list(AccountService.iterAccountPages("domain.com", pageSize=2)) == [["a", "b"], []]
@@ -0,0 +1,23 @@
+from lib_Partage_BSS.exceptions.ServiceException import ServiceException
+from lib_Partage_BSS.services import GlobalService
+
+
+def test_fanOut_isole_les_erreurs_par_domaine():
+    def function(domain):
+        if domain == "ko.com":
+            raise ServiceException(1, "erreur")
+        return [domain + "-1", domain + "-2"]
+    results = GlobalService.fanOut(function, ["a.com", "ko.com", "b.com"])
+    assert list(results) == ["a.com", "ko.com", "b.com"]
+    assert results["a.com"].result == ["a.com-1", "a.com-2"]
+    assert not results["ko.com"].ok
+
+
+def test_fanOutMerged_fusionne_les_listes():
+    def function(domain):
+        if domain == "ko.com":
+            raise ServiceException(1, "erreur")
+        return [domain]
+    merged, errors = GlobalService.fanOutMerged(function, ["a.com", "ko.com", "b.com"])
+    assert merged == ["a.com", "b.com"]
+    assert list(errors) == ["ko.com"]
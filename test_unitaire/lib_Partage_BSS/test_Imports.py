@@ -0,0 +1,31 @@
+import subprocess
+import sys
+
+import lib_Partage_BSS
+
+
+def loadedModules(statement):
+    code = statement + "\nimport sys\nprint(' '.join(sorted(sys.modules)))"
+    return subprocess.run([sys.executable, "-c", code], check=True, stdout=subprocess.PIPE,
+                          universal_newlines=True).stdout.split()
+
+
+def test_les_validateurs_ne_chargent_pas_les_services():
+    modules = loadedModules("from lib_Partage_BSS.utils.CheckMethods import checkIsMailAddress")
+    for module in ("requests", "xmljson", "lib_Partage_BSS.services", "lib_Partage_BSS.utils.BSSRequest"):
+        assert module not in modules
+
+
+def test_les_services_ne_dependent_pas_de_syslog():
+    # simule une plateforme sans module syslog (Windows)
+    modules = loadedModules("import sys\nsys.modules['syslog'] = None\n"
+                            "from lib_Partage_BSS.services import AccountService, GlobalService")
+    assert "lib_Partage_BSS.services.GlobalService" in modules
+
+
+def test_les_noms_des_packages_restent_accessibles():
+    assert lib_Partage_BSS.services.getAccount is lib_Partage_BSS.services.AccountService.getAccount
+    assert lib_Partage_BSS.services.BSSConnexion is lib_Partage_BSS.services.BSSConnexionService.BSSConnexion
+    assert lib_Partage_BSS.utils.postBSS is lib_Partage_BSS.utils.BSSRequest.postBSS
+    assert lib_Partage_BSS.utils.checkIsMailAddress("test@domain.com")
+    assert "services" in dir(lib_Partage_BSS)
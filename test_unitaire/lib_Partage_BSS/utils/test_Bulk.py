@@ -0,0 +1,56 @@
+import pytest
+
+from lib_Partage_BSS.exceptions import ServiceException
+from lib_Partage_BSS.utils.Bulk import AdaptiveConcurrency, runBulk, raiseFirstError
+
+
+def test_runBulk_ordre_et_erreurs():
+    def function(item):
+        if item == 3:
+            raise ValueError(item)
+        return item * 2
+    results = runBulk(function, range(6), maxWorkers=3)
+    assert [result.item for result in results] == list(range(6))
+    assert [result.result for result in results if result.ok] == [0, 2, 4, 8, 10]
+    with pytest.raises(ValueError):
+        raiseFirstError(results)
+
+
+def test_adaptiveConcurrency_augmente_si_sain():
+    controller = AdaptiveConcurrency(initial=2, maximum=4, window=5)
+    for i in range(20):
+        controller.record(0.01)
+    assert controller.limit == 4
+
+
+def test_adaptiveConcurrency_diminue_sur_erreur():
+    controller = AdaptiveConcurrency(initial=8, window=5)
+    controller.record(0.01, ServiceException(3, "Problème format réponse"))
+    assert controller.limit == 4
+    # les appels déjà en vol qui échouent ne provoquent pas de nouvelle réduction
+    controller.record(0.01, ServiceException(3, "Problème format réponse"))
+    assert controller.limit == 4
+
+
+def test_adaptiveConcurrency_ignore_erreurs_fonctionnelles():
+    controller = AdaptiveConcurrency(initial=4, maximum=4, window=5)
+    for i in range(10):
+        controller.record(0.01, ServiceException(2, "Compte inexistant"))
+    assert controller.limit == 4
+
+
+def test_adaptiveConcurrency_diminue_si_latence_augmente():
+    controller = AdaptiveConcurrency(initial=4, window=5)
+    for i in range(5):
+        controller.record(0.01)
+    assert controller.limit == 5
+    for i in range(5):
+        controller.record(0.1)
+    assert controller.limit == 2
+
+
+def test_runBulk_adaptatif():
+    controller = AdaptiveConcurrency(initial=1, maximum=3, window=2, targetLatency=1)
+    results = runBulk(lambda item: item, range(20), maxWorkers=controller)
+    assert [result.result for result in results] == list(range(20))
+    assert controller.limit == 3
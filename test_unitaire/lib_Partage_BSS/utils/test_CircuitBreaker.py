@@ -0,0 +1,45 @@
+import time
+
+import pytest
+import requests
+
+from lib_Partage_BSS.exceptions import CircuitOpenException, ServiceException
+from lib_Partage_BSS.utils.CircuitBreaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+
+
+def fail():
+    raise requests.exceptions.ConnectionError()
+
+
+def test_circuitBreaker_ouverture_apres_echecs():
+    breaker = CircuitBreaker("domain.com", failureThreshold=2, resetTimeout=60)
+    for i in range(2):
+        with pytest.raises(requests.exceptions.ConnectionError):
+            breaker.call(fail)
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenException):
+        breaker.call(lambda: "ok")
+
+
+def test_circuitBreaker_erreur_fonctionnelle_ignoree():
+    breaker = CircuitBreaker("domain.com", failureThreshold=1)
+
+    def businessError():
+        raise ServiceException(None, "no such account")
+    with pytest.raises(ServiceException):
+        breaker.call(businessError)
+    assert breaker.state == CLOSED
+
+
+def test_circuitBreaker_appel_de_test():
+    breaker = CircuitBreaker("domain.com", failureThreshold=1, resetTimeout=0.05)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        breaker.call(fail)
+    time.sleep(0.06)
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(requests.exceptions.ConnectionError):
+        breaker.call(fail)
+    assert breaker.state == OPEN
+    time.sleep(0.06)
+    assert breaker.call(lambda: "ok") == "ok"
+    assert breaker.state == CLOSED
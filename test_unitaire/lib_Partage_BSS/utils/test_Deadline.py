@@ -0,0 +1,72 @@
+import time
+from unittest.mock import MagicMock
+
+import pytest
+import requests
+from requests import Response
+
+from lib_Partage_BSS.exceptions import DeadlineExceededException
+from lib_Partage_BSS.utils import postBSS
+from lib_Partage_BSS.utils.Bulk import runBulk
+from lib_Partage_BSS.utils.Deadline import deadline, remainingTime, callTimeout, getDefaultTimeout
+
+
+def test_postBSS_timeout_par_defaut(mocker):
+    response = MagicMock(Response)
+    response.text = "<Response><status type=\"integer\">0</status><message>ok</message></Response>"
+    post = mocker.patch('requests.post', return_value=response)
+    postBSS("url", {})
+    assert post.call_args[1]["timeout"] == getDefaultTimeout()
+
+
+def test_postBSS_timeout_reduit_par_l_echeance(mocker):
+    response = MagicMock(Response)
+    response.text = "<Response><status type=\"integer\">0</status><message>ok</message></Response>"
+    post = mocker.patch('requests.post', return_value=response)
+    with deadline(2):
+        postBSS("url", {})
+    assert post.call_args[1]["timeout"] <= 2
+
+
+def test_deadline_imbriquee_ne_repousse_pas_l_echeance():
+    with deadline(1):
+        with deadline(60):
+            assert remainingTime() <= 1
+    assert remainingTime() is None
+
+
+def test_deadline_depassee():
+    with deadline(0.01):
+        time.sleep(0.02)
+        with pytest.raises(DeadlineExceededException):
+            callTimeout()
+
+
+def test_deadline_pas_de_rejeu_apres_echeance(mocker):
+    def post(*args, **kwargs):
+        time.sleep(0.06)
+        raise requests.exceptions.ConnectionError()
+    post = mocker.patch('requests.post', side_effect=post)
+    with deadline(0.05):
+        with pytest.raises(requests.exceptions.ConnectionError):
+            postBSS("url", {}, "GetAccount")
+    assert post.call_count == 1
+
+
+def test_deadline_timeout_reduit_par_l_echeance(mocker):
+    mocker.patch('requests.post', side_effect=requests.exceptions.ReadTimeout)
+    with deadline(5):
+        with pytest.raises(DeadlineExceededException):
+            postBSS("url", {}, "GetAccount")
+
+
+def test_deadline_timeout_sans_echeance(mocker):
+    mocker.patch('requests.post', side_effect=requests.exceptions.ReadTimeout)
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        postBSS("url", {})
+
+
+def test_deadline_propagee_aux_traitements_de_masse():
+    with deadline(5):
+        results = runBulk(lambda item: remainingTime(), range(4), maxWorkers=4)
+    assert all(0 < result.result <= 5 for result in results)
@@ -0,0 +1,44 @@
+from unittest.mock import MagicMock
+
+import pytest
+from requests import Response
+
+from lib_Partage_BSS.exceptions.ServiceException import ServiceException
+from lib_Partage_BSS.utils import BSSRequest, Hooks
+
+
+@pytest.fixture()
+def events():
+    events = []
+    for name in Hooks.EVENTS:
+        Hooks.addHook(name, lambda event, name=name: events.append((name, event)))
+    yield events
+    Hooks.clearHooks()
+
+
+def mockPost(mocker, text):
+    response = MagicMock(Response)
+    response.text = text
+    response.content = text.encode("utf-8")
+    mocker.patch("requests.post", return_value=response)
+    return response
+
+
+def test_hooks_appeles_a_chaque_etape(mocker, events):
+    mockPost(mocker, "<Response><status type=\"integer\">0</status></Response>")
+    BSSRequest.postBSS("https://api/Auth", {"domain": "domain.com"}, "Auth")
+    assert [name for name, event in events] == [Hooks.BEFORE_REQUEST, Hooks.AFTER_RESPONSE, Hooks.AFTER_PARSE]
+    event = events[-1][1]
+    assert event.methodName == "Auth"
+    assert event.requestSize == len("domain=domain.com")
+    assert event.responseSize > 0
+    assert event.networkTime >= 0 and event.parseTime >= 0
+
+
+def test_hook_on_error_et_hook_en_erreur(mocker, events):
+    Hooks.addHook(Hooks.BEFORE_REQUEST, lambda event: 1 / 0)
+    mockPost(mocker, "pas du xml")
+    with pytest.raises(ServiceException):
+        BSSRequest.postBSS("https://api/CreateAccount", {}, "CreateAccount")
+    assert events[-1][0] == Hooks.ON_ERROR
+    assert isinstance(events[-1][1].error, ServiceException)
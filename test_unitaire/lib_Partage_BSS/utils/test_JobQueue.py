@@ -0,0 +1,126 @@
+import pytest
+
+from lib_Partage_BSS.exceptions import CircuitOpenException, ServiceException
+from lib_Partage_BSS.utils.JobQueue import JobQueue, IN_FLIGHT, DONE, FAILED
+
+
+@pytest.fixture()
+def queue(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite"), "test", maxAttempts=2)
+    yield queue
+    queue.close()
+
+
+def test_jobQueue_traitement_et_echecs_bornes(queue):
+    queue.add(["ok@domain.com", "ko@domain.com"])
+    calls = []
+
+    def function(name):
+        calls.append(name)
+        if name == "ko@domain.com":
+            raise ServiceException(None, "erreur")
+        return name
+    counts = queue.run(function, maxWorkers=2)
+    assert counts[DONE] == 1
+    assert counts[FAILED] == 1
+    assert calls.count("ko@domain.com") == 2
+    assert "ko@domain.com" in queue.errors()
+
+
+def test_jobQueue_reprise_sans_refaire_le_travail(tmp_path):
+    path = str(tmp_path / "jobs.sqlite")
+    queue = JobQueue(path, "test")
+    queue.add(["a@domain.com", "b@domain.com", "c@domain.com"])
+    queue.complete(queue.lease(1)[0])
+    queue.lease(1)
+    queue.close()
+
+    # redémarrage après interruption : l'élément en cours est remis en attente, l'élément terminé n'est pas rejoué
+    queue = JobQueue(path, "test")
+    assert queue.add(["a@domain.com", "b@domain.com", "c@domain.com"]) == 0
+    assert queue.counts()[IN_FLIGHT] == 1
+    queue.requeueInFlight()
+    calls = []
+    queue.run(calls.append)
+    assert sorted(calls) == ["b@domain.com", "c@domain.com"]
+    assert queue.counts()[DONE] == 3
+    queue.close()
+
+
+def test_jobQueue_location_expiree_reprise(queue):
+    queue.leaseDuration = -1
+    queue.add(["a@domain.com"])
+    assert queue.lease(10) == ["a@domain.com"]
+    assert queue.lease(10) == ["a@domain.com"]
+    assert queue.lease(10) == []
+    assert queue.counts()[FAILED] == 1
+
+
+def test_jobQueue_report_si_disjoncteur_ouvert(queue, mocker):
+    mocker.patch('lib_Partage_BSS.utils.JobQueue.sleep')
+    queue.add(["a@domain.com"])
+    answers = [CircuitOpenException("domain.com", 1), CircuitOpenException("domain.com", 1), None]
+
+    def function(name):
+        error = answers.pop(0)
+        if error is not None:
+            raise error
+    assert queue.run(function)[DONE] == 1
+
+
+def test_shardedJobQueue_chaque_element_traite_une_fois(tmp_path):
+    import threading
+    from lib_Partage_BSS.utils.JobQueue import ShardedJobQueue
+    path = str(tmp_path / "jobs.sqlite")
+    names = ["user%d@domain.com" % i for i in range(200)]
+    ShardedJobQueue(path, "test", shardCount=8).add(names)
+    calls = {}
+
+    def worker(owner):
+        queue = ShardedJobQueue(path, "test", shardCount=8, owner=owner)
+        calls[owner] = []
+        queue.run(calls[owner].append, maxWorkers=2, batchSize=10)
+        queue.close()
+    threads = [threading.Thread(target=worker, args=("worker%d" % i,)) for i in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    processed = [name for owner in calls for name in calls[owner]]
+    assert sorted(processed) == sorted(names)
+
+
+def test_shardedJobQueue_retryFailed_rouvre_les_lots(tmp_path):
+    from lib_Partage_BSS.utils.JobQueue import ShardedJobQueue
+    queue = ShardedJobQueue(str(tmp_path / "jobs.sqlite"), "test", shardCount=4, maxAttempts=1)
+    queue.add(["a@domain.com", "b@domain.com"])
+
+    def fail(name):
+        raise ServiceException(2, "erreur")
+    assert queue.run(fail)[FAILED] == 2
+    assert queue.retryFailed() == 2
+    calls = []
+    assert queue.run(calls.append)[DONE] == 2
+    assert sorted(calls) == ["a@domain.com", "b@domain.com"]
+    queue.close()
+
+
+def test_shardedJobQueue_lot_termine_apres_location_expiree_d_un_autre_worker(tmp_path, mocker):
+    from lib_Partage_BSS.utils.JobQueue import ShardedJobQueue
+    mocker.patch('lib_Partage_BSS.utils.JobQueue.sleep')
+    path = str(tmp_path / "jobs.sqlite")
+    other = ShardedJobQueue(path, "test", shardCount=1, owner="other", leaseDuration=0.2)
+    other.add(["a@domain.com", "b@domain.com"])
+    shard = other.leaseShard()
+    assert other.lease(1, shard) == ["a@domain.com"]
+    other.releaseShard(shard)
+    queue = ShardedJobQueue(path, "test", shardCount=1, owner="worker")
+    calls = []
+    counts = queue.run(calls.append)
+    assert sorted(calls) == ["a@domain.com", "b@domain.com"]
+    assert counts[DONE] == 2
+    # l'ancien worker a perdu la location : il ne peut plus terminer l'élément
+    assert not other.fail("a@domain.com", "location perdue")
+    assert queue.counts()[DONE] == 2
+    queue.close()
+    other.close()
@@ -0,0 +1,32 @@
+import io
+import logging
+
+import pytest
+
+from lib_Partage_BSS.utils import Log
+
+
+@pytest.fixture()
+def stream():
+    stream = io.StringIO()
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(Log.StructuredFormatter("%(levelname)s %(message)s"))
+    Log.configureLogging(level=logging.DEBUG, handlers=[handler])
+    yield stream
+    Log.stopLogging()
+
+
+def test_logEvent_champs_structures(stream):
+    Log.logEvent(Log.getLogger("services"), logging.INFO, "appel", method="GetAccount", account="a b@domain.com",
+                 duration=0.5)
+    Log.stopLogging()
+    assert stream.getvalue() == "INFO appel account=\"a b@domain.com\" duration=0.5 method=GetAccount\n"
+
+
+def test_logger_historique(stream):
+    logger = Log.Logger()
+    logger.ident = "test"
+    assert Log.Logger().ident == "test"
+    logger.logerror("erreur")
+    Log.stopLogging()
+    assert stream.getvalue() == "ERROR erreur\n"
@@ -0,0 +1,57 @@
+from unittest.mock import MagicMock
+from urllib.request import urlopen
+
+import pytest
+from requests import Response
+
+from lib_Partage_BSS.utils import BSSRequest
+from lib_Partage_BSS.utils.Metrics import Metrics, Histogram, DURATION, RESPONSE_BYTES, serveMetrics
+
+
+@pytest.fixture(autouse=True)
+def reset():
+    Metrics().reset()
+    yield
+    Metrics().reset()
+
+
+def test_histogram_exposition():
+    histogram = Histogram("test_seconds", "aide", ("method",), buckets=(0.1, 1))
+    histogram.observe(0.05, method="Get\"A")
+    histogram.observe(0.5, method="Get\"A")
+    lines = histogram.exposition().split("\n")
+    assert "# TYPE test_seconds histogram" in lines
+    assert "test_seconds_bucket{method=\"Get\\\"A\",le=\"0.1\"} 1" in lines
+    assert "test_seconds_bucket{method=\"Get\\\"A\",le=\"+Inf\"} 2" in lines
+    assert "test_seconds_count{method=\"Get\\\"A\"} 2" in lines
+
+
+def test_postBSS_enregistre_les_phases_et_la_taille(mocker):
+    response = MagicMock(Response)
+    response.text = "<Response><status type=\"integer\">0</status></Response>"
+    response.content = response.text.encode("utf-8")
+    mocker.patch("requests.post", return_value=response)
+    BSSRequest.postBSS("https://api/GetAccount", {}, "GetAccount")
+    assert DURATION.count(method="GetAccount", phase="network") == 1
+    assert DURATION.count(method="GetAccount", phase="parse") == 1
+    assert RESPONSE_BYTES.sum(method="GetAccount") == len(response.content)
+
+
+def test_metrics_desactivees():
+    Metrics().enabled = False
+    try:
+        DURATION.observe(1, method="GetAccount", phase="total")
+    finally:
+        Metrics().enabled = True
+    assert DURATION.count(method="GetAccount", phase="total") == 0
+
+
+def test_serveMetrics():
+    DURATION.observe(1, method="GetAccount", phase="total")
+    server = serveMetrics(0)
+    try:
+        body = urlopen("http://127.0.0.1:%d/metrics" % server.server_address[1]).read().decode("utf-8")
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert "bss_request_duration_seconds_count{method=\"GetAccount\",phase=\"total\"} 1" in body
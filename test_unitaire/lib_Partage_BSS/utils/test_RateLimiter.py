@@ -0,0 +1,49 @@
+import time
+
+import pytest
+
+from lib_Partage_BSS.utils.RateLimiter import RateLimiter, TokenBucket, READ, WRITE, methodClass
+
+
+@pytest.fixture()
+def limiter():
+    limiter = RateLimiter()
+    limiter.reset()
+    yield limiter
+    limiter.reset()
+
+
+def test_methodClass():
+    assert methodClass("GetAccount") == READ
+    assert methodClass("GetAllCos") == READ
+    assert methodClass("ModifyAccount") == WRITE
+
+
+def test_tokenBucket_rafale_puis_attente():
+    bucket = TokenBucket(10, burst=2)
+    assert bucket.tryAcquire() == 0
+    assert bucket.tryAcquire() == 0
+    assert 0 < bucket.tryAcquire() <= 0.1
+
+
+def test_rateLimiter_sans_limite_par_defaut(limiter):
+    for i in range(100):
+        assert limiter.tryAcquire("domain.com", "ModifyAccount") == 0
+
+
+def test_rateLimiter_limite_par_domaine_et_classe(limiter):
+    limiter.setRate(WRITE, 1, burst=1)
+    limiter.setRate(WRITE, 100, burst=100, domain="autre.com")
+    assert limiter.tryAcquire("domain.com", "ModifyAccount") == 0
+    assert limiter.tryAcquire("domain.com", "ModifyAccount") > 0
+    assert limiter.tryAcquire("domain.com", "GetAccount") == 0
+    assert limiter.tryAcquire("autre.com", "ModifyAccount") == 0
+    assert limiter.tryAcquire("autre.com", "ModifyAccount") == 0
+
+
+def test_rateLimiter_acquire_attend(limiter):
+    limiter.setRate(READ, 20, burst=1)
+    start = time.monotonic()
+    for i in range(3):
+        limiter.acquire("domain.com", "GetAccount")
+    assert time.monotonic() - start >= 0.09
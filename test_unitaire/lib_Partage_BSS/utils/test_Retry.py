@@ -0,0 +1,82 @@
+from unittest.mock import MagicMock
+
+import pytest
+import requests
+from requests import Response
+
+from lib_Partage_BSS.exceptions import ServiceException
+from lib_Partage_BSS.utils import postBSS
+from lib_Partage_BSS.utils.Retry import RetryBudget, RetryPolicy, setRetryPolicy, getRetryPolicy
+
+
+def xmlResponse(status):
+    response = MagicMock(Response)
+    response.text = "<?xml version=\"1.0\" encoding=\"UTF-8\"?>" \
+                    "<Response><status type=\"integer\">%d</status><message>message</message></Response>" % status
+    return response
+
+
+@pytest.fixture()
+def policy():
+    previous = getRetryPolicy()
+    policy = RetryPolicy(maxAttempts=3, baseDelay=0, retryableWriteCodes=[7])
+    setRetryPolicy(policy)
+    yield policy
+    setRetryPolicy(previous)
+
+
+def test_postBSS_lecture_rejouee_apres_reponse_mal_formee(mocker, policy):
+    bad = MagicMock(Response)
+    bad.text = "<html>502 Bad Gateway</html>"
+    post = mocker.patch('requests.post', side_effect=[bad, xmlResponse(0)])
+    response = postBSS("url", {}, "GetAccount")
+    assert response["status"]["content"] == "0"
+    assert post.call_count == 2
+
+
+def test_postBSS_lecture_abandon_apres_maxAttempts(mocker, policy):
+    post = mocker.patch('requests.post', side_effect=requests.exceptions.ConnectionError)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        postBSS("url", {}, "GetAllAccounts")
+    assert post.call_count == 3
+
+
+def test_postBSS_ecriture_non_rejouee_par_defaut(mocker, policy):
+    post = mocker.patch('requests.post', side_effect=requests.exceptions.Timeout)
+    with pytest.raises(requests.exceptions.Timeout):
+        postBSS("url", {}, "ModifyAccount")
+    assert post.call_count == 1
+
+
+def test_postBSS_ecriture_rejouee_selon_code(mocker, policy):
+    policy.retryWrites = True
+    post = mocker.patch('requests.post', side_effect=[xmlResponse(7), xmlResponse(0)])
+    assert postBSS("url", {}, "ModifyAccount")["status"]["content"] == "0"
+    post = mocker.patch('requests.post', side_effect=[xmlResponse(2), xmlResponse(0)])
+    assert postBSS("url", {}, "ModifyAccount")["status"]["content"] == "2"
+    assert post.call_count == 1
+
+
+def test_postBSS_ecriture_non_rejouee_sur_timeout_sans_option(mocker, policy):
+    policy.retryWrites = True
+    post = mocker.patch('requests.post', side_effect=requests.exceptions.Timeout)
+    with pytest.raises(requests.exceptions.Timeout):
+        postBSS("url", {}, "ModifyAccount")
+    assert post.call_count == 1
+    policy.retryWritesOnNetworkError = True
+    post = mocker.patch('requests.post', side_effect=[requests.exceptions.Timeout, xmlResponse(0)])
+    assert postBSS("url", {}, "ModifyAccount")["status"]["content"] == "0"
+    assert post.call_count == 2
+
+
+def test_retryBudget_epuise():
+    budget = RetryBudget(maxTokens=4, tokenRatio=1)
+    assert budget.onFailure()
+    assert not budget.onFailure()
+    budget.onSuccess()
+    budget.onSuccess()
+    assert budget.onFailure()
+
+
+def test_serviceException_code_entier():
+    assert ServiceException(3, "Problème format réponse").code == 3
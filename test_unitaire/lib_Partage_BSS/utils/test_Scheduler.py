@@ -0,0 +1,117 @@
+import threading
+import time
+
+import pytest
+
+from lib_Partage_BSS.exceptions import DeadlineExceededException
+from lib_Partage_BSS.utils.Deadline import deadline
+from lib_Partage_BSS.utils.RateLimiter import RateLimiter, READ
+from lib_Partage_BSS.utils.Scheduler import Scheduler, priority, INTERACTIVE, BULK
+
+
+@pytest.fixture()
+def limiter():
+    limiter = RateLimiter()
+    limiter.reset()
+    yield limiter
+    limiter.reset()
+
+
+def startWaiters(scheduler, order, calls):
+    threads = []
+    for name, domain in calls:
+        def call(name=name, domain=domain):
+            with priority(name):
+                with scheduler.slot(domain, "GetAccount"):
+                    order.append((name, domain))
+        thread = threading.Thread(target=call)
+        thread.start()
+        threads.append(thread)
+        time.sleep(0.02)
+    return threads
+
+
+def test_scheduler_interactif_avant_bulk(limiter):
+    scheduler = Scheduler(maxInFlight=1)
+    order = []
+    scheduler.acquire("domain.com", "GetAccount")
+    threads = startWaiters(scheduler, order, [(BULK, "domain.com")] * 3 + [(INTERACTIVE, "domain.com")])
+    scheduler.release("domain.com")
+    for thread in threads:
+        thread.join()
+    assert order[0] == (INTERACTIVE, "domain.com")
+    assert len(order) == 4
+
+
+def test_scheduler_equitable_entre_domaines(limiter):
+    scheduler = Scheduler(maxInFlight=1)
+    order = []
+    scheduler.acquire("domain.com", "GetAccount")
+    threads = startWaiters(scheduler, order, [(BULK, "domain.com")] * 3 + [(BULK, "autre.com")])
+    scheduler.release("domain.com")
+    for thread in threads:
+        thread.join()
+    assert ("bulk", "autre.com") in order[:2]
+
+
+def test_scheduler_priorite_sur_limite_de_debit(limiter):
+    limiter.setRate(READ, 20, burst=1)
+    scheduler = Scheduler()
+    order = []
+    scheduler.acquire("domain.com", "GetAccount")
+    scheduler.release("domain.com")
+    threads = startWaiters(scheduler, order, [(BULK, "domain.com")] * 3 + [(INTERACTIVE, "domain.com")])
+    for thread in threads:
+        thread.join()
+    assert order.index((INTERACTIVE, "domain.com")) <= 1
+
+
+def test_scheduler_echeance_pendant_l_attente(limiter):
+    scheduler = Scheduler(maxInFlight=1)
+    scheduler.acquire("domain.com", "GetAccount")
+    with deadline(0.05):
+        with pytest.raises(DeadlineExceededException):
+            scheduler.acquire("domain.com", "GetAccount")
+    scheduler.release("domain.com")
+    assert scheduler.inFlight == 0
+
+
+def test_scheduler_limite_par_domaine(limiter):
+    scheduler = Scheduler(maxInFlightPerDomain=1)
+    order = []
+    scheduler.acquire("domain.com", "GetAccount")
+    threads = startWaiters(scheduler, order, [(BULK, "domain.com"), (BULK, "autre.com")])
+    threads[1].join()
+    assert order == [(BULK, "autre.com")]
+    scheduler.release("domain.com")
+    threads[0].join()
+    assert order[-1] == (BULK, "domain.com")
+
+
+def runSlots(scheduler, domains):
+    done = []
+
+    def call(domain):
+        with scheduler.slot(domain, "GetAccount"):
+            time.sleep(0.05)
+        done.append(domain)
+    threads = [threading.Thread(target=call, args=(domain,)) for domain in domains]
+    for thread in threads:
+        # threads démons : un blocage de l'ordonnanceur fait échouer le test sans bloquer pytest
+        thread.daemon = True
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    return done
+
+
+def test_scheduler_limite_de_debit_et_maxInFlight(limiter):
+    limiter.setRate(READ, 5, burst=1)
+    assert len(runSlots(Scheduler(maxInFlight=1), ["domain.com"] * 3)) == 3
+
+
+def test_scheduler_limite_de_debit_et_limite_par_domaine(limiter):
+    limiter.setRate(READ, 5, burst=1)
+    scheduler = Scheduler()
+    scheduler.setDomainLimit("domain.com", 1)
+    assert len(runSlots(scheduler, ["domain.com"] * 3)) == 3
@@ -0,0 +1,112 @@
+import threading
+import time
+
+import pytest
+
+from lib_Partage_BSS.exceptions import DeadlineExceededException
+from lib_Partage_BSS.utils.Deadline import deadline
+from lib_Partage_BSS.utils.SingleFlight import SingleFlight
+
+
+def test_singleFlight_regroupe_les_appels_simultanes():
+    flight = SingleFlight()
+    calls = []
+
+    def read():
+        calls.append(1)
+        time.sleep(0.1)
+        return {"name": "test@domain.com"}
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("key", read))) for i in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert results == [{"name": "test@domain.com"}] * 5
+    assert len(set(id(result) for result in results)) == 5
+
+
+def test_singleFlight_appels_successifs_non_regroupes():
+    flight = SingleFlight()
+    assert flight.do("key", lambda: 1) == 1
+    assert flight.do("key", lambda: 2) == 2
+
+
+def test_singleFlight_propage_l_exception():
+    flight = SingleFlight()
+
+    def fail():
+        raise ValueError()
+    with pytest.raises(ValueError):
+        flight.do("key", fail)
+
+
+def test_singleFlight_attente_limitee_par_l_echeance():
+    flight = SingleFlight()
+    release = threading.Event()
+    leader = threading.Thread(target=lambda: flight.do("key", lambda: release.wait(5)))
+    leader.start()
+    time.sleep(0.05)
+    try:
+        with deadline(0.1):
+            with pytest.raises(DeadlineExceededException):
+                flight.do("key", lambda: "follower")
+    finally:
+        release.set()
+        leader.join()
+
+
+def test_singleFlight_echeance_de_l_emetteur_non_propagee():
+    flight = SingleFlight()
+    started = threading.Event()
+
+    def expire():
+        started.set()
+        time.sleep(0.1)
+        raise DeadlineExceededException("Temps alloué à l'opération écoulé")
+    leader = threading.Thread(target=lambda: pytest.raises(DeadlineExceededException, flight.do, "key", expire))
+    leader.start()
+    started.wait(1)
+    assert flight.do("key", lambda: "relancé") == "relancé"
+    leader.join()
+
+
+def test_singleFlight_resultat_de_l_emetteur_non_partage():
+    flight = SingleFlight()
+    release = threading.Event()
+    results = []
+
+    def read():
+        release.wait(1)
+        return {"aliases": []}
+
+    def lead():
+        result = flight.do("key", read)
+        result["aliases"].append("modifié")
+    leader = threading.Thread(target=lead)
+    leader.start()
+    time.sleep(0.05)
+    follower = threading.Thread(target=lambda: results.append(flight.do("key", read)))
+    follower.start()
+    time.sleep(0.05)
+    release.set()
+    leader.join()
+    follower.join()
+    assert results == [{"aliases": []}]
+
+
+def test_singleFlight_forget_appel_suivant_non_regroupe():
+    flight = SingleFlight()
+    release = threading.Event()
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("key", lambda: release.wait(5) and "avant")))
+    leader.start()
+    time.sleep(0.05)
+    flight.forget("key")
+    try:
+        assert flight.do("key", lambda: "après") == "après"
+    finally:
+        release.set()
+        leader.join()
+    assert results == ["avant"]
@@ -0,0 +1,107 @@
+import threading
+from time import sleep
+
+import pytest
+import requests
+
+from lib_Partage_BSS.exceptions.ServiceException import ServiceException
+from lib_Partage_BSS.utils import Snapshot as SnapshotModule
+from lib_Partage_BSS.utils.Snapshot import Snapshot
+
+
+def test_snapshot_renvoie_la_copie_recente_sans_appel():
+    snapshot = Snapshot(softTtl=60, hardTtl=120)
+    calls = []
+    function = lambda: calls.append(1) or {"value": len(calls)}
+    assert snapshot.get("key", function) == {"value": 1}
+    assert snapshot.get("key", function) == {"value": 1}
+    assert len(calls) == 1
+
+
+def test_snapshot_rafraichit_en_arriere_plan_apres_softTtl():
+    snapshot = Snapshot(softTtl=0, hardTtl=60)
+    snapshot.get("key", lambda: 1)
+    refreshed = threading.Event()
+
+    def slow():
+        refreshed.wait(1)
+        return 2
+    assert snapshot.get("key", slow) == 1
+    refreshed.set()
+    for _ in range(100):
+        if snapshot.get("key", lambda: 3) in (2, 3):
+            break
+        sleep(0.01)
+    assert snapshot.get("key", lambda: 3) in (2, 3)
+
+
+def test_snapshot_bloque_apres_hardTtl_et_utilise_la_copie_si_api_injoignable():
+    snapshot = Snapshot(softTtl=0, hardTtl=0)
+    snapshot.get("key", lambda: 1)
+    assert snapshot.get("key", lambda: 2) == 2
+
+    def unreachable():
+        raise requests.exceptions.ConnectionError()
+    assert snapshot.get("key", unreachable) == 2
+
+    def apiError():
+        raise ServiceException(1, "erreur")
+    with pytest.raises(ServiceException):
+        snapshot.get("key", apiError)
+
+
+def test_snapshot_invalidate():
+    snapshot = Snapshot()
+    snapshot.get("key", lambda: 1)
+    snapshot.invalidate("key")
+    assert snapshot.get("key", lambda: 2) == 2
+
+
+def test_snapshot_rafraichissement_anterieur_a_une_invalidation_ignore():
+    snapshot = Snapshot(softTtl=0, hardTtl=60)
+    snapshot.get("key", lambda: "avant")
+    started, release = threading.Event(), threading.Event()
+
+    def slowRead():
+        started.set()
+        release.wait(1)
+        return "avant"
+    assert snapshot.get("key", slowRead) == "avant"
+    assert started.wait(1)
+    snapshot.invalidate("key")
+    release.set()
+    for _ in range(100):
+        if not snapshot._refreshing:
+            break
+        sleep(0.01)
+    assert snapshot.get("key", lambda: "après") == "après"
+
+
+def test_snapshot_generations_bornees(monkeypatch):
+    monkeypatch.setattr(SnapshotModule, "MAX_GENERATIONS", 3)
+    snapshot = Snapshot()
+    generation = snapshot._generation("key")
+    for index in range(10):
+        snapshot.invalidate("key%d" % index)
+        assert len(snapshot._generations) <= 3
+    # la lecture commencée avant les invalidations n'est pas conservée, même si le suivi de sa clé a été oublié
+    snapshot._store("key", "avant", generation)
+    assert snapshot.get("key", lambda: "après") == "après"
+
+
+def test_snapshot_rafraichissements_simultanes_bornes():
+    snapshot = Snapshot(softTtl=0, hardTtl=60, maxRefreshes=2)
+    release = threading.Event()
+    calls = []
+    for key in range(5):
+        snapshot.get(key, lambda: 0)
+
+    def slowRead():
+        calls.append(1)
+        release.wait(1)
+        return 1
+    for key in range(5):
+        snapshot.get(key, slowRead)
+    sleep(0.05)
+    release.set()
+    assert len(calls) == 2
@@ -0,0 +1,69 @@
+from contextlib import contextmanager
+from unittest.mock import MagicMock
+
+import pytest
+from requests import Response
+
+from lib_Partage_BSS.services import GlobalService
+from lib_Partage_BSS.utils import Tracing
+
+
+class FakeSpan(object):
+    def __init__(self, name, attributes, parent):
+        self.name = name
+        self.attributes = dict(attributes or {})
+        self.parent = parent
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+
+class FakeTracer(object):
+    def __init__(self):
+        self.spans = []
+        self._stack = []
+
+    @contextmanager
+    def start_as_current_span(self, name, attributes=None):
+        span = FakeSpan(name, attributes, self._stack[-1].name if self._stack else None)
+        self.spans.append(span)
+        self._stack.append(span)
+        try:
+            yield span
+        finally:
+            self._stack.pop()
+
+
+@pytest.fixture()
+def tracer():
+    tracer = FakeTracer()
+    Tracing.setTracer(tracer)
+    yield tracer
+    Tracing.setTracer(None)
+
+
+def test_span_sans_traceur():
+    with Tracing.span("test", {"a": 1}) as current:
+        current.set_attribute("b", 2)
+    assert Tracing.span("autre") is Tracing.span("test")
+
+
+def test_callMethod_trace_token_http_et_parse(mocker, tracer):
+    response = MagicMock(Response)
+    response.text = "<Response><status type=\"integer\">0</status></Response>"
+    mocker.patch("requests.post", return_value=response)
+    connexion = MagicMock()
+    connexion.url = "https://api"
+    connexion.token.return_value = "token"
+    mocker.patch("lib_Partage_BSS.services.GlobalService.BSSConnexion", return_value=connexion)
+    GlobalService.callMethod("domain.com", "GetAccount", {})
+    spans = dict((span.name, span) for span in tracer.spans)
+    assert spans["BSS GetAccount"].attributes == {"bss.domain": "domain.com", "bss.method": "GetAccount",
+                                                  "bss.status": 0}
+    assert spans["BSS token"].parent == "BSS GetAccount"
+    assert spans["BSS http"].parent == "BSS GetAccount"
+    assert spans["BSS parse"].parent == "BSS GetAccount"
+
+
+def test_callSpan_sans_traceur():
+    assert Tracing.callSpan("GetAccount", "domain.com") is Tracing.span("test")